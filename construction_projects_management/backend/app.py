@@ -1,12 +1,24 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.serving import is_running_from_reloader
 import numpy as np
 from predict import DelayPredictor
 from services.cost_service import CostOverrunService
-from schemas import CostPredictionRequest, ScenarioSimulationRequest
-from storage import PredictionRepository
+from services.history_export import EXPORT_FORMATS, encode_export
+from services.inference import InferenceExecutor, InferenceModels
+from services.portfolio_service import PortfolioRiskEngine
+from schemas import (
+    CostPredictionRequest,
+    MonteCarloRequest,
+    PortfolioRiskRequest,
+    ScenarioSimulationRequest,
+    SensitivityRequest,
+)
+from storage import COST_HISTORY_FILTERS, DELAY_HISTORY_FILTERS, PredictionRepository
+from ml.config import EXPLAIN_LATENCY_BUDGET_MS, EXPLAIN_MODES
 import logging
+import time
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -16,24 +28,46 @@ CORS(app)  # Allow frontend to call this API
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load models once at startup (faster predictions)
-try:
-    predictor = DelayPredictor(model_dir='models')
-    logger.info("✅ Delay prediction models loaded successfully!")
-except Exception as e:
-    logger.error(f"❌ Failed to load delay models: {e}")
-    predictor = None
+# Inference worker processes (INFERENCE_MODE = "process") re-run this script
+# as __mp_main__ when it was started directly (python app.py). They load their
+# own models in services/inference_worker.py, so none of the startup below
+# (models, database, executor) happens there.
+SPAWNED_WORKER = __name__ == '__mp_main__'
+predictor = prediction_repo = cost_service = portfolio_engine = inference = None
 
-# Load cost overrun service
-try:
-    cost_service = CostOverrunService()
-    logger.info("✅ Cost overrun models loaded successfully!")
-except Exception as e:
-    logger.error(f"❌ Failed to load cost overrun models: {e}")
-    cost_service = None
+if not SPAWNED_WORKER:
+    # Load models once at startup (faster predictions)
+    try:
+        predictor = DelayPredictor(model_dir='models')
+        logger.info("✅ Delay prediction models loaded successfully!")
+    except Exception as e:
+        logger.error(f"❌ Failed to load delay models: {e}")
+        predictor = None
+
+    # Prediction repository (one connection pool) shared by both model families
+    prediction_repo = PredictionRepository()
 
-# Initialize prediction repository for database storage
-prediction_repo = PredictionRepository()
+    # Load cost overrun service
+    try:
+        cost_service = CostOverrunService(repo=prediction_repo)
+        logger.info("✅ Cost overrun models loaded successfully!")
+    except Exception as e:
+        logger.error(f"❌ Failed to load cost overrun models: {e}")
+        cost_service = None
+
+    # Portfolio risk runs on top of both predictors (delay is optional)
+    portfolio_engine = PortfolioRiskEngine(cost_service, predictor) if cost_service else None
+
+    # Prediction, simulation and batch scoring run on the inference executor:
+    # inline, on a thread pool or on pre-warmed worker processes (INFERENCE_MODE),
+    # so heavy scoring does not starve the other request threads. The prediction
+    # caches and micro-batchers stay here in front of it (only coalesced misses
+    # are sent), and results are persisted here, in the web process. The entry
+    # points start it (see the bottom of this file and serve.py).
+    inference = InferenceExecutor(
+        InferenceModels(predictor, cost_service, portfolio_engine), model_dir='models'
+    )
+    inference.attach()
 
 # ================================================================
 # HEALTH CHECK ENDPOINT
@@ -44,7 +78,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'models_loaded': predictor is not None,
-        'ensemble_available': predictor.ensemble_models is not None if predictor else False
+        'ensemble_available': predictor.ensemble_available if predictor else False,
+        'ensemble_loaded': inference.ensemble_loaded if predictor else False
     })
 
 # ================================================================
@@ -73,7 +108,7 @@ def predict_delay():
         "final_project_type": "Residential/Group Housing",
         "promotertype": "COMPANY",
         "districttype": "Ahmedabad",
-        "use_ensemble": true  // Optional: use ensemble for more accuracy
+        "use_ensemble": true  // Optional: true, false or "auto" (ensemble only near the threshold)
     }
     """
     try:
@@ -88,6 +123,9 @@ def predict_delay():
         
         # Extract use_ensemble flag (default: False for speed)
         use_ensemble = data.pop('use_ensemble', False)
+        timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # DEBUG: Print received data
         logger.info("="*70)
@@ -112,8 +150,8 @@ def predict_delay():
                 'error': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
         
-        # Make prediction
-        result = predictor.predict_single(data, use_ensemble=use_ensemble, debug=True)
+        # Make prediction (memoized: repeated payloads skip inference)
+        result = predictor.predict_cached(data, use_ensemble, timeout=timeout)
         
         # 🔥 DEBUG PREDICTION OUTPUT
         logger.info("📤 PREDICTION RESULT:")
@@ -140,8 +178,10 @@ def predict_delay():
             'prediction': prediction_data,
             'recommendations': recommendations,
             'model_info': {
-                'ensemble_used': use_ensemble,
-                'ensemble_available': predictor.ensemble_models is not None
+                'ensemble_used': result['ensemble_members_used'] > 0,
+                'ensemble_available': predictor.ensemble_available,
+                'inference_path': result['inference_path'],
+                'ensemble_members_used': result['ensemble_members_used']
             }
         }
         
@@ -151,7 +191,7 @@ def predict_delay():
                 input_payload=data,
                 output_payload={'prediction': prediction_data, 'model_info': response['model_info']},
                 recommendations=recommendations,
-                ensemble_used=use_ensemble,
+                ensemble_used=response['model_info']['ensemble_used'],
                 model_version='v1.0.0'  # Update this if you version your delay models
             )
             logger.info("✅ Delay prediction saved to database")
@@ -161,6 +201,8 @@ def predict_delay():
         
         return jsonify(response)
         
+    except TimeoutError as e:
+        return timeout_response(e)
     except Exception as e:
         logger.error(f"❌ Prediction error: {e}", exc_info=True)
         return jsonify({
@@ -183,7 +225,7 @@ def predict_batch():
             { /* project 2 data */ },
             ...
         ],
-        "use_ensemble": false  // Optional
+        "use_ensemble": false  // Optional: true, false or "auto"
     }
     """
     try:
@@ -193,31 +235,38 @@ def predict_batch():
         data = request.get_json()
         projects = data.get('projects', [])
         use_ensemble = data.get('use_ensemble', False)
+        timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         if not projects:
             return jsonify({'error': 'No projects provided'}), 400
         
         logger.info(f"📊 Batch prediction for {len(projects)} projects (ensemble={use_ensemble})")
         
+        # One vectorized pass; failed rows come back as {'error': ...} in place
+        predictions = inference.run('delay.predict_batch', projects, use_ensemble, timeout=timeout)
+
         results = []
-        for idx, project in enumerate(projects):
-            try:
-                result = predictor.predict_single(project, use_ensemble=use_ensemble)
+        for idx, (project, result) in enumerate(zip(projects, predictions)):
+            project_id = project.get('project_id', f'project_{idx}')
+            if 'error' in result:
+                logger.error(f"Error predicting project {idx}: {result['error']}")
                 results.append({
-                    'project_id': project.get('project_id', f'project_{idx}'),
-                    'is_delayed': bool(result['is_delayed']),
-                    'delay_probability': float(result['delay_probability']),
-                    'predicted_delay_days': int(result['predicted_delay_days']),
-                    'risk_level': result['risk_level'],
-                    'confidence': result['confidence'],
-                    'extreme_override_applied': result['extreme_override_applied']
-                })
-            except Exception as e:
-                logger.error(f"Error predicting project {idx}: {e}")
-                results.append({
-                    'project_id': project.get('project_id', f'project_{idx}'),
-                    'error': str(e)
+                    'project_id': project_id,
+                    'error': result['error']
                 })
+                continue
+            results.append({
+                'project_id': project_id,
+                'is_delayed': bool(result['is_delayed']),
+                'delay_probability': float(result['delay_probability']),
+                'predicted_delay_days': int(result['predicted_delay_days']),
+                'risk_level': result['risk_level'],
+                'confidence': result['confidence'],
+                'extreme_override_applied': result['extreme_override_applied'],
+                'inference_path': result['inference_path']
+            })
         
         return jsonify({
             'success': True,
@@ -230,6 +279,8 @@ def predict_batch():
             }
         })
         
+    except TimeoutError as e:
+        return timeout_response(e)
     except Exception as e:
         logger.error(f"❌ Batch prediction error: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
@@ -239,19 +290,9 @@ def predict_batch():
 # ================================================================
 @app.route('/api/dashboard/stats', methods=['GET'])
 def dashboard_stats():
-    """Get dashboard statistics (mock for now, replace with real DB queries)"""
+    """Get dashboard statistics from the prediction summaries and rollups"""
     try:
-        # TODO: Replace with actual database queries
-        stats = {
-            'total_projects': 156,
-            'delayed_projects': 42,
-            'on_time_projects': 114,
-            'avg_delay_days': 78,
-            'high_risk_count': 12,
-            'medium_risk_count': 28,
-            'low_risk_count': 116,
-            'total_cost_overrun': 450000
-        }
+        stats = prediction_repo.dashboard_stats()
         
         return jsonify({
             'success': True,
@@ -262,6 +303,39 @@ def dashboard_stats():
         logger.error(f"❌ Dashboard stats error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ================================================================
+# DASHBOARD TREND ENDPOINT
+# ================================================================
+@app.route('/api/dashboard/trend', methods=['GET'])
+def dashboard_trend():
+    """
+    Time series of prediction counts per risk level, served from the rollups
+
+    Query: ?source=delay|cost&granularity=day|hour&days=90&district=
+    """
+    try:
+        try:
+            trend = prediction_repo.rollup_trend(
+                request.args.get('source', 'delay'),
+                granularity=request.args.get('granularity', 'day'),
+                days=request.args.get('days', 90, type=int),
+                district=request.args.get('district') or None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'trend': trend
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Dashboard trend error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
 # ================================================================
 # MODEL INFO ENDPOINT
 # ================================================================
@@ -275,17 +349,15 @@ def model_info():
         info = {
             'classifier': {
                 'type': type(predictor.classifier).__name__,
-                'loaded': True
+                'loaded': True,
+                'engine': predictor.engine_name(predictor.classifier_engine, predictor.classifier)
             },
             'regressor': {
                 'type': type(predictor.regressor).__name__,
-                'loaded': True
-            },
-            'ensemble': {
-                'available': predictor.ensemble_models is not None,
-                'models_count': len(predictor.ensemble_models) if predictor.ensemble_models else 0,
-                'models': list(predictor.ensemble_models.keys()) if predictor.ensemble_models else []
+                'loaded': True,
+                'engine': predictor.engine_name(predictor.regressor_engine, predictor.regressor)
             },
+            'ensemble': predictor.ensemble_info(),
             'threshold': predictor.threshold,
             'features_count': 50  # Approximate
         }
@@ -299,6 +371,59 @@ def model_info():
         logger.error(f"❌ Model info error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ================================================================
+# PREDICTION CACHE STATS ENDPOINT
+# ================================================================
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the delay and cost prediction caches"""
+    return jsonify({
+        'success': True,
+        'cache': {
+            'delay': predictor.cache.stats() if predictor else None,
+            'cost_overrun': cost_service.cache.stats() if cost_service else None
+        }
+    })
+
+# ================================================================
+# MICRO-BATCHING STATS ENDPOINT
+# ================================================================
+@app.route('/api/batching/stats', methods=['GET'])
+def batching_stats():
+    """Batch sizes and queueing delay of the coalesced delay and cost predictions"""
+    return jsonify({
+        'success': True,
+        'batching': {
+            'delay': predictor.batcher.stats() if predictor else None,
+            'cost_overrun': cost_service.batcher.stats() if cost_service else None
+        }
+    })
+
+# ================================================================
+# INFERENCE EXECUTOR STATS ENDPOINT
+# ================================================================
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    """Executor mode and worker processes plus completed, failed, timed-out and cancelled tasks"""
+    return jsonify({
+        'success': True,
+        'inference': inference.stats()
+    })
+
+# ================================================================
+# PERSISTENCE STATS ENDPOINT
+# ================================================================
+@app.route('/api/storage/stats', methods=['GET'])
+def storage_stats():
+    """Connection pool settings plus write-behind queue depth, dropped/spilled rows and commit timings"""
+    return jsonify({
+        'success': True,
+        'storage': {
+            'pool': prediction_repo.pool.stats(),
+            'writer': prediction_repo.writer_stats()
+        }
+    })
+
 # ================================================================
 # COST OVERRUN PREDICTION ENDPOINT
 # ================================================================
@@ -315,9 +440,12 @@ def predict_cost_overrun():
         "final_project_type": "Residential/Group Housing",
         "promotertype": "COMPANY",
         "districttype": "Ahmedabad",
-        ... (other optional fields)
+        ... (other optional fields),
+        "explain": "auto",           // Optional: none | fast | full | auto
+        "latency_budget_ms": 250     // Optional: budget used by "auto"
     }
     """
+    started = time.monotonic()
     try:
         if cost_service is None:
             return jsonify({'error': 'Cost overrun models not loaded'}), 500
@@ -325,6 +453,12 @@ def predict_cost_overrun():
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No input data provided'}), 400
+
+        explain, deadline, error = parse_explain_options(data, started)
+        if not error:
+            timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Validate required fields
         required_fields = [
@@ -346,8 +480,8 @@ def predict_cost_overrun():
                 'error': f'Invalid input data: {str(e)}'
             }), 400
         
-        # Make prediction
-        result = cost_service.predict(request_obj, persist=True)
+        # Make prediction (memoized and micro-batched, then saved)
+        result = cost_service.predict(request_obj, explain=explain, deadline=deadline, timeout=timeout)
         
         # Build response
         response = {
@@ -357,6 +491,8 @@ def predict_cost_overrun():
         
         return jsonify(response)
         
+    except TimeoutError as e:
+        return timeout_response(e)
     except Exception as e:
         logger.error(f"❌ Cost overrun prediction error: {e}", exc_info=True)
         return jsonify({
@@ -364,6 +500,111 @@ def predict_cost_overrun():
             'success': False
         }), 500
 
+def parse_explain_options(data, started):
+    """
+    Pop "explain" / "latency_budget_ms" from a request body.
+    Returns (explain, deadline, error); deadline is relative to `started`.
+    """
+    explain = data.pop('explain', None)
+    budget_ms = data.pop('latency_budget_ms', None)
+    if explain is not None and explain not in ('auto',) + EXPLAIN_MODES:
+        return None, None, f'explain must be one of: auto, {", ".join(EXPLAIN_MODES)}'
+    if budget_ms is None:
+        budget_ms = EXPLAIN_LATENCY_BUDGET_MS
+    try:
+        budget_ms = float(budget_ms)
+    except (TypeError, ValueError):
+        return None, None, 'latency_budget_ms must be a number'
+    return explain, started + budget_ms / 1000, None
+
+def parse_timeout(data):
+    """
+    Pop "timeout_ms" from a request body.
+    Returns (seconds, error); None seconds means the executor's default.
+    """
+    timeout_ms = data.pop('timeout_ms', None)
+    if timeout_ms is None:
+        return None, None
+    try:
+        timeout_ms = float(timeout_ms)
+    except (TypeError, ValueError):
+        return None, 'timeout_ms must be a number'
+    if timeout_ms <= 0:
+        return None, 'timeout_ms must be positive'
+    return timeout_ms / 1000, None
+
+def timeout_response(error):
+    """504 for a prediction that did not finish within its timeout"""
+    logger.warning(f"⏱️ {error}")
+    return jsonify({
+        'error': str(error),
+        'success': False
+    }), 504
+
+# ================================================================
+# COST OVERRUN BATCH PREDICTION ENDPOINT
+# ================================================================
+@app.route('/api/predict/cost-overrun/batch', methods=['POST'])
+def predict_cost_overrun_batch():
+    """
+    Predict cost overrun for multiple projects in one pass.
+
+    Expected JSON Input:
+    {
+        "projects": [
+            { /* same fields as /api/predict/cost-overrun */ },
+            ...
+        ],
+        "explain": "auto",           // Optional: none | fast | full | auto
+        "latency_budget_ms": 250     // Optional: budget for the whole batch
+    }
+
+    Invalid projects come back as {"index": i, "error": "..."} in place;
+    the rest of the batch is still scored and saved.
+    """
+    started = time.monotonic()
+    try:
+        if cost_service is None:
+            return jsonify({'error': 'Cost overrun models not loaded'}), 500
+
+        data = request.get_json()
+        projects = data.get('projects', []) if isinstance(data, dict) else []
+        if not projects:
+            return jsonify({'error': 'No projects provided'}), 400
+
+        explain, deadline, error = parse_explain_options(data, started)
+        if not error:
+            timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        logger.info(f"📊 Cost overrun batch prediction for {len(projects)} projects")
+        results = inference.run('cost.predict_many', projects, explain, deadline, timeout=timeout)
+        cost_service.log_results(projects, results)
+
+        scored = [r['prediction'] for r in results if 'prediction' in r]
+        return jsonify({
+            'success': True,
+            'predictions': results,
+            'summary': {
+                'total': len(results),
+                'succeeded': len(scored),
+                'failed': len(results) - len(scored),
+                'high_risk': sum(1 for r in scored if r['risk_level'] == 'High'),
+                'medium_risk': sum(1 for r in scored if r['risk_level'] == 'Medium'),
+                'low_risk': sum(1 for r in scored if r['risk_level'] == 'Low')
+            }
+        })
+
+    except TimeoutError as e:
+        return timeout_response(e)
+    except Exception as e:
+        logger.error(f"❌ Cost overrun batch prediction error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
 # ================================================================
 # COST OVERRUN SCENARIO SIMULATION ENDPOINT
 # ================================================================
@@ -371,7 +612,22 @@ def predict_cost_overrun():
 def predict_cost_overrun_scenario():
     """
     Run scenario simulations for cost overrun
+
+    Expected JSON Input:
+    {
+        "base_project": { /* same fields as /api/predict/cost-overrun */ },
+        "scenarios": [
+            {"name": "faster", "overrides": {"progress_ratio": 0.6}, "explain": "full"},
+            ...
+        ],
+        "explain": "auto",           // Optional default for scenarios: none | fast | full | auto
+        "latency_budget_ms": 250     // Optional: budget for the whole request
+    }
+
+    All scenarios are scored in one batched pass; a scenario with invalid
+    overrides comes back with an "error" instead of a "prediction".
     """
+    started = time.monotonic()
     try:
         if cost_service is None:
             return jsonify({'error': 'Cost overrun models not loaded'}), 500
@@ -379,6 +635,13 @@ def predict_cost_overrun_scenario():
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No input data provided'}), 400
+
+        budget_ms = data.pop('latency_budget_ms', None)
+        _, deadline, error = parse_explain_options({'latency_budget_ms': budget_ms}, started)
+        if not error:
+            timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         try:
             request_obj = ScenarioSimulationRequest(**data)
@@ -387,13 +650,15 @@ def predict_cost_overrun_scenario():
                 'error': f'Invalid input data: {str(e)}'
             }), 400
         
-        simulations = cost_service.simulate(request_obj)
+        simulations = inference.run('cost.simulate', request_obj, deadline, timeout=timeout)
         
         return jsonify({
             'success': True,
             'simulations': simulations
         })
         
+    except TimeoutError as e:
+        return timeout_response(e)
     except Exception as e:
         logger.error(f"❌ Scenario simulation error: {e}", exc_info=True)
         return jsonify({
@@ -401,24 +666,197 @@ def predict_cost_overrun_scenario():
             'success': False
         }), 500
 
+# ================================================================
+# COST OVERRUN SENSITIVITY SURFACE ENDPOINT
+# ================================================================
+@app.route('/api/predict/cost-overrun/sensitivity', methods=['POST'])
+def predict_cost_overrun_sensitivity():
+    """
+    Predicted overrun surface over one or two input axes
+
+    Expected JSON Input:
+    {
+        "base_project": { /* same fields as /api/predict/cost-overrun */ },
+        "axes": [
+            {"field": "progress_ratio", "min": 0.05, "max": 1.0, "steps": 50},
+            {"field": "final_project_cost", "values": [2e7, 5e7, 1e8]}
+        ]
+    }
+
+    Returns axis values plus expected/p10/p90 surfaces as nested arrays
+    indexed [axis0][axis1].
+    """
+    try:
+        if cost_service is None:
+            return jsonify({'error': 'Cost overrun models not loaded'}), 500
+
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No input data provided'}), 400
+
+        timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            request_obj = SensitivityRequest(**data)
+            surface = inference.run('cost.sensitivity', request_obj, timeout=timeout)
+        except ValueError as e:
+            return jsonify({
+                'error': f'Invalid input data: {str(e)}'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'sensitivity': surface
+        })
+
+    except TimeoutError as e:
+        return timeout_response(e)
+    except Exception as e:
+        logger.error(f"❌ Sensitivity analysis error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
+# ================================================================
+# COST OVERRUN MONTE CARLO ENDPOINT
+# ================================================================
+@app.route('/api/predict/cost-overrun/monte-carlo', methods=['POST'])
+def predict_cost_overrun_monte_carlo():
+    """
+    Distribution of predicted overrun under uncertain inputs
+
+    Expected JSON Input:
+    {
+        "base_project": { /* same fields as /api/predict/cost-overrun */ },
+        "distributions": [
+            {"field": "progress_ratio", "kind": "triangular", "low": 0.2, "mode": 0.4, "high": 0.7},
+            {"field": "final_project_cost", "kind": "normal", "mean": 1.0, "std": 0.1, "relative": true}
+        ],
+        "n_samples": 50000,
+        "seed": 42
+    }
+
+    Returns mean/std, percentiles, risk-bucket probabilities and a histogram.
+    """
+    try:
+        if cost_service is None:
+            return jsonify({'error': 'Cost overrun models not loaded'}), 500
+
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No input data provided'}), 400
+
+        timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            request_obj = MonteCarloRequest(**data)
+            simulation = cost_service.monte_carlo(request_obj, timeout=timeout)
+        except ValueError as e:
+            return jsonify({
+                'error': f'Invalid input data: {str(e)}'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'monte_carlo': simulation
+        })
+
+    except TimeoutError as e:
+        return timeout_response(e)
+    except Exception as e:
+        logger.error(f"❌ Monte Carlo simulation error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
+# ================================================================
+# PORTFOLIO RISK ENDPOINT
+# ================================================================
+@app.route('/api/portfolio/risk', methods=['POST'])
+def portfolio_risk():
+    """
+    Distribution of total overrun across a portfolio of projects
+
+    Expected JSON Input:
+    {
+        "projects": [ /* project objects as for /api/predict/batch */ ],
+        "n_draws": 10000,
+        "district_correlation": 0.3,
+        "promoter_correlation": 0.1,
+        "percentiles": [50, 90, 95, 99],
+        "tail_percentile": 95,
+        "seed": 42
+    }
+
+    Returns VaR-style percentiles and expected shortfall of the total overrun
+    amount, per-district contributions and the distribution of delayed projects.
+    """
+    try:
+        if portfolio_engine is None:
+            return jsonify({'error': 'Cost overrun models not loaded'}), 500
+
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No input data provided'}), 400
+
+        timeout, error = parse_timeout(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            request_obj = PortfolioRiskRequest(**data)
+            risk = inference.run('portfolio.simulate', request_obj, timeout=timeout)
+        except ValueError as e:
+            return jsonify({
+                'error': f'Invalid input data: {str(e)}'
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'portfolio': risk
+        })
+
+    except TimeoutError as e:
+        return timeout_response(e)
+    except Exception as e:
+        logger.error(f"❌ Portfolio risk error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
 # ================================================================
 # COST OVERRUN HISTORY ENDPOINT
 # ================================================================
 @app.route('/api/predict/cost-overrun/history', methods=['GET'])
 def get_cost_overrun_history():
     """
-    Get prediction history
+    Get prediction history, newest first
+
+    Query parameters: limit, cursor (next_cursor of the previous page),
+    fields (comma-separated projection), risk_level, model_version,
+    scenario_name, district, project_type, min_overrun, max_overrun,
+    since, until (ISO dates/timestamps)
     """
     try:
         if cost_service is None:
             return jsonify({'error': 'Cost overrun models not loaded'}), 500
-        
-        limit = request.args.get('limit', 50, type=int)
-        history = cost_service.history(limit)
-        
+
+        try:
+            page = cost_service.history_page(**parse_history_query(COST_HISTORY_FILTERS))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         return jsonify({
             'success': True,
-            'history': history
+            'history': page['items'],
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -428,21 +866,61 @@ def get_cost_overrun_history():
             'success': False
         }), 500
 
+# ================================================================
+# COST OVERRUN STATISTICS ENDPOINT
+# ================================================================
+@app.route('/api/predict/cost-overrun/stats', methods=['GET'])
+def get_cost_overrun_stats():
+    """
+    Get aggregate statistics for cost overrun predictions
+
+    Optional ?group_by=districttype|final_project_type|promotertype|risk_level|model_version
+    adds a per-group breakdown.
+    """
+    try:
+        stats = prediction_repo.aggregate_stats()
+        group_by = request.args.get('group_by')
+        if group_by:
+            try:
+                stats['breakdown'] = prediction_repo.aggregate_cost_by(group_by)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Cost stats error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
 # ================================================================
 # DELAY PREDICTION HISTORY ENDPOINT
 # ================================================================
 @app.route('/api/predict/delay/history', methods=['GET'])
 def get_delay_history():
     """
-    Get delay prediction history
+    Get delay prediction history, newest first
+
+    Query parameters: limit, cursor (next_cursor of the previous page),
+    fields (comma-separated projection), risk_level, model_version,
+    confidence, district, project_type, is_delayed, min_probability,
+    max_probability, since, until (ISO dates/timestamps)
     """
     try:
-        limit = request.args.get('limit', 50, type=int)
-        history = prediction_repo.fetch_recent_delays(limit)
-        
+        try:
+            page = prediction_repo.query_delay_predictions(**parse_history_query(DELAY_HISTORY_FILTERS))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         return jsonify({
             'success': True,
-            'history': history
+            'history': page['items'],
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -475,9 +953,69 @@ def get_delay_stats():
             'success': False
         }), 500
 
+# ================================================================
+# PREDICTION HISTORY EXPORT ENDPOINT
+# ================================================================
+@app.route('/api/predict/cost-overrun/export', methods=['GET'], defaults={'source': 'cost'})
+@app.route('/api/predict/delay/export', methods=['GET'], defaults={'source': 'delay'})
+def export_prediction_history(source):
+    """
+    Stream the full prediction history, oldest first, in chunks
+
+    Query: ?format=ndjson|csv|arrow&columns=a,b&since=&until= plus the history
+    filters. Only the denormalized columns are exported (no JSON payloads).
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        columns = request.args.get('columns')
+        filter_specs = COST_HISTORY_FILTERS if source == 'cost' else DELAY_HISTORY_FILTERS
+        try:
+            selected, chunks = prediction_repo.export_history(
+                source,
+                columns=[c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+                **{name: value for name, value in request.args.items() if name in filter_specs}
+            )
+            body = encode_export(fmt, selected, chunks)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        def generate():
+            try:
+                yield from body
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated file
+                logger.error(f"❌ Export stream error: {e}", exc_info=True)
+                raise
+
+        _, mimetype, extension = EXPORT_FORMATS[fmt]
+        filename = f"{source}_predictions.{extension}"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    except Exception as e:
+        logger.error(f"❌ Export error: {e}", exc_info=True)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), 500
+
 # ================================================================
 # HELPER FUNCTIONS
 # ================================================================
+def parse_history_query(filter_specs):
+    """limit/cursor/fields plus the recognised filters from the query string"""
+    fields = request.args.get('fields')
+    query = {
+        'limit': request.args.get('limit', 50, type=int),
+        'cursor': request.args.get('cursor') or None,
+        'fields': [f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+    }
+    query.update({name: value for name, value in request.args.items() if name in filter_specs})
+    return query
+
 def generate_recommendations(result):
     """Generate recommendations based on prediction"""
     recommendations = []
@@ -515,8 +1053,13 @@ def generate_recommendations(result):
 # RUN SERVER
 # ================================================================
 if __name__ == '__main__':
+    debug = True  # Set to False in production
+    # With debug on, the reloader re-runs this script in the process that
+    # actually serves; only that one needs the executor
+    if not debug or is_running_from_reloader():
+        inference.start()
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True  # Set to False in production
+        debug=debug
     )
\ No newline at end of file
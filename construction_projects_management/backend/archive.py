@@ -0,0 +1,137 @@
+"""Date-partitioned Parquet archive for cold prediction history."""
+
+from __future__ import annotations
+
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ml.config import ARCHIVE_COMPRESSION
+
+logger = logging.getLogger(__name__)
+
+# SQLite declared type -> Arrow type of the archived column
+_ARROW_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+
+_COMPARISONS = {
+    "=": lambda field, value: field == value,
+    "<": lambda field, value: field < value,
+    "<=": lambda field, value: field <= value,
+    ">": lambda field, value: field > value,
+    ">=": lambda field, value: field >= value,
+}
+
+
+def arrow_schema(columns: Sequence[Tuple[str, str]]) -> pa.Schema:
+    """Schema for (name, SQLite declared type) pairs."""
+    return pa.schema([(name, _ARROW_TYPES.get(sql_type.upper(), pa.string())) for name, sql_type in columns])
+
+
+def arrow_filter(predicates: Iterable[Tuple[str, Any]]) -> pc.Expression | None:
+    """AND of simple ``"<column> <op> ?"`` SQL predicates with their values."""
+    expression = None
+    for predicate, value in predicates:
+        column, op, placeholder = predicate.split()
+        if placeholder != "?" or op not in _COMPARISONS:
+            raise ValueError(f"Cannot translate predicate '{predicate}' for the archive.")
+        term = _COMPARISONS[op](pc.field(column), value)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def keyset_filter(created_at: str, row_id: int) -> pc.Expression:
+    """Arrow form of ``(created_at, id) < (?, ?)``."""
+    return (pc.field("created_at") < created_at) | (
+        (pc.field("created_at") == created_at) & (pc.field("id") < row_id)
+    )
+
+
+class ColdArchive:
+    """Parquet files under ``root/<table>/date=YYYY-MM-DD/``.
+
+    One file is written per (table, day) and archival batch. Files are first
+    written under a temporary name and renamed into place; the repository
+    records them in its ``archive_partitions`` manifest in the same
+    transaction that deletes the archived rows, so a file missing from the
+    manifest is left over from an interrupted run and can be removed.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def write(
+        self, table: str, date: str, records: List[Dict[str, Any]], columns: Sequence[Tuple[str, str]]
+    ) -> str:
+        """Write one partition file of row dicts; returns its path relative to ``root``."""
+        relative = Path(table) / f"date={date}" / f"part-{uuid.uuid4().hex}.parquet"
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        rows = pa.Table.from_pylist(records, schema=arrow_schema(columns))
+        pq.write_table(rows, temporary, compression=ARCHIVE_COMPRESSION)
+        os.replace(temporary, path)
+        return relative.as_posix()
+
+    def remove_orphans(self, table: str, known: Iterable[str]) -> int:
+        """Delete files of ``table`` that are not in ``known`` (relative paths)."""
+        known = set(known)
+        removed = 0
+        for path in (self.root / table).glob("date=*/*"):
+            if path.relative_to(self.root).as_posix() not in known:
+                path.unlink()
+                removed += 1
+        if removed:
+            logger.warning("Removed %d unrecorded archive files of %s", removed, table)
+        return removed
+
+    def read_newest(
+        self,
+        partitions: Sequence[Tuple[str, str]],
+        columns: Sequence[str],
+        expression: pc.Expression | None,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """The newest ``limit`` matching rows by (created_at, id).
+
+        ``partitions`` are (date, relative path) pairs, newest date first.
+        Reading stops at the first older day once ``limit`` rows are
+        collected, since every row of an older day sorts after them.
+        """
+        collected: List[Dict[str, Any]] = []
+        current = None
+        for date, relative in partitions:
+            if date != current and len(collected) >= limit:
+                break
+            current = date
+            path = self.root / relative
+            available = set(pq.read_schema(path).names)
+            table = pq.read_table(
+                path, columns=[name for name in columns if name in available], filters=expression
+            )
+            for row in table.to_pylist():
+                collected.append({name: row.get(name) for name in columns})
+        collected.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        return collected[:limit]
+
+    def iter_rows(
+        self,
+        relative: str,
+        columns: Sequence[str],
+        expression: pc.Expression | None,
+        batch_size: int,
+    ) -> Iterator[List[tuple]]:
+        """Matching rows of one file in stored order, up to ``batch_size`` at a time."""
+        dataset = ds.dataset(self.root / relative, format="parquet")
+        present = [name for name in columns if name in dataset.schema.names]
+        for batch in dataset.to_batches(columns=present, filter=expression, batch_size=batch_size):
+            if batch.num_rows:
+                values = batch.to_pydict()
+                missing = [None] * batch.num_rows
+                yield list(zip(*(values.get(name, missing) for name in columns)))
@@ -0,0 +1,26 @@
+"""Entry-point for moving old prediction history into the Parquet archive."""
+
+import argparse
+import json
+
+from ml.config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+from storage import PredictionRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive rows older than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--vacuum", action="store_true", help="shrink the database file afterwards")
+    args = parser.parse_args()
+
+    repo = PredictionRepository(write_behind=False)
+    try:
+        result = repo.archive_older_than(args.days, batch_size=args.batch_size, vacuum=args.vacuum)
+    finally:
+        repo.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
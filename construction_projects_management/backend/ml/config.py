@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 
@@ -17,6 +18,124 @@ BACKGROUND_SAMPLE_PATH = ARTIFACT_DIR / f"background_{MODEL_VERSION}.parquet"
 PREDICTION_DB_PATH = BASE_DIR / "data" / "predictions.db"
 PREDICTION_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+# SQLite connection pool: WAL journal, synchronous level (OFF/NORMAL/FULL/EXTRA),
+# how long a writer waits for a lock held by another process, and how many
+# idle reader connections are kept for reuse.
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_READ_POOL_SIZE = 8
+
+# Largest page the history endpoints return
+HISTORY_MAX_LIMIT = 1000
+
+# Rows per chunk fetched and streamed by the history export endpoints
+EXPORT_CHUNK_SIZE = 5000
+
+# Longest window the dashboard trend endpoint serves, per rollup granularity
+DASHBOARD_TREND_MAX_DAYS = {"hour": 31, "day": 366}
+
+# Prediction payloads are stored as zlib-compressed JSON at this level (1-9)
+PAYLOAD_COMPRESSION_LEVEL = 6
+
+# Retention: rows older than ARCHIVE_AFTER_DAYS are moved, ARCHIVE_BATCH_SIZE
+# at a time, into date-partitioned Parquet files in <db>.archive/ next to the
+# database (python archive_predictions.py). History queries read both.
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 20_000
+ARCHIVE_COMPRESSION = "zstd"
+
+# Write-behind persistence: when enabled, prediction rows are queued and a
+# background thread commits them in groups instead of on the request thread.
+# WRITE_BEHIND_FULL_POLICY decides what happens when the queue is full:
+# "block" the caller, "drop" the row, or "spill" it to <db>.spill.jsonl next
+# to the database (replayed when the next writer starts).
+PREDICTION_WRITE_BEHIND = False
+WRITE_BEHIND_MAX_QUEUE = 10_000
+WRITE_BEHIND_BATCH_SIZE = 500
+WRITE_BEHIND_LINGER_SECONDS = 0.05
+WRITE_BEHIND_FULL_POLICY = "block"
+
+# Tree inference engine per model: "native" (library predict) or "flat"
+# (ml.trees, verified against native at load). Keys: point/lower/upper for the
+# cost service, classifier/regressor/ensemble for the delay predictor, or "default".
+TREE_ENGINES: dict = {"default": "native"}
+
+# Prediction result cache (per service)
+PREDICTION_CACHE_SIZE = 2048
+PREDICTION_CACHE_TTL_SECONDS = 600.0
+
+# Micro-batching of concurrent single predictions (per service): requests that
+# arrive within PREDICTION_BATCH_WINDOW_MS of each other are scored in one
+# model call of at most PREDICTION_BATCH_MAX_SIZE rows. A window of 0 disables it.
+PREDICTION_BATCH_WINDOW_MS = 2.0
+PREDICTION_BATCH_MAX_SIZE = 32
+
+# Load the delay ensemble on its first use instead of at startup; its arrays are
+# memory-mapped (read-only, shared between workers) when stored uncompressed.
+DELAY_ENSEMBLE_LAZY = True
+DELAY_ENSEMBLE_MMAP_MODE = "r"
+
+# use_ensemble="auto": escalate to the ensemble only when the delay probability
+# is within BAND of the decision threshold; members are added in weight order
+# until the running weighted estimate moves by less than TOLERANCE_DAYS.
+DELAY_CASCADE_BAND = 0.15
+DELAY_CASCADE_TOLERANCE_DAYS = 1.0
+DELAY_CASCADE_MIN_MEMBERS = 2
+
+# Cost explanation modes: "none", "fast" (path attribution on the flat tree
+# engine), "full" (TreeSHAP) or "auto" (richest mode whose measured latency
+# still fits the request's budget).
+EXPLAIN_MODES = ("none", "fast", "full")
+EXPLAIN_DEFAULT_MODE = "auto"
+EXPLAIN_LATENCY_BUDGET_MS = 250.0
+
+# Sensitivity surfaces: grid size cap and rows scored per vectorized chunk
+SENSITIVITY_MAX_POINTS = 10_000
+SENSITIVITY_CHUNK_SIZE = 4096
+
+# Monte Carlo uncertainty simulation. Samples are scored in chunks (memory is
+# bounded by the chunk size); percentiles come from a fixed-bin streaming
+# histogram of the overrun percent over HIST_RANGE. MONTE_CARLO_WORKERS and
+# START_METHOD size the engine's process pool; with INFERENCE_MODE = "process"
+# the API runs the chunks on the inference workers instead.
+MONTE_CARLO_MAX_SAMPLES = 200_000
+MONTE_CARLO_CHUNK_SIZE = 5000
+MONTE_CARLO_WORKERS = min(4, os.cpu_count() or 1)
+MONTE_CARLO_START_METHOD = "spawn"
+MONTE_CARLO_HIST_RANGE = (-50.0, 200.0)
+MONTE_CARLO_HIST_BINS = 2500
+
+# Portfolio risk aggregation. Draws are simulated in blocks of at most
+# PORTFOLIO_BLOCK_ELEMENTS project-draws; only per-draw totals are kept.
+PORTFOLIO_MAX_PROJECTS = 10_000
+PORTFOLIO_MAX_DRAWS = 20_000
+PORTFOLIO_BLOCK_ELEMENTS = 2_000_000
+
+# Inference executor for the prediction, simulation and batch endpoints:
+# "inline" (request thread), "thread" (bounded thread pool) or "process"
+# (pool of pre-warmed worker processes that load the models once, so heavy
+# scoring and SHAP never hold the web process's GIL). Requests give up after
+# INFERENCE_TIMEOUT_SECONDS unless they pass their own "timeout_ms". Caches
+# and micro-batching stay in the web process in front of the executor. Each
+# process worker holds a private copy of every model, so serve.py workers
+# (which already share the models copy-on-write) always use "thread".
+INFERENCE_MODES = ("inline", "thread", "process")
+INFERENCE_MODE = "thread"
+INFERENCE_WORKERS = min(2, os.cpu_count() or 1)
+INFERENCE_START_METHOD = "spawn"
+INFERENCE_TIMEOUT_SECONDS = 30.0
+INFERENCE_READY_TIMEOUT_SECONDS = 120
+
+# Production serving (python serve.py): the master process loads every model
+# and forks SERVE_WORKERS workers that share those pages copy-on-write; each
+# worker handles up to SERVE_THREADS requests at a time.
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 5000
+SERVE_WORKERS = os.cpu_count() or 1
+SERVE_THREADS = 8
+SERVE_BACKLOG = 1024
+SERVE_READY_TIMEOUT_SECONDS = 120
+
 # Monitoring thresholds
 DRIFT_ZSCORE_THRESHOLD = 3.0
 ALERT_THRESHOLD_PERCENT = 25.0
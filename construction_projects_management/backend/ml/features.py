@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -49,11 +49,127 @@ DERIVED_FEATURES: List[str] = [
 
 ALL_FEATURES = BASE_NUMERIC_FEATURES + DERIVED_FEATURES + CATEGORICAL_FEATURES
 
+_EPS = 1e-6
+
+# Derived feature -> (base fields it reads, formula). engineer_features and the
+# incremental recompute below both evaluate these, so they cannot drift apart.
+DERIVED_FEATURE_GRAPH: Dict[str, Tuple[Tuple[str, ...], Callable[[pd.DataFrame], pd.Series]]] = {
+    "cost_per_unit": (
+        ("final_project_cost", "totalunits"),
+        lambda df: df["final_project_cost"] / (df["totalunits"] + 1),
+    ),
+    "land_cost_ratio": (
+        ("totallandcost", "final_project_cost"),
+        lambda df: df["totallandcost"] / (df["final_project_cost"] + _EPS),
+    ),
+    "booking_rate": (
+        ("bookedunits", "totalunits"),
+        lambda df: df["bookedunits"] / (df["totalunits"] + _EPS),
+    ),
+    "collection_efficiency": (
+        ("totalreceivedamount", "totalsellingamount"),
+        lambda df: df["totalreceivedamount"] / (df["totalsellingamount"] + _EPS),
+    ),
+    "cashflow_pressure": (
+        ("final_project_cost", "totalreceivedamount"),
+        lambda df: (df["final_project_cost"] - df["totalreceivedamount"]) / (df["final_project_cost"] + _EPS),
+    ),
+    "govt_dependency": (
+        ("totalpayableamountgovernment", "final_project_cost"),
+        lambda df: df["totalpayableamountgovernment"] / (df["final_project_cost"] + _EPS),
+    ),
+    "unit_revenue_gap": (
+        ("bookedsellingamount", "totalreceivedamount", "bookedunits"),
+        lambda df: (df["bookedsellingamount"] - df["totalreceivedamount"]) / (df["bookedunits"] + 1),
+    ),
+    "duration_intensity": (
+        ("planned_duration_days", "totalunits"),
+        lambda df: df["planned_duration_days"] / (df["totalunits"] + 1),
+    ),
+    "progress_cost_ratio": (
+        ("progress_ratio", "final_project_cost"),
+        lambda df: df["progress_ratio"] / ((df["final_project_cost"] / 1e7) + 1),
+    ),
+}
+
+# Base field -> derived features that read it
+FEATURE_DEPENDENTS: Dict[str, List[str]] = {}
+for _feature, (_inputs, _) in DERIVED_FEATURE_GRAPH.items():
+    for _field in _inputs:
+        FEATURE_DEPENDENTS.setdefault(_field, []).append(_feature)
+
+
+def affected_features(fields: Iterable[str]) -> List[str]:
+    """Derived features (in DERIVED_FEATURES order) that depend on ``fields``."""
+    touched = {feature for field in fields for feature in FEATURE_DEPENDENTS.get(field, ())}
+    return [feature for feature in DERIVED_FEATURES if feature in touched]
+
+
+def _compute_derived(df: pd.DataFrame, features: Iterable[str]) -> None:
+    for feature in features:
+        df[feature] = DERIVED_FEATURE_GRAPH[feature][1](df)
+        df[feature] = pd.to_numeric(df[feature], errors='coerce').fillna(0.0)
+
+
+def apply_overrides(base: pd.DataFrame, overrides: Sequence[Mapping[str, object]]) -> pd.DataFrame:
+    """One row per override set: ``base`` (a single engineered row) with the
+    overrides applied and only the dependent derived features recomputed.
+
+    Override values are coerced like ``engineer_features`` inputs (numeric
+    fields to float with missing -> 0.0, categoricals to str); keys that are
+    not model inputs are ignored. The result matches running
+    ``engineer_features`` on the merged raw rows.
+    """
+    df = base.iloc[np.zeros(len(overrides), dtype=int)].reset_index(drop=True)
+    changed: Dict[str, None] = {}
+    for field in BASE_NUMERIC_FEATURES + CATEGORICAL_FEATURES:
+        rows = [i for i, override in enumerate(overrides) if field in override]
+        if not rows:
+            continue
+        values = pd.Series([overrides[i][field] for i in rows], dtype=object)
+        if field in CATEGORICAL_FEATURES:
+            values = values.astype(str)
+        else:
+            values = pd.to_numeric(values, errors='coerce').fillna(0.0).astype(float)
+        column = df[field].astype(object) if field in CATEGORICAL_FEATURES else df[field].copy()
+        column.iloc[rows] = values.to_numpy()
+        df[field] = column
+        changed[field] = None
+
+    _compute_derived(df, affected_features(changed))
+    return df
+
+
+def expand_row(base: pd.DataFrame, columns: Mapping[str, Sequence[object]]) -> pd.DataFrame:
+    """Columnar ``apply_overrides``: ``base`` (one engineered row) repeated
+    once per value, with each field in ``columns`` set from its array.
+
+    Meant for dense grids where every row overrides the same fields.
+    """
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    df = base.iloc[np.zeros(n_rows, dtype=int)].reset_index(drop=True)
+    for field, values in columns.items():
+        values = pd.Series(list(values) if not isinstance(values, np.ndarray) else values)
+        if field in CATEGORICAL_FEATURES:
+            df[field] = values.astype(str).to_numpy()
+        else:
+            df[field] = pd.to_numeric(values, errors='coerce').fillna(0.0).astype(float).to_numpy()
+    _compute_derived(df, affected_features(columns))
+    return df
+
+
+def to_model_frame(df: pd.DataFrame, feature_columns: Sequence[str]) -> pd.DataFrame:
+    """Model input columns of an engineered frame, categoricals as pandas categories."""
+    df = df.copy()
+    for col in CATEGORICAL_FEATURES:
+        if col in df.columns:
+            df[col] = df[col].astype(str).astype("category")
+    return df[list(feature_columns)]
+
 
 def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     """Create derived features aligned between training and inference."""
     df = df.copy()
-    eps = 1e-6
 
     # Ensure numeric columns are properly typed before calculations
     for col in BASE_NUMERIC_FEATURES:
@@ -71,26 +187,8 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     else:
         df["planned_duration_days"] = pd.to_numeric(df["planned_duration_days"], errors='coerce').fillna(0.0)
 
-    df["cost_per_unit"] = df["final_project_cost"] / (df["totalunits"] + 1)
-    df["land_cost_ratio"] = df["totallandcost"] / (df["final_project_cost"] + eps)
-    df["booking_rate"] = df["bookedunits"] / (df["totalunits"] + eps)
-    df["collection_efficiency"] = df["totalreceivedamount"] / (df["totalsellingamount"] + eps)
-    df["cashflow_pressure"] = (df["final_project_cost"] - df["totalreceivedamount"]) / (
-        df["final_project_cost"] + eps
-    )
-    df["govt_dependency"] = df["totalpayableamountgovernment"] / (df["final_project_cost"] + eps)
-    df["unit_revenue_gap"] = (df["bookedsellingamount"] - df["totalreceivedamount"]) / (
-        df["bookedunits"] + 1
-    )
-    df["duration_intensity"] = df["planned_duration_days"] / (df["totalunits"] + 1)
-    df["progress_cost_ratio"] = df["progress_ratio"] / (
-        (df["final_project_cost"] / 1e7) + 1
-    )
-
-    # Ensure all derived features are numeric
-    for col in DERIVED_FEATURES:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+    # Derived features from DERIVED_FEATURE_GRAPH, coerced to numeric
+    _compute_derived(df, DERIVED_FEATURES)
 
     return df
 
@@ -144,4 +242,27 @@ class DataValidator:
 
         return DataValidationResult(is_valid=not issues, issues=issues)
 
+    def validate_frame(self, df: pd.DataFrame) -> List[DataValidationResult]:
+        """Row-wise ``validate`` for a whole frame, with the same messages per row."""
+        issues: List[List[str]] = [[] for _ in range(len(df))]
+
+        for field in self.required_fields:
+            missing = df[field].isna().to_numpy() if field in df.columns else np.ones(len(df), dtype=bool)
+            for idx in np.flatnonzero(missing):
+                issues[idx].append(f"Field '{field}' is required but missing.")
+
+        for field, bounds in self.numeric_bounds.items():
+            if field not in df.columns:
+                continue
+            values = df[field]
+            present = values.notna().to_numpy()
+            checks = []
+            if "min" in bounds:
+                checks.append((present & (values < bounds["min"]).to_numpy(), "below minimum", "<", bounds["min"]))
+            if "max" in bounds:
+                checks.append((present & (values > bounds["max"]).to_numpy(), "above maximum", ">", bounds["max"]))
+            for mask, label, op, limit in checks:
+                for idx in np.flatnonzero(mask):
+                    issues[idx].append(f"{field} {label} ({values.iloc[idx]} {op} {limit}).")
 
+        return [DataValidationResult(is_valid=not row_issues, issues=row_issues) for row_issues in issues]
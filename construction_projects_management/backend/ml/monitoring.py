@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass
 from typing import Dict, List
 
@@ -53,4 +54,67 @@ class DriftMonitor:
 
         return signals
 
+    def track_frame(self, df: pd.DataFrame) -> List[List[DriftSignal]]:
+        """``track`` for every row of ``df`` using column-wise z-scores."""
+        signals: List[List[DriftSignal]] = [[] for _ in range(len(df))]
+        for feature, stats in self.reference_stats.items():
+            if feature not in df.columns:
+                continue
+            std = stats.get("std") or 0.0
+            if std == 0:
+                continue
+
+            values = pd.to_numeric(df[feature], errors="coerce").to_numpy(dtype=float)
+            zscores = np.abs((values - stats["mean"]) / std)
+            for idx in np.flatnonzero(zscores >= DRIFT_ZSCORE_THRESHOLD):
+                signals[idx].append(
+                    DriftSignal(
+                        feature=feature,
+                        zscore=float(zscores[idx]),
+                        current_value=float(values[idx]),
+                        reference_mean=float(stats["mean"]),
+                    )
+                )
+        return signals
+
 
+def current_rss_mb() -> float | None:
+    """Resident set size of this process in MiB (None if it cannot be read)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def process_memory_mb(pid: int | str = "self") -> Dict[str, float] | None:
+    """RSS, PSS and shared/private resident memory of a process in MiB.
+
+    PSS charges each shared page to the processes mapping it in equal parts,
+    so summing it over forked workers gives their real combined footprint.
+    Linux only (/proc/<pid>/smaps_rollup); None elsewhere.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
@@ -0,0 +1,220 @@
+"""Array-based replica of fitted sklearn preprocessors for low-overhead inference."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, RobustScaler, StandardScaler
+
+
+# Elementwise ops applied to a numeric block, in fit order: ("fill" | "sub" | "div" | "mul" | "add", vector)
+NumericOp = Tuple[str, np.ndarray]
+
+
+@dataclass
+class _NumericBlock:
+    columns: np.ndarray
+    out: slice
+    ops: List[NumericOp] = field(default_factory=list)
+
+
+@dataclass
+class _CategoricalBlock:
+    columns: np.ndarray
+    offsets: List[int]
+    lookups: List[Dict[object, int]]
+    fill_values: List[object]
+    missing_values: object
+    handle_unknown: str
+
+
+class CompiledPreprocessor:
+    """Flat NumPy version of a fitted ColumnTransformer.
+
+    Scaler/imputer parameters become plain vectors and one-hot categories become
+    category -> output index hash maps, so one row or a whole batch is encoded
+    with a handful of vectorized ops. Only dense scalers, imputers and one-hot
+    encoders are supported; anything else raises NotImplementedError so callers
+    can keep using the original transformer, which stays on ``fallback``.
+    """
+
+    def __init__(
+        self,
+        transformer: ColumnTransformer,
+        numeric_columns: Sequence[str],
+        categorical_columns: Sequence[str],
+    ):
+        self.fallback = transformer
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.categories: Dict[str, List[object]] = {}
+        self._numeric_blocks: List[_NumericBlock] = []
+        self._categorical_blocks: List[_CategoricalBlock] = []
+        self.n_output = 0
+        self._compile()
+
+    # ------------------------------------------------------------------ #
+    # Compilation
+    # ------------------------------------------------------------------ #
+    def _compile(self):
+        if not isinstance(self.fallback, ColumnTransformer):
+            raise NotImplementedError(f"unsupported transformer {type(self.fallback).__name__}")
+        if getattr(self.fallback, "sparse_output_", False):
+            raise NotImplementedError("sparse output")
+
+        num_index = {c: i for i, c in enumerate(self.numeric_columns)}
+        cat_index = {c: i for i, c in enumerate(self.categorical_columns)}
+
+        for name, trans, columns in self.fallback.transformers_:
+            if trans == "drop" or len(columns) == 0:
+                continue
+            columns = list(columns)
+            steps = trans.steps if isinstance(trans, Pipeline) else [(name, trans)]
+            steps = [est for _, est in steps if est != "passthrough"]
+
+            if steps and isinstance(steps[-1], OneHotEncoder):
+                missing = [c for c in columns if c not in cat_index]
+                if missing:
+                    raise NotImplementedError(f"unknown categorical columns {missing}")
+                self._compile_categorical(columns, steps, cat_index)
+            else:
+                missing = [c for c in columns if c not in num_index]
+                if missing:
+                    raise NotImplementedError(f"unknown numeric columns {missing}")
+                self._compile_numeric(columns, steps, num_index)
+
+    def _compile_numeric(self, columns, steps, num_index):
+        block = _NumericBlock(
+            columns=np.array([num_index[c] for c in columns]),
+            out=slice(self.n_output, self.n_output + len(columns)),
+        )
+        for est in steps:
+            if isinstance(est, SimpleImputer):
+                if est.add_indicator or not _is_nan_marker(est.missing_values):
+                    raise NotImplementedError("imputer indicator / custom missing marker")
+                block.ops.append(("fill", est.statistics_.astype(float)))
+            elif isinstance(est, RobustScaler):
+                if est.center_ is not None:
+                    block.ops.append(("sub", est.center_))
+                if est.scale_ is not None:
+                    block.ops.append(("div", est.scale_))
+            elif isinstance(est, StandardScaler):
+                if est.with_mean:
+                    block.ops.append(("sub", est.mean_))
+                if est.with_std:
+                    block.ops.append(("div", est.scale_))
+            elif isinstance(est, MinMaxScaler):
+                if est.clip:
+                    raise NotImplementedError("MinMaxScaler(clip=True)")
+                block.ops.append(("mul", est.scale_))
+                block.ops.append(("add", est.min_))
+            else:
+                raise NotImplementedError(f"unsupported numeric step {type(est).__name__}")
+        self._numeric_blocks.append(block)
+        self.n_output += len(columns)
+
+    def _compile_categorical(self, columns, steps, cat_index):
+        *pre, encoder = steps
+        fill_values: List[object] = [None] * len(columns)
+        missing_values: object = None
+        for est in pre:
+            if not isinstance(est, SimpleImputer) or est.add_indicator:
+                raise NotImplementedError(f"unsupported categorical step {type(est).__name__}")
+            fill_values = list(est.statistics_)
+            missing_values = est.missing_values
+        if encoder.drop_idx_ is not None or getattr(encoder, "_infrequent_enabled", False):
+            raise NotImplementedError("OneHotEncoder with drop/infrequent categories")
+        if encoder.handle_unknown not in ("ignore", "error"):
+            raise NotImplementedError(f"handle_unknown={encoder.handle_unknown}")
+
+        offsets, lookups = [], []
+        for col, cats in zip(columns, encoder.categories_):
+            offsets.append(self.n_output)
+            lookups.append({value: idx for idx, value in enumerate(cats)})
+            self.categories[col] = list(cats)
+            self.n_output += len(cats)
+
+        self._categorical_blocks.append(
+            _CategoricalBlock(
+                columns=np.array([cat_index[c] for c in columns]),
+                offsets=offsets,
+                lookups=lookups,
+                fill_values=fill_values,
+                missing_values=missing_values,
+                handle_unknown=encoder.handle_unknown,
+            )
+        )
+
+    # ------------------------------------------------------------------ #
+    # Inference
+    # ------------------------------------------------------------------ #
+    def transform_arrays(self, numeric: np.ndarray, categorical: np.ndarray) -> np.ndarray:
+        """Encode ``numeric`` (n x numeric_columns) and ``categorical`` (n x categorical_columns)."""
+        numeric = np.asarray(numeric, dtype=float)
+        n_rows = numeric.shape[0]
+        out = np.zeros((n_rows, self.n_output))
+
+        for block in self._numeric_blocks:
+            values = numeric[:, block.columns]
+            for op, vec in block.ops:
+                if op == "fill":
+                    values = np.where(np.isnan(values), vec, values)
+                elif op == "sub":
+                    values -= vec
+                elif op == "div":
+                    values /= vec
+                elif op == "mul":
+                    values *= vec
+                else:
+                    values += vec
+            out[:, block.out] = values
+
+        rows = np.arange(n_rows)
+        for block in self._categorical_blocks:
+            for col, offset, lookup, fill in zip(
+                block.columns, block.offsets, block.lookups, block.fill_values
+            ):
+                values = [row[col] for row in categorical]
+                if fill is not None:
+                    values = [fill if _is_missing(v, block.missing_values) else v for v in values]
+                codes = np.fromiter((lookup.get(v, -1) for v in values), dtype=int, count=n_rows)
+                known = codes >= 0
+                if block.handle_unknown == "error" and not known.all():
+                    unknown = sorted({str(v) for v, ok in zip(values, known) if not ok})
+                    raise ValueError(f"Found unknown categories {unknown} during transform")
+                out[rows[known], offset + codes[known]] = 1.0
+
+        return out
+
+    def transform(self, frame: pd.DataFrame) -> np.ndarray:
+        """Drop-in for ``ColumnTransformer.transform`` on a frame with named columns."""
+        return self.transform_arrays(
+            frame[self.numeric_columns].to_numpy(dtype=float),
+            frame[self.categorical_columns].to_numpy(dtype=object),
+        )
+
+    def verify(self, numeric: np.ndarray, categorical: np.ndarray) -> bool:
+        """True if the compiled transform reproduces the sklearn output exactly."""
+        frame = pd.DataFrame(numeric, columns=self.numeric_columns)
+        for idx, col in enumerate(self.categorical_columns):
+            frame[col] = [row[idx] for row in categorical]
+        expected = np.asarray(self.fallback.transform(frame), dtype=float)
+        compiled = self.transform_arrays(numeric, categorical)
+        return expected.shape == compiled.shape and np.array_equal(expected, compiled)
+
+
+def _is_nan_marker(value) -> bool:
+    return isinstance(value, float) and np.isnan(value)
+
+
+def _is_missing(value, marker) -> bool:
+    """SimpleImputer's test: a NaN marker matches float NaN only (None stays a category)."""
+    if _is_nan_marker(marker):
+        return isinstance(value, float) and np.isnan(value)
+    return value is marker or value == marker
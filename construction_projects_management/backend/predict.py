@@ -3,7 +3,38 @@ import joblib
 import numpy as np
 import pandas as pd
 import os
+import math
+import threading
+import time
 from copy import deepcopy
+from numbers import Real
+
+from ml.config import (
+    DELAY_CASCADE_BAND,
+    DELAY_CASCADE_MIN_MEMBERS,
+    DELAY_CASCADE_TOLERANCE_DAYS,
+    DELAY_ENSEMBLE_LAZY,
+    DELAY_ENSEMBLE_MMAP_MODE,
+    PREDICTION_BATCH_MAX_SIZE,
+    PREDICTION_BATCH_WINDOW_MS,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL_SECONDS,
+    TREE_ENGINES,
+)
+from ml.monitoring import current_rss_mb
+from ml.preprocessing import CompiledPreprocessor
+from ml.trees import resolve_engine, select_engine
+from services.batching import MicroBatcher
+from services.cache import PredictionCache, canonical_key, file_fingerprint
+
+# Defaults for missing raw inputs (shared by both feature paths)
+FEATURE_DEFAULTS = {
+    'final_project_cost': 0, 'totalincurredcost': 0, 'totalunits': 1,
+    'totalsquarefootbuild': 1, 'totallandcost': 0, 'budget_overrun_percent': 0,
+    'progress_ratio': 0.0, 'bookedunits': 0, 'land_utilization': 0.0,
+    'planned_duration_days': 1, 'actual_duration_days': 0,
+    'avg_temp': 27.0, 'total_rain': 0.0
+}
 
 # ============================================================================
 # FEATURE ENGINEERING (MUST MATCH TRAINING CODE EXACTLY!)
@@ -15,16 +46,7 @@ def create_features(df_in):
     """
     df = df_in.copy()
     
-    # Define defaults for missing values
-    defaults = {
-        'final_project_cost': 0, 'totalincurredcost': 0, 'totalunits': 1,
-        'totalsquarefootbuild': 1, 'totallandcost': 0, 'budget_overrun_percent': 0,
-        'progress_ratio': 0.0, 'bookedunits': 0, 'land_utilization': 0.0,
-        'planned_duration_days': 1, 'actual_duration_days': 0,
-        'avg_temp': 27.0, 'total_rain': 0.0
-    }
-    
-    for col, val in defaults.items():
+    for col, val in FEATURE_DEFAULTS.items():
         if col in df.columns:
             df[col] = df[col].fillna(val)
         else:
@@ -127,6 +149,195 @@ def create_features(df_in):
     return df
 
 
+# ============================================================================
+# MODEL INPUT COLUMNS (order expected by the fitted preprocessors)
+# ============================================================================
+NUM_FEATURES = [
+    "final_project_cost", "totalincurredcost", "totallandcost",
+    "cost_per_unit", "cost_per_sqft", "land_cost_ratio", "cost_efficiency",
+    "budget_overrun_percent", "overrun_severity", "has_overrun",
+    "overrun_category", "overrun_penalty",
+    "progress_ratio", "booking_rate", "utilization_efficiency",
+    "progress_stage", "progress_risk", "is_early_stage",
+    "bookedunits", "totalunits", "totalsquarefootbuild", "land_utilization",
+    "planned_duration_days", "actual_duration_days", "duration_ratio",
+    "duration_per_unit", "duration_per_sqft",
+    "project_complexity", "size_complexity",
+    "avg_temp", "total_rain", "weather_risk", "temp_deviation",
+    "weather_duration", "extreme_weather",
+    "cost_duration_interaction", "overrun_progress_crisis",
+    "cost_progress_risk", "booking_lag", "severe_booking_lag",
+    "is_large_project", "is_high_cost", "is_long_duration",
+    "high_risk_flag", "critical_risk_flag", "risk_score"
+]
+
+CAT_FEATURES = ["final_project_type", "promotertype", "districttype"]
+RISK_SCORE_INDEX = NUM_FEATURES.index("risk_score")
+
+
+# ============================================================================
+# COMPILED SINGLE-ROW FEATURES (scalar mirror of create_features)
+# ============================================================================
+def _div(a, b):
+    """IEEE division like pandas/NumPy: x/0 -> ±inf, 0/0 -> nan."""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _maximum0(x):
+    # np.maximum propagates NaN, builtin max() would not
+    return x if x != x else max(0, x)
+
+
+def _cut(value, edges):
+    """Right-closed bin index like pd.cut(...).astype(int)."""
+    for idx in range(len(edges) - 1):
+        if edges[idx] < value <= edges[idx + 1]:
+            return idx
+    raise ValueError("Cannot convert float NaN to integer")
+
+
+_OVERRUN_BINS = (-math.inf, 0, 5, 15, 25, math.inf)
+_PROGRESS_BINS = (0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def compile_features(data, out=None):
+    """
+    Scalar equivalent of create_features for a single input dict.
+
+    Computes the numeric model inputs without building a DataFrame and writes
+    them into a float vector laid out in NUM_FEATURES order (`out` fills a
+    preallocated row, e.g. of a batch matrix). The pandas create_features
+    stays the reference; tests/test_features.py checks both agree.
+    """
+    if out is None:
+        out = np.empty(len(NUM_FEATURES))
+
+    v = {}
+    for col, default in FEATURE_DEFAULTS.items():
+        value = data.get(col)
+        v[col] = default if value is None or value != value else value
+
+    cost = v['final_project_cost']
+    incurred = v['totalincurredcost']
+    units = v['totalunits']
+    sqft = v['totalsquarefootbuild']
+    land = v['totallandcost']
+    overrun = v['budget_overrun_percent']
+    progress = v['progress_ratio']
+    booked = v['bookedunits']
+    land_util = v['land_utilization']
+    planned = v['planned_duration_days']
+    actual = v['actual_duration_days']
+    temp = v['avg_temp']
+    rain = v['total_rain']
+
+    # ===== PROGRESS / DURATION (needed by later features) =====
+    booking_rate = _div(booked, units)
+    duration_ratio = _div(actual if actual > 0 else planned, planned)
+    booking_lag = _maximum0(progress - booking_rate)
+    temp_deviation = abs(temp - 27)
+    overrun_scaled = overrun / 15
+
+    risk_score = (
+        (overrun * 2) +
+        ((1 - progress) * 30) +
+        (booking_lag * 20) +
+        (duration_ratio - 1) * 10
+    )
+    if risk_score == risk_score:
+        risk_score = min(max(risk_score, 0), 100)
+
+    out[:] = (
+        cost,
+        incurred,
+        land,
+        _div(cost, units),
+        _div(cost, sqft),
+        _div(land, cost + 1),
+        _div(sqft, cost / 1e6),
+        overrun,
+        overrun * cost / 1e6,
+        overrun > 0,
+        _cut(overrun, _OVERRUN_BINS),
+        overrun_scaled * overrun_scaled if overrun > 15 else overrun_scaled,
+        progress,
+        booking_rate,
+        land_util * progress,
+        _cut(progress, _PROGRESS_BINS),
+        (0.3 - progress) * 3 if progress < 0.3 else 0,
+        progress < 0.2,
+        booked,
+        units,
+        sqft,
+        land_util,
+        planned,
+        actual,
+        duration_ratio,
+        _div(planned, units),
+        _div(planned, sqft),
+        units * cost / 1e9,
+        units * sqft / 1e6,
+        temp,
+        rain,
+        rain * planned / 1000,
+        temp_deviation,
+        rain * planned / 365,
+        temp_deviation > 5 or rain > 3000,
+        cost * planned / 1e9,
+        overrun * (1 - progress) * 2,
+        (cost / 50e6) * (0.4 - progress) * 10 if cost > 50e6 and progress < 0.4 else 0,
+        booking_lag,
+        booking_lag > 0.3,
+        units > 100,
+        cost > 50e6,
+        planned > 500,
+        (
+            overrun > 10 or
+            progress < 0.35 or
+            duration_ratio > 1.15 or
+            (overrun > 5 and progress < 0.5)
+        ),
+        (
+            overrun > 20 or
+            progress < 0.2 or
+            (overrun > 15 and progress < 0.3)
+        ),
+        risk_score,
+    )
+
+    # Clean infinities and NaNs
+    np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    np.clip(out, -1e10, 1e10, out=out)
+    return out
+
+
+def _random_payload(rng):
+    """Randomized raw input for parity checks, including gaps and edge values."""
+    payload = {
+        'final_project_type': 'Residential/Group Housing',
+        'promotertype': 'COMPANY',
+        'districttype': 'Ahmedabad',
+    }
+    for col, default in FEATURE_DEFAULTS.items():
+        roll = rng.random()
+        if roll < 0.1:
+            continue
+        if roll < 0.15:
+            payload[col] = None
+        elif roll < 0.2:
+            payload[col] = 0
+        elif roll < 0.3:
+            payload[col] = float(rng.choice([5, 15, 25, 50e6, 1e11, -3.0]))
+        else:
+            payload[col] = float(rng.uniform(0, 2) * (default or 1) * 10 ** rng.integers(0, 9))
+    payload['progress_ratio'] = float(rng.choice([rng.uniform(0.001, 1.0), 0.2, 0.4, 1.0]))
+    return payload
+
+
 # ============================================================================
 # DELAY PREDICTOR CLASS
 # ============================================================================
@@ -148,9 +359,14 @@ class DelayPredictor:
             return bool(value)
         return value
     
-    def __init__(self, model_dir=None):
+    def __init__(self, model_dir=None, tree_engines=None, lazy_ensemble=None):
         """
         Load models from the correct location.
+
+        tree_engines picks "native" or "flat" inference per model
+        (classifier / regressor / ensemble); defaults to ml.config.TREE_ENGINES.
+        lazy_ensemble defers loading ensemble_models.pkl until the first
+        ensemble prediction; defaults to ml.config.DELAY_ENSEMBLE_LAZY.
         """
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -179,25 +395,188 @@ class DelayPredictor:
         except FileNotFoundError:
             raise FileNotFoundError(f"Missing regressor.pkl or regressor_preprocessor.pkl")
 
+        # Ensemble: only the (tiny) weights are read here; the models are loaded
+        # on first use by _load_ensemble()
+        self.ensemble_path = f'{model_dir}/delay/ensemble_models.pkl'
+        self.ensemble_models = None
+        self.ensemble_engines = None
+        self.ensemble_load_info = None
+        self._ensemble_lock = threading.Lock()
         try:
-            self.ensemble_models = joblib.load(f'{model_dir}/delay/ensemble_models.pkl')
             self.ensemble_weights = joblib.load(f'{model_dir}/delay/ensemble_weights.pkl')
-            print(f"✅ Ensemble loaded ({len(self.ensemble_models)} models)")
         except FileNotFoundError:
-            self.ensemble_models = None
+            self.ensemble_weights = None
+        self.ensemble_available = self.ensemble_weights is not None and os.path.exists(self.ensemble_path)
+        if not self.ensemble_available:
             self.ensemble_weights = None
             print("⚠️ Ensemble not found — using single model")
         
         self.threshold = 0.50
+
+        # Fast scalar feature path (False forces the pandas reference path)
+        self.compiled_features = True
+
+        # Flat NumPy encoders; the sklearn preprocessors remain the verified fallback
+        self.clf_encoder = self._compile_preprocessor(self.clf_preprocessor, "Classifier")
+        self.reg_encoder = self._compile_preprocessor(self.reg_preprocessor, "Regressor")
+
+        # Optional flat NumPy tree engines, checked against native predict on probe rows
+        self.tree_engines = TREE_ENGINES if tree_engines is None else tree_engines
+        probe = self._probe_inputs(self.clf_encoder.categories if self.clf_encoder else {})
+        X_clf_probe = self._transform(probe, self.clf_preprocessor, self.clf_encoder)
+        X_reg_probe = self._transform(probe, self.reg_preprocessor, self.reg_encoder)
+        self._reg_probe = X_reg_probe
+        self.classifier_engine = select_engine(
+            self.classifier, resolve_engine(self.tree_engines, "classifier"), X_clf_probe, "delay classifier"
+        )
+        self.regressor_engine = select_engine(
+            self.regressor, resolve_engine(self.tree_engines, "regressor"), X_reg_probe, "delay regressor"
+        )
+        lazy = DELAY_ENSEMBLE_LAZY if lazy_ensemble is None else lazy_ensemble
+        if self.ensemble_available:
+            if lazy:
+                print(f"✅ Ensemble available ({len(self.ensemble_weights)} models, loaded on first use)")
+            else:
+                self._load_ensemble()
+
+        self.cache = PredictionCache(
+            PREDICTION_CACHE_SIZE,
+            PREDICTION_CACHE_TTL_SECONDS,
+            fingerprint=self._model_fingerprint,
+        )
+        # Concurrent predict_cached misses are scored together (one vectorized pass)
+        self.batcher = MicroBatcher(
+            self.score_coalesced,
+            window_ms=PREDICTION_BATCH_WINDOW_MS,
+            max_batch_size=PREDICTION_BATCH_MAX_SIZE,
+        )
         print("✅ All models loaded successfully!")
 
+    def _model_fingerprint(self):
+        """Changes whenever a model object is swapped or a model file is replaced."""
+        delay_dir = os.path.join(self.model_dir, 'delay')
+        files = sorted(os.listdir(delay_dir)) if os.path.isdir(delay_dir) else []
+        return (
+            id(self.classifier_engine),
+            id(self.regressor_engine),
+            self.threshold,
+            file_fingerprint(*(os.path.join(delay_dir, f) for f in files)),
+        )
+
+    # -------------------------------
+    # LAZY ENSEMBLE
+    # -------------------------------
+    @property
+    def ensemble_loaded(self):
+        return self.ensemble_engines is not None
+
+    def _load_ensemble(self):
+        """
+        Load (once, thread-safe) and return the ensemble engines.
+
+        Arrays inside the pickle are memory-mapped read-only when the file is
+        uncompressed, so forked workers share those pages; compressed pickles
+        are loaded normally. Resident memory is reported before and after.
+        """
+        if self.ensemble_engines is not None or not self.ensemble_available:
+            return self.ensemble_engines
+
+        with self._ensemble_lock:
+            if self.ensemble_engines is not None:
+                return self.ensemble_engines
+
+            rss_before = current_rss_mb()
+            started = time.perf_counter()
+            models = joblib.load(self.ensemble_path, mmap_mode=DELAY_ENSEMBLE_MMAP_MODE)
+            ensemble_engine = resolve_engine(self.tree_engines, "ensemble")
+            engines = {
+                name: select_engine(model, ensemble_engine, self._reg_probe, f"delay ensemble '{name}'")
+                for name, model in models.items()
+            }
+            rss_after = current_rss_mb()
+
+            self.ensemble_load_info = {
+                'load_seconds': round(time.perf_counter() - started, 3),
+                'rss_before_mb': None if rss_before is None else round(rss_before, 1),
+                'rss_after_mb': None if rss_after is None else round(rss_after, 1),
+                'mmap_mode': DELAY_ENSEMBLE_MMAP_MODE,
+            }
+            self.ensemble_models = models
+            self.ensemble_engines = engines
+            delta = (
+                f", RSS {rss_before:.1f} → {rss_after:.1f} MB"
+                if rss_before is not None and rss_after is not None else ""
+            )
+            print(f"✅ Ensemble loaded ({len(models)} models in "
+                  f"{self.ensemble_load_info['load_seconds']:.2f}s{delta})")
+            return engines
+
+    def preload(self):
+        """Load everything that is otherwise loaded on first use (the ensemble)."""
+        self._load_ensemble()
+
+    def ensemble_info(self):
+        """Ensemble status for health/info endpoints; never triggers a load."""
+        return {
+            'available': self.ensemble_available,
+            'loaded': self.ensemble_loaded,
+            'models_count': len(self.ensemble_weights) if self.ensemble_available else 0,
+            'models': list(self.ensemble_models.keys()) if self.ensemble_loaded else [],
+            'load_info': self.ensemble_load_info,
+        }
+
+    # -------------------------------
+    # PREPROCESSOR COMPILATION
+    # -------------------------------
+    def _compile_preprocessor(self, preprocessor, name):
+        try:
+            encoder = CompiledPreprocessor(preprocessor, NUM_FEATURES, CAT_FEATURES)
+        except NotImplementedError as e:
+            print(f"⚠️ {name} preprocessor not compiled ({e}) — using sklearn transform")
+            return None
+
+        num, cats = self._probe_inputs(encoder.categories)
+        if not encoder.verify(num, cats):
+            print(f"⚠️ Compiled {name.lower()} preprocessor disagrees with sklearn — using sklearn transform")
+            return None
+        print(f"✅ {name} preprocessor compiled")
+        return encoder
+
+    @staticmethod
+    def _probe_inputs(categories, n_samples=64, seed=0):
+        """Random feature rows covering every known category plus an unseen one."""
+        rng = np.random.default_rng(seed)
+        num = np.vstack([compile_features(_random_payload(rng)) for _ in range(n_samples)])
+        cats = np.empty((n_samples, len(CAT_FEATURES)), dtype=object)
+        for j, col in enumerate(CAT_FEATURES):
+            choices = list(categories.get(col, [])) + ['__unseen__']
+            cats[:, j] = [choices[i % len(choices)] for i in rng.permutation(n_samples)]
+        return num, cats
+
+    def engine_name(self, engine, model):
+        """'flat' when a model is served by the NumPy tree engine, else 'native'."""
+        return 'native' if engine is model else 'flat'
+
+    def _transform(self, X, preprocessor, encoder):
+        """
+        Encode model inputs: X is either a (numeric, categorical) array pair
+        from the compiled paths or a DataFrame from the pandas reference path.
+        """
+        if isinstance(X, tuple):
+            if encoder is not None:
+                return encoder.transform_arrays(*X)
+            num, cats = X
+            X = pd.DataFrame(num, columns=NUM_FEATURES)
+            for j, col in enumerate(CAT_FEATURES):
+                X[col] = cats[:, j]
+        return preprocessor.transform(X)
+
     # -------------------------------
     # EXTREME RISK CHECK
     # -------------------------------
-    def _check_extreme_risk(self, data, df_feat):
+    def _check_extreme_risk(self, data, risk_score):
         overrun = data.get('budget_overrun_percent', 0)
         progress = data.get('progress_ratio', 1)
-        risk_score = df_feat['risk_score'].values[0]
 
         if overrun > 20 and progress < 0.25:
             return True, 0.85, f"Critical: {overrun:.0f}% overrun at {progress*100:.0f}% progress"
@@ -212,40 +591,22 @@ class DelayPredictor:
     # MAIN PREDICT FUNCTION
     # -------------------------------
     def predict_single(self, project_dict, use_ensemble=False, enable_override=True, debug=False):
+        """
+        Predict one project.
 
-        df = pd.DataFrame([project_dict])
+        use_ensemble: False (single regressor), True (full weighted ensemble)
+        or "auto" (cascade: single regressor unless the probability is within
+        cascade_band of the threshold, then ensemble members with early stop).
+        The result's inference_path says which of these actually ran.
+        """
 
-        df_feat = create_features(df)
-        is_extreme, adj_prob, reason = self._check_extreme_risk(project_dict, df_feat)
+        X, risk_score = self._single_row_inputs(project_dict)
+        is_extreme, adj_prob, reason = self._check_extreme_risk(project_dict, risk_score)
 
         # Phase 1 — Classification
-        num_features = [
-            "final_project_cost", "totalincurredcost", "totallandcost",
-            "cost_per_unit", "cost_per_sqft", "land_cost_ratio", "cost_efficiency",
-            "budget_overrun_percent", "overrun_severity", "has_overrun",
-            "overrun_category", "overrun_penalty",
-            "progress_ratio", "booking_rate", "utilization_efficiency",
-            "progress_stage", "progress_risk", "is_early_stage",
-            "bookedunits", "totalunits", "totalsquarefootbuild", "land_utilization",
-            "planned_duration_days", "actual_duration_days", "duration_ratio",
-            "duration_per_unit", "duration_per_sqft",
-            "project_complexity", "size_complexity",
-            "avg_temp", "total_rain", "weather_risk", "temp_deviation",
-            "weather_duration", "extreme_weather",
-            "cost_duration_interaction", "overrun_progress_crisis",
-            "cost_progress_risk", "booking_lag", "severe_booking_lag",
-            "is_large_project", "is_high_cost", "is_long_duration",
-            "high_risk_flag", "critical_risk_flag", "risk_score"
-        ]
-
-        cat_features = ["final_project_type", "promotertype", "districttype"]
-
-        available_num = [c for c in num_features if c in df_feat.columns]
-        available_cat = [c for c in cat_features if c in df_feat.columns]
-        X = df_feat[available_num + available_cat]
 
-        X_clf = self.clf_preprocessor.transform(X)
-        prob_raw = self.classifier.predict_proba(X_clf)[:, 1][0]
+        X_clf = self._transform(X, self.clf_preprocessor, self.clf_encoder)
+        prob_raw = self.classifier_engine.predict_proba(X_clf)[:, 1][0]
 
         if enable_override and is_extreme and adj_prob:
             prob = max(prob_raw, adj_prob)
@@ -257,15 +618,129 @@ class DelayPredictor:
         pred_delayed = prob >= self.threshold
 
         # Phase 2 — Regression
-        pred_days = 0
+        pred_days, members = 0, 0
         if pred_delayed:
-            X_reg = self.reg_preprocessor.transform(X)
-            if use_ensemble and self.ensemble_models:
-                predictions = [np.expm1(m.predict(X_reg)[0]) for m in self.ensemble_models.values()]
-                pred_days = int(np.average(predictions, weights=self.ensemble_weights))
+            X_reg = self._transform(X, self.reg_preprocessor, self.reg_encoder)
+            days, used = self._predict_delay_days(X_reg, use_ensemble, np.array([prob]))
+            pred_days, members = days[0], int(used[0])
+
+        result = self._build_result(prob, pred_delayed, pred_days, override)
+        result.update(self._inference_path(pred_delayed, use_ensemble, members))
+        return result
+
+    def _single_row_inputs(self, project_dict):
+        """Model input frame and risk score for one project."""
+        if self.compiled_features and self._is_clean_row(project_dict):
+            num = compile_features(project_dict)
+            cats = np.array([[project_dict[col] for col in CAT_FEATURES]], dtype=object)
+            return (num[None, :], cats), num[RISK_SCORE_INDEX]
+
+        # Reference pandas path (also reproduces its errors for malformed rows)
+        df_feat = create_features(pd.DataFrame([project_dict]))
+        available_num = [c for c in NUM_FEATURES if c in df_feat.columns]
+        available_cat = [c for c in CAT_FEATURES if c in df_feat.columns]
+        return df_feat[available_num + available_cat], df_feat['risk_score'].values[0]
+
+    def predict_cached(self, project_dict, use_ensemble=False, enable_override=True, timeout=None):
+        """
+        predict_single memoized on the canonical payload, flags and models.
+        Misses from concurrent requests are micro-batched (see self.batcher);
+        a batched miss waits at most `timeout` seconds (TimeoutError).
+        """
+        key = canonical_key(project_dict, use_ensemble=use_ensemble, enable_override=enable_override)
+        if use_ensemble in (False, True, 'auto'):
+            flags = (use_ensemble, bool(enable_override))
+            return self.cache.get_or_compute(key, lambda: self.batcher.submit(project_dict, flags, timeout))
+        # Any other flag value (possibly unhashable) keeps the unbatched path
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.predict_single(project_dict, use_ensemble=use_ensemble, enable_override=enable_override),
+        )
+
+    def score_coalesced(self, projects, flags, timeout=None):
+        """
+        MicroBatcher scorer: one result (or the exception predict_single
+        raises) per project. Scoring here is not interruptible, so `timeout`
+        only matters to scorers that hand the batch to another thread or
+        process (see InferenceExecutor.attach).
+        """
+        use_ensemble, enable_override = flags
+        return self._predict_rows(projects, use_ensemble, enable_override)
+
+    # -------------------------------
+    # REGRESSION (shared by single + batch)
+    # -------------------------------
+    cascade_band = DELAY_CASCADE_BAND
+    cascade_tolerance_days = DELAY_CASCADE_TOLERANCE_DAYS
+    cascade_min_members = DELAY_CASCADE_MIN_MEMBERS
+
+    def _predict_delay_days(self, X_reg, use_ensemble=False, probs=None):
+        """
+        Delay days per row plus the number of ensemble members used
+        (0 = single regressor). probs is required for use_ensemble="auto".
+        """
+        n_rows = X_reg.shape[0]
+        if use_ensemble == 'auto' and self.ensemble_available:
+            days = np.expm1(self.regressor_engine.predict(X_reg))
+            used = np.zeros(n_rows, dtype=int)
+            escalate = np.abs(np.asarray(probs, dtype=float) - self.threshold) <= self.cascade_band
+            if escalate.any():
+                days[escalate], used[escalate] = self._progressive_ensemble(X_reg[escalate])
+        else:
+            engines = self._load_ensemble() if use_ensemble else None
+            if engines:
+                predictions = np.vstack([np.expm1(m.predict(X_reg)) for m in engines.values()])
+                days = np.average(predictions, axis=0, weights=self.ensemble_weights)
+                used = np.full(n_rows, len(engines))
             else:
-                pred_days = int(np.expm1(self.regressor.predict(X_reg)[0]))
+                days = np.expm1(self.regressor_engine.predict(X_reg))
+                used = np.zeros(n_rows, dtype=int)
+        return [int(d) for d in days], used
+
+    def _progressive_ensemble(self, X_reg):
+        """
+        Weighted ensemble evaluated member by member, heaviest weight first.
+
+        A row stops once adding a member moves its running weighted mean by no
+        more than cascade_tolerance_days (after cascade_min_members); later
+        members only score the rows still open. Returns (days, members used).
+        """
+        engines = list(self._load_ensemble().values())
+        weights = np.asarray(self.ensemble_weights, dtype=float)
+        n_rows = X_reg.shape[0]
+        weighted_sum = np.zeros(n_rows)
+        weight_total = np.zeros(n_rows)
+        estimate = np.full(n_rows, np.nan)
+        used = np.zeros(n_rows, dtype=int)
+        open_rows = np.ones(n_rows, dtype=bool)
+
+        for step, member in enumerate(np.argsort(-weights, kind='stable'), start=1):
+            rows = np.flatnonzero(open_rows)
+            if rows.size == 0:
+                break
+            weighted_sum[rows] += weights[member] * np.expm1(engines[member].predict(X_reg[rows]))
+            weight_total[rows] += weights[member]
+            updated = weighted_sum[rows] / weight_total[rows]
+            if step >= self.cascade_min_members:
+                settled = np.abs(updated - estimate[rows]) <= self.cascade_tolerance_days
+                open_rows[rows[settled]] = False
+            estimate[rows] = updated
+            used[rows] = step
+        return estimate, used
+
+    def _inference_path(self, pred_delayed, use_ensemble, members):
+        """Which regression path produced predicted_delay_days."""
+        if not pred_delayed:
+            path = 'classifier'
+        elif members == 0:
+            path = 'single'
+        elif use_ensemble == 'auto':
+            path = 'cascade'
+        else:
+            path = 'ensemble'
+        return {'inference_path': path, 'ensemble_members_used': members}
 
+    def _build_result(self, prob, pred_delayed, pred_days, override):
         # Final return (all python-native types)
         return {
             'is_delayed': self._to_python(pred_delayed),
@@ -287,5 +762,130 @@ class DelayPredictor:
     # -------------------------------
     # BATCH PREDICT
     # -------------------------------
-    def predict_batch(self, projects_list, use_ensemble=False):
-        return [self.predict_single(p, use_ensemble=use_ensemble) for p in projects_list]
+    def predict_batch(self, projects_list, use_ensemble=False, enable_override=True):
+        """
+        Vectorized batch prediction.
+
+        One frame is built for all projects, features are engineered once and the
+        classifier runs in a single call; the regressor (or ensemble) only scores
+        rows predicted as delayed. Results match predict_single exactly. Rows that
+        cannot be scored come back as {'error': message} in their original slot.
+        """
+        return [
+            {'error': str(result)} if isinstance(result, Exception) else result
+            for result in self._predict_rows(projects_list, use_ensemble, enable_override)
+        ]
+
+    def _predict_rows(self, projects_list, use_ensemble, enable_override):
+        """predict_batch with the exception instance in place of each failed row."""
+        results = [None] * len(projects_list)
+        batch_idx = []
+        for idx, project in enumerate(projects_list):
+            if self._is_clean_row(project):
+                batch_idx.append(idx)
+            else:
+                # Odd rows take the single path so they fail (or pass) exactly as before
+                results[idx] = self._predict_single_safe(project, use_ensemble, enable_override)
+
+        if len(batch_idx) == 1:
+            # The compiled single-row path beats building a one-row frame
+            idx = batch_idx[0]
+            results[idx] = self._predict_single_safe(projects_list[idx], use_ensemble, enable_override)
+        elif batch_idx:
+            batch = [projects_list[i] for i in batch_idx]
+            try:
+                batch_results = self._predict_vectorized(batch, use_ensemble, enable_override)
+            except Exception:
+                # Isolate the offending rows instead of failing the whole batch
+                batch_results = [
+                    self._predict_single_safe(p, use_ensemble, enable_override) for p in batch
+                ]
+            for idx, result in zip(batch_idx, batch_results):
+                results[idx] = result
+
+        return results
+
+    def _predict_single_safe(self, project, use_ensemble, enable_override):
+        try:
+            return self.predict_single(project, use_ensemble=use_ensemble, enable_override=enable_override)
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _is_clean_row(project):
+        """Cheap pre-check for rows that would make the shared frame fail."""
+        if not isinstance(project, dict):
+            return False
+        if not all(isinstance(project.get(c), str) for c in CAT_FEATURES):
+            return False
+        for col in FEATURE_DEFAULTS:
+            value = project.get(col)
+            if value is not None and not isinstance(value, Real):
+                return False
+        # _check_extreme_risk compares the raw value, so an explicit None must fail there
+        if 'budget_overrun_percent' in project and project['budget_overrun_percent'] is None:
+            return False
+        # progress_stage bins are (0, 1]; anything else raises inside create_features
+        progress = project.get('progress_ratio')
+        return progress is not None and 0 < progress <= 1
+
+    def _extreme_risk_probabilities(self, overrun, progress, risk_score):
+        """Vectorized _check_extreme_risk: adjusted probability per row, NaN if none."""
+        critical = (overrun > 20) & (progress < 0.25)
+        high = ~critical & (overrun > 15) & (progress < 0.35)
+        scored = ~critical & ~high & (risk_score > 70)
+        return np.select([critical, high, scored], [0.85, 0.75, 0.80], default=np.nan)
+
+    def _batch_inputs(self, batch):
+        """Numeric matrix, categorical matrix and risk scores for clean rows."""
+        if self.compiled_features:
+            # Row-wise compiled features beat building a DataFrame for small batches
+            num = np.empty((len(batch), len(NUM_FEATURES)))
+            for row, project in enumerate(batch):
+                compile_features(project, out=num[row])
+            cats = np.array([[project[col] for col in CAT_FEATURES] for project in batch], dtype=object)
+            return num, cats, num[:, RISK_SCORE_INDEX]
+        df_feat = create_features(pd.DataFrame(batch))
+        return (
+            df_feat[NUM_FEATURES].to_numpy(dtype=float),
+            df_feat[CAT_FEATURES].to_numpy(dtype=object),
+            df_feat['risk_score'].to_numpy(),
+        )
+
+    def _predict_vectorized(self, batch, use_ensemble, enable_override):
+        num, cats, risk_scores = self._batch_inputs(batch)
+
+        X_clf = self._transform((num, cats), self.clf_preprocessor, self.clf_encoder)
+        probs_raw = self.classifier_engine.predict_proba(X_clf)[:, 1]
+
+        overrun = np.array([p.get('budget_overrun_percent', 0) for p in batch], dtype=float)
+        progress = np.array([p.get('progress_ratio', 1) for p in batch], dtype=float)
+        adj_probs = self._extreme_risk_probabilities(overrun, progress, risk_scores)
+
+        override_mask = ~np.isnan(adj_probs) if enable_override else np.zeros(len(batch), dtype=bool)
+        probs = np.where(override_mask, np.maximum(probs_raw, np.nan_to_num(adj_probs)), probs_raw)
+        delayed_mask = probs >= self.threshold
+
+        pred_days = np.zeros(len(batch), dtype=int)
+        members = np.zeros(len(batch), dtype=int)
+        if delayed_mask.any():
+            X_reg = self._transform(
+                (num[delayed_mask], cats[delayed_mask]), self.reg_preprocessor, self.reg_encoder
+            )
+            pred_days[delayed_mask], members[delayed_mask] = self._predict_delay_days(
+                X_reg, use_ensemble, probs[delayed_mask]
+            )
+
+        results = []
+        for i, prob_raw in enumerate(probs_raw):
+            # Scalar max keeps the exact dtype/arithmetic of predict_single
+            if override_mask[i]:
+                prob = max(prob_raw, float(adj_probs[i]))
+                override = prob > prob_raw
+            else:
+                prob = prob_raw
+                override = False
+            result = self._build_result(prob, delayed_mask[i], int(pred_days[i]), override)
+            result.update(self._inference_path(delayed_mask[i], use_ensemble, int(members[i])))
+            results.append(result)
+        return results
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field, validator
 
@@ -61,14 +61,86 @@ class CostPredictionRequest(BaseModel):
         return value
 
 
+ExplainMode = Literal["auto", "none", "fast", "full"]
+
+
 class ScenarioAdjustment(BaseModel):
     name: str
     overrides: dict
+    explain: Optional[ExplainMode] = None
 
 
 class ScenarioSimulationRequest(BaseModel):
     base_project: CostPredictionRequest
     scenarios: List[ScenarioAdjustment]
+    explain: Optional[ExplainMode] = None
+
+
+class SensitivityAxis(BaseModel):
+    field: str
+    values: Optional[List[float | str]] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    steps: int = Field(20, ge=2, le=500)
+
+
+class SensitivityRequest(BaseModel):
+    base_project: CostPredictionRequest
+    axes: List[SensitivityAxis] = Field(..., min_length=1, max_length=2)
+
+
+class InputDistribution(BaseModel):
+    """Distribution of one uncertain numeric input for Monte Carlo runs.
+
+    normal: mean/std; uniform: low/high; triangular: low/mode/high;
+    lognormal: mean/std of the underlying normal. With ``relative`` the draws
+    are multipliers of the base project's value.
+    """
+
+    field: str
+    kind: Literal["normal", "uniform", "triangular", "lognormal"]
+    mean: Optional[float] = None
+    std: Optional[float] = Field(None, ge=0)
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+    relative: bool = False
+    clip_min: Optional[float] = None
+    clip_max: Optional[float] = None
+
+
+class MonteCarloRequest(BaseModel):
+    base_project: CostPredictionRequest
+    distributions: List[InputDistribution] = Field(..., min_length=1)
+    n_samples: int = Field(20_000, ge=100)
+    seed: Optional[int] = None
+    percentiles: List[float] = [5, 10, 25, 50, 75, 90, 95]
+    histogram_bins: int = Field(50, ge=5, le=500)
+
+
+class PortfolioRiskRequest(BaseModel):
+    """Projects stay raw objects so the delay model can read its own fields.
+
+    Latent shocks of two projects in the same district (promoter type) have
+    correlation ``district_correlation`` (``promoter_correlation``), and the
+    sum of both when they share both.
+    """
+
+    projects: List[dict] = Field(..., min_length=1)
+    n_draws: int = Field(10_000, ge=100)
+    district_correlation: float = Field(0.3, ge=0, le=1)
+    promoter_correlation: float = Field(0.1, ge=0, le=1)
+    seed: Optional[int] = None
+    percentiles: List[float] = [50, 90, 95, 99]
+    tail_percentile: float = Field(95, gt=0, lt=100)
+    include_delay: bool = True
+    use_ensemble: bool = False
+
+    @validator("promoter_correlation")
+    def check_total_correlation(cls, value, values):
+        if values.get("district_correlation", 0) + value > 1:
+            raise ValueError("district_correlation + promoter_correlation must not exceed 1")
+        return value
 
 
 class FactorContribution(BaseModel):
@@ -107,4 +179,5 @@ class CostPredictionResponse(BaseModel):
     top_contributors: List[FactorContribution]
     recommendations: List[str]
     model_info: ModelInfo
+    explanation_mode: str = "full"
 
@@ -0,0 +1,279 @@
+"""Production entry-point: pre-fork, multi-threaded serving of the Flask app.
+
+The master process imports ``app`` (loading every model once), freezes the
+loaded objects out of the garbage collector's reach, opens the listening
+socket and forks the workers. Models are therefore shared copy-on-write: a
+worker only pays for the pages it writes to. Each worker reopens its SQLite
+connections and serves requests from a bounded thread pool; the master
+restarts workers that die and forwards SIGTERM/SIGINT for a graceful stop.
+
+    python serve.py --workers 4 --threads 8
+"""
+
+import argparse
+import gc
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from ml.config import (
+    SERVE_BACKLOG,
+    SERVE_HOST,
+    SERVE_PORT,
+    SERVE_READY_TIMEOUT_SECONDS,
+    SERVE_THREADS,
+    SERVE_WORKERS,
+)
+
+logger = logging.getLogger("serve")
+
+
+class RequestHandler(WSGIRequestHandler):
+    # One request per connection: an idle keep-alive client would otherwise
+    # hold one of the worker's bounded threads
+    protocol_version = "HTTP/1.0"
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """Werkzeug server that hands accepted connections to a fixed thread pool."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, *, threads, fd=None, multiprocess=False):
+        self.multiprocess = multiprocess
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        if fd is not None:
+            # Workers share the listening socket: whoever loses the race for a
+            # connection gets EAGAIN instead of blocking in accept()
+            self.socket.setblocking(False)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def close(self):
+        """Stop accepting, then wait for the requests already in the pool."""
+        self.server_close()
+        self.executor.shutdown(wait=True)
+
+
+def _stop(signum, frame):
+    raise SystemExit(0)
+
+
+def _load_app():
+    """Import the Flask app (loads the models) and preload anything lazy."""
+    import app as application
+
+    if application.predictor is not None:
+        application.predictor.preload()
+    return application
+
+
+def _after_fork(application):
+    """Per-worker state that must not be shared with the master."""
+    application.prediction_repo.reopen()
+    # Threads only: the worker already shares the master's models
+    application.inference.after_fork()
+    if application.cost_service is not None:
+        application.cost_service.monte_carlo_engine.after_fork()
+    # Each worker gets its own random streams
+    random.seed()
+    import numpy as np
+
+    np.random.seed()
+
+
+def _run_worker(application, listener, threads, ready_fd):
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    _after_fork(application)
+    host, port = listener.getsockname()[:2]
+    server = ThreadPoolWSGIServer(
+        host, port, application.app, threads=threads, fd=listener.fileno(), multiprocess=True
+    )
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        # Let in-flight requests finish, then flush queued prediction rows;
+        # os._exit skips atexit, so stop the executor explicitly
+        server.close()
+        application.inference.shutdown(wait=True)
+        application.prediction_repo.close()
+
+
+def _spawn(application, listener, threads, ready_fd):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(application, listener, threads, ready_fd)
+        except BaseException:
+            logger.exception("❌ Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _wait_ready(ready_read, count, timeout):
+    ready = 0
+    deadline = time.monotonic() + timeout
+    while ready < count:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([ready_read], [], [], remaining)[0]:
+            break
+        ready += len(os.read(ready_read, count - ready))
+    return ready
+
+
+def _children(pid):
+    """Direct child processes of ``pid`` (empty where /proc does not list them)."""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as handle:
+                children += [int(child) for child in handle.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+def _memory_report(workers):
+    """Log RSS/PSS per process; PSS sums to the real footprint of shared pages.
+
+    Child processes of the workers (e.g. simulation pools) are listed too, so
+    the total covers every process the server runs.
+    """
+    from ml.monitoring import process_memory_mb
+
+    rows = [("master", os.getpid(), process_memory_mb())]
+    for i, pid in enumerate(workers):
+        rows.append((f"worker {i}", pid, process_memory_mb(pid)))
+        rows += [(f" child {i}", child, process_memory_mb(child)) for child in _children(pid)]
+    if rows[0][2] is None:
+        logger.info("Memory report unavailable (needs /proc/<pid>/smaps_rollup)")
+        return
+    logger.info("%-10s %8s %10s %10s %10s %10s", "process", "pid", "rss_mb", "pss_mb", "shared_mb", "private_mb")
+    for name, pid, memory in rows:
+        if memory:
+            logger.info(
+                "%-10s %8d %10.1f %10.1f %10.1f %10.1f",
+                name, pid, memory["rss"], memory["pss"], memory["shared"], memory["private"],
+            )
+    measured = [memory for _, _, memory in rows if memory]
+    logger.info(
+        "📊 Total PSS %.1f MB across %d processes (sum of RSS %.1f MB)",
+        sum(memory["pss"] for memory in measured),
+        len(measured),
+        sum(memory["rss"] for memory in measured),
+    )
+
+
+def serve_forked(host, port, workers, threads):
+    # Single-threaded model runtimes: set before any of them starts a thread
+    # pool, so no pool is forked mid-flight and N workers do not oversubscribe
+    # the cores (the workers' request threads provide the parallelism)
+    for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, "1")
+    listener = socket.create_server((host, port), backlog=SERVE_BACKLOG)
+    application = _load_app()
+
+    # Nothing that cannot cross a fork: close the connection pool and the
+    # write-behind thread (the inference executor is only started in the
+    # workers), then keep the GC from touching the loaded objects (collections
+    # write to object headers and would unshare their pages)
+    application.prediction_repo.close()
+    gc.collect()
+    gc.freeze()
+
+    ready_read, ready_write = os.pipe()
+    pids = {_spawn(application, listener, threads, ready_write) for _ in range(workers)}
+    ready = _wait_ready(ready_read, workers, SERVE_READY_TIMEOUT_SECONDS)
+    logger.info("✅ %d/%d workers serving on http://%s:%d (%d threads each)", ready, workers, host, port, threads)
+    _memory_report(sorted(pids))
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        pids.discard(pid)
+        if not stopping:
+            code = os.waitstatus_to_exitcode(status)
+            logger.error("❌ Worker %d exited (code %d); starting a new one", pid, code)
+            time.sleep(1)  # avoid a tight loop if workers fail on startup
+            pids.add(_spawn(application, listener, threads, ready_write))
+    listener.close()
+    logger.info("Stopped")
+
+
+def serve_single(host, port, threads):
+    """Fallback without fork (e.g. Windows): one process, one thread pool."""
+    application = _load_app()
+    application.inference.start()
+    server = ThreadPoolWSGIServer(host, port, application.app, threads=threads)
+    logger.info("✅ Serving on http://%s:%d (single process, %d threads)", host, port, threads)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        application.inference.shutdown(wait=True)
+        application.prediction_repo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS, help="request threads per worker")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    if hasattr(os, "fork") and args.workers > 1:
+        serve_forked(args.host, args.port, args.workers, args.threads)
+    else:
+        if args.workers > 1:
+            logger.warning("⚠️ os.fork is unavailable on %s; serving from a single process", sys.platform)
+        serve_single(args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
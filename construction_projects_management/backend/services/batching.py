@@ -0,0 +1,161 @@
+"""Dynamic micro-batching: coalesce concurrent single-row predictions."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+# score_batch(items, key, timeout) -> one result per item; an exception
+# instance in a slot is raised to that item's caller only. ``timeout`` is the
+# time left (seconds) for the most patient caller, None when any has no limit.
+BatchScorer = Callable[[List[Any], Hashable, Optional[float]], Sequence[Any]]
+
+
+class _Batch:
+    __slots__ = ("items", "futures", "enqueued_at", "deadlines", "full")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[Future] = []
+        self.enqueued_at: List[float] = []
+        self.deadlines: List[Optional[float]] = []
+        self.full = threading.Event()
+
+    def timeout(self) -> Optional[float]:
+        if any(deadline is None for deadline in self.deadlines):
+            return None
+        return max(max(self.deadlines) - time.monotonic(), 0.0)
+
+
+class MicroBatcher:
+    """Collects single items submitted concurrently and scores them together.
+
+    The first caller for a ``key`` opens a batch and leads it: it waits up to
+    ``window_ms`` for other callers to join (or until ``max_batch_size`` have),
+    closes the batch and makes one ``score_batch`` call on its own thread;
+    everyone else blocks on their slot of the result. Only items with equal
+    keys (e.g. the same flags) share a batch. A leader that is the only caller
+    in flight scores straight away, so an idle service pays no window.
+
+    A caller with a ``timeout`` stops waiting for its slot once it has passed
+    (TimeoutError); the batch itself is scored against the latest deadline of
+    its callers.
+
+    There is no background thread, which keeps the batcher safe to create
+    before the serving processes fork. A ``window_ms`` of 0 or a
+    ``max_batch_size`` of 1 disables coalescing.
+    """
+
+    def __init__(self, score_batch: BatchScorer, *, window_ms: float, max_batch_size: int):
+        self.score_batch = score_batch
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.enabled = self.window > 0 and self.max_batch_size > 1
+        self._open: Dict[Hashable, _Batch] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters = {"batches": 0, "items": 0, "full_batches": 0, "failed_batches": 0}
+        self._sizes: Dict[int, int] = {}
+        self._largest = 0
+        self._queue_seconds = 0.0
+        self._max_queue_seconds = 0.0
+        self._score_seconds = 0.0
+
+    def submit(self, item: Any, key: Hashable = None, timeout: float | None = None) -> Any:
+        """Result for ``item``, scored in a batch with concurrent submissions."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._in_flight += 1
+            batch = self._open.get(key) if self.enabled else None
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                if self.enabled:
+                    self._open[key] = batch
+            slot = len(batch.items)
+            batch.items.append(item)
+            batch.futures.append(Future())
+            batch.enqueued_at.append(time.perf_counter())
+            batch.deadlines.append(deadline)
+            if len(batch.items) >= self.max_batch_size:
+                self._close(key, batch)
+                batch.full.set()
+            alone = self._in_flight == 1
+        try:
+            if leader:
+                if self.enabled and not alone:
+                    batch.full.wait(self.window)
+                with self._lock:
+                    self._close(key, batch)
+                self._run(batch, key)
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                return batch.futures[slot].result(remaining)
+            except TimeoutError:
+                if batch.futures[slot].done():
+                    raise  # the scorer's own timeout, raised to this caller
+                raise TimeoutError(f"Batched prediction timed out after {timeout:g}s") from None
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _close(self, key: Hashable, batch: _Batch):
+        if self._open.get(key) is batch:
+            del self._open[key]
+
+    def _run(self, batch: _Batch, key: Hashable):
+        dispatched = time.perf_counter()
+        failed = False
+        try:
+            results = list(self.score_batch(list(batch.items), key, batch.timeout()))
+            if len(results) != len(batch.items):
+                raise RuntimeError(f"score_batch returned {len(results)} results for {len(batch.items)} items")
+        except BaseException as exc:
+            results = [exc] * len(batch.items)
+            failed = True
+        self._record(batch, dispatched, time.perf_counter() - dispatched, failed)
+        for future, result in zip(batch.futures, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _record(self, batch: _Batch, dispatched: float, score_seconds: float, failed: bool):
+        size = len(batch.items)
+        waits = [dispatched - enqueued for enqueued in batch.enqueued_at]
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["items"] += size
+            self._counters["full_batches"] += size >= self.max_batch_size
+            self._counters["failed_batches"] += failed
+            self._sizes[size] = self._sizes.get(size, 0) + 1
+            self._largest = max(self._largest, size)
+            self._queue_seconds += sum(waits)
+            self._max_queue_seconds = max(self._max_queue_seconds, max(waits))
+            self._score_seconds += score_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self._counters["batches"]
+            items = self._counters["items"]
+            # Power-of-two buckets: "1", "2-3", "4-7", ...
+            histogram: Dict[str, int] = {}
+            for size in sorted(self._sizes):
+                low = 1 << (size.bit_length() - 1)
+                label = "1" if low == 1 else f"{low}-{2 * low - 1}"
+                histogram[label] = histogram.get(label, 0) + self._sizes[size]
+            return {
+                "enabled": self.enabled,
+                "window_ms": self.window * 1000,
+                "max_batch_size": self.max_batch_size,
+                **self._counters,
+                "in_flight": self._in_flight,
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "largest_batch": self._largest,
+                "batch_size_histogram": histogram,
+                "avg_queue_ms": round(self._queue_seconds / items * 1000, 3) if items else 0.0,
+                "max_queue_ms": round(self._max_queue_seconds * 1000, 3),
+                "avg_score_ms": round(self._score_seconds / batches * 1000, 3) if batches else 0.0,
+            }
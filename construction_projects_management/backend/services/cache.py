@@ -0,0 +1,187 @@
+"""Bounded LRU/TTL memoization for prediction results."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from copy import deepcopy
+from numbers import Real
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+def canonical_key(payload: Dict[str, Any], **context: Any) -> str:
+    """Stable hash of a payload plus context (model version, flags).
+
+    Keys are sorted and numbers normalized, so ``{"a": 1, "b": 2.0}`` and
+    ``{"b": 2, "a": 1.0}`` map to the same entry.
+    """
+    blob = json.dumps(
+        {"payload": _normalize(payload), "context": _normalize(context)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, Real):
+        number = float(value)
+        if math.isfinite(number):
+            return number
+        return {"__float__": repr(number)}
+    return {"__repr__": repr(value)}
+
+
+def file_fingerprint(*paths) -> Tuple:
+    """(path, mtime, size) for each existing file; changes when a model file is replaced."""
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stamp.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL result cache with in-flight request coalescing.
+
+    Concurrent callers asking for the same key while it is being computed wait
+    for that single computation instead of starting their own. ``fingerprint``
+    is polled (at most every ``check_interval`` seconds); when its value
+    changes, e.g. because a model was reloaded, the cache is cleared. A value
+    whose computation started before a clear is returned to its callers but
+    not stored, so it cannot outlive the models that produced it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float | None = 600.0,
+        *,
+        fingerprint: Callable[[], Hashable] | None = None,
+        check_interval: float = 1.0,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._fingerprint_fn = fingerprint
+        self._fingerprint = fingerprint() if fingerprint else None
+        self._check_interval = check_interval
+        self._last_check = time.monotonic()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, computing (once across threads) on a miss.
+
+        Exceptions are not cached; they propagate to every waiting caller.
+        """
+        self._check_fingerprint()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return deepcopy(value)
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                self._counters["misses"] += 1
+                pending = Future()
+                self._inflight[key] = pending
+                generation = self._generation
+            else:
+                self._counters["coalesced"] += 1
+
+        if not owner:
+            return deepcopy(pending.result())
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                if self._inflight.get(key) is pending:
+                    del self._inflight[key]
+            pending.set_exception(exc)
+            raise
+
+        with self._lock:
+            if self._inflight.get(key) is pending:
+                del self._inflight[key]
+            if generation == self._generation:
+                self._store(key, value)
+        pending.set_result(value)
+        return deepcopy(value)
+
+    def _store(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else math.inf
+        self._entries[key] = (expires_at, deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _check_fingerprint(self):
+        if self._fingerprint_fn is None:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self._check_interval:
+            return
+        self._last_check = now
+        current = self._fingerprint_fn()
+        if current != self._fingerprint:
+            self._fingerprint = current
+            self.clear()
+            with self._lock:
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # Later callers start fresh computations instead of joining older ones
+            self._inflight.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "in_flight": len(self._inflight),
+                "hit_rate": round(
+                    (self._counters["hits"] + self._counters["coalesced"]) / lookups, 4
+                )
+                if lookups
+                else 0.0,
+            }
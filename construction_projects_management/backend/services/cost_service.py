@@ -4,7 +4,8 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Dict, List
+import time
+from typing import Any, Dict, List, Sequence, Tuple
 
 import joblib
 import numpy as np
@@ -15,9 +16,20 @@ from ml.config import (
     ALERT_THRESHOLD_PERCENT,
     ARTIFACT_PATH,
     BACKGROUND_SAMPLE_PATH,
+    EXPLAIN_DEFAULT_MODE,
+    EXPLAIN_LATENCY_BUDGET_MS,
+    EXPLAIN_MODES,
     MODEL_VERSION,
+    MONTE_CARLO_MAX_SAMPLES,
+    PREDICTION_BATCH_MAX_SIZE,
+    PREDICTION_BATCH_WINDOW_MS,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL_SECONDS,
     RISK_HIGH_THRESHOLD,
     RISK_MEDIUM_THRESHOLD,
+    SENSITIVITY_CHUNK_SIZE,
+    SENSITIVITY_MAX_POINTS,
+    TREE_ENGINES,
 )
 from ml.features import (
     ALL_FEATURES,
@@ -25,16 +37,27 @@ from ml.features import (
     CATEGORICAL_FEATURES,
     DERIVED_FEATURES,
     DataValidator,
+    apply_overrides,
     engineer_features,
+    expand_row,
+    to_model_frame,
 )
 from ml.monitoring import DriftMonitor
+from ml.trees import FlatTreeEnsemble, resolve_engine, select_engine
+from services.batching import MicroBatcher
+from services.cache import PredictionCache, canonical_key, file_fingerprint
+from services.monte_carlo import MonteCarloEngine, coarse_histogram, histogram_percentiles
 from schemas import (
     CostIntervals,
     CostPredictionRequest,
     CostPredictionResponse,
     FactorContribution,
+    InputDistribution,
+    MonteCarloRequest,
     PredictionIntervals,
     ScenarioSimulationRequest,
+    SensitivityAxis,
+    SensitivityRequest,
 )
 from storage import PredictionRepository
 
@@ -48,6 +71,8 @@ class CostOverrunService:
         self,
         artifact_path: str | None = None,
         background_path: str | None = None,
+        tree_engines: str | Dict[str, str] | None = None,
+        repo: PredictionRepository | None = None,
     ):
         self.artifact_path = artifact_path or ARTIFACT_PATH
         self.background_path = background_path or BACKGROUND_SAMPLE_PATH
@@ -63,12 +88,42 @@ class CostOverrunService:
         self.metrics = self.artifacts.get("metrics", {})
 
         self.background_df = self._load_background_sample()
+        self.tree_engines = TREE_ENGINES if tree_engines is None else tree_engines
+        self.predictors_probe = None
+        if set(self.feature_columns).issubset(self.background_df.columns):
+            self.predictors_probe = self.background_df[self.feature_columns]
+        self.predictors = self._select_engines()
         self.explainer = shap.TreeExplainer(
             self.model, feature_perturbation="tree_path_dependent"
         )
+        self.attributor = self._build_attributor()
+        self.monte_carlo_engine = MonteCarloEngine(
+            self.model, self.feature_columns, self.artifact_path
+        )
+        # Smoothed seconds per row for each stage; drives explain="auto"
+        self.stage_latency: Dict[str, float] = {}
         self.validator = DataValidator()
         self.monitor = DriftMonitor(self.reference_stats)
-        self.repo = PredictionRepository()
+        # Opened on first use: inference worker processes never persist
+        self._repo = repo
+        self.cache = PredictionCache(
+            PREDICTION_CACHE_SIZE,
+            PREDICTION_CACHE_TTL_SECONDS,
+            fingerprint=self._model_fingerprint,
+        )
+        # Concurrent single predictions with the same explain mode share one
+        # model pass (see score_coalesced)
+        self.batcher = MicroBatcher(
+            self.score_coalesced,
+            window_ms=PREDICTION_BATCH_WINDOW_MS,
+            max_batch_size=PREDICTION_BATCH_MAX_SIZE,
+        )
+
+    @property
+    def repo(self) -> PredictionRepository:
+        if self._repo is None:
+            self._repo = PredictionRepository()
+        return self._repo
 
     # ------------------------------------------------------------------ #
     # Public API
@@ -78,6 +133,65 @@ class CostOverrunService:
         payload: CostPredictionRequest,
         *,
         persist: bool = True,
+        use_cache: bool = True,
+        explain: str | None = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+    ) -> CostPredictionResponse:
+        """Predict one project.
+
+        ``explain`` is "none", "fast", "full" or "auto" (default from config);
+        "auto" uses ``deadline`` (a ``time.monotonic()`` value) to pick the
+        richest explanation that still fits. The mode used is reported in
+        ``explanation_mode``. Concurrent calls are micro-batched into one
+        model pass per explain mode; a call waits at most ``timeout`` seconds
+        for its batch (TimeoutError).
+        """
+        mode = self.resolve_explain_mode(explain, deadline=deadline)
+        if use_cache:
+            # scenario_name is a label only; it never changes the prediction
+            key = canonical_key(
+                payload.dict(exclude={"scenario_name"}),
+                model_version=self.model_version,
+                explain=mode,
+            )
+            response = self.cache.get_or_compute(key, lambda: self.batcher.submit(payload, mode, timeout))
+        else:
+            response = self.batcher.submit(payload, mode, timeout)
+
+        if persist:
+            self.log_prediction(payload, response)
+
+        return response
+
+    def log_prediction(self, payload: CostPredictionRequest, response: CostPredictionResponse):
+        """Persist one ``predict(persist=False)`` result (e.g. scored in another process)."""
+        self.repo.log_prediction(**self._prediction_row(payload, response.model_dump()))
+
+    def log_results(
+        self, payloads: Sequence[Dict[str, Any] | CostPredictionRequest], results: List[Dict]
+    ):
+        """Persist the scored rows of a ``predict_many(persist=False)`` result."""
+        rows = []
+        for item, result in zip(payloads, results):
+            if "prediction" in result:
+                request = item if isinstance(item, CostPredictionRequest) else CostPredictionRequest(**item)
+                rows.append(self._prediction_row(request, result["prediction"]))
+        if rows:
+            self.repo.log_predictions(rows)
+
+    def _prediction_row(self, payload: CostPredictionRequest, output: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model_version": self.model_version,
+            "input_payload": json.loads(payload.json()),
+            "output_payload": output,
+            "risk_level": output["risk_level"],
+            "scenario_name": payload.scenario_name,
+            "alerts": output["alerts"],
+        }
+
+    def _predict_uncached(
+        self, payload: CostPredictionRequest, explain: str = "full"
     ) -> CostPredictionResponse:
         df = self._payload_to_frame(payload)
         validation = self.validator.validate(df)
@@ -88,90 +202,548 @@ class CostOverrunService:
         if drift_signals:
             logger.warning("Potential drift detected: %s", drift_signals)
 
-        expected = float(self.model.predict(df)[0])
-        lower = float(self.quantile_lower.predict(df)[0])
-        upper = float(self.quantile_upper.predict(df)[0])
-
-        final_cost = float(payload.final_project_cost * (1 + expected / 100))
-        intervals = PredictionIntervals(p10=lower, expected=expected, p90=upper)
-        cost_intervals = CostIntervals(
-            p10=float(payload.final_project_cost * (1 + lower / 100)),
-            expected=final_cost,
-            p90=float(payload.final_project_cost * (1 + upper / 100)),
-        )
-        risk = self._risk_bucket(expected)
-        alerts = self._build_alerts(expected, payload)
-        contributors = self._explain(df)
-        recommendations = self._recommendations(expected, contributors, payload)
+        response = self._score_frame([payload], df, explain)[0]
 
         metrics = self.metrics.get(self.model_name, {"r2": float("nan"), "mae": float("nan")})
-        response = CostPredictionResponse(
-            model_version=self.model_version,
-            expected_overrun_percent=expected,
-            predicted_final_cost=final_cost,
-            intervals=intervals,
-            cost_intervals=cost_intervals,
-            risk_level=risk,
-            alerts=alerts,
-            top_contributors=contributors,
-            recommendations=recommendations,
-            model_info={
-                "version": self.model_version,
-                "name": self.model_name,
-                "r2": float(metrics.get("r2", float("nan"))),
-                "mae": float(metrics.get("mae", float("nan"))),
-            },
-        )
-
         logger.info(
             "Cost prediction | model=%s v%s | r2=%.4f | mae=%.3f | expected=%.2f%% | risk=%s",
             self.model_name,
             self.model_version,
             metrics.get("r2", float("nan")),
             metrics.get("mae", float("nan")),
-            expected,
-            risk,
+            response.expected_overrun_percent,
+            response.risk_level,
+        )
+
+        return response
+
+    def score_coalesced(
+        self, payloads: List[CostPredictionRequest], explain: str, timeout: float | None = None
+    ) -> List[CostPredictionResponse | Exception]:
+        """MicroBatcher scorer: per payload, the response or the error ``_predict_uncached`` raises.
+
+        Scoring here is not interruptible; ``timeout`` only matters to scorers
+        that run the batch elsewhere (see InferenceExecutor.attach).
+        """
+        if len(payloads) > 1:
+            try:
+                return self._score_valid_rows(payloads, explain)
+            except Exception:
+                logger.exception("Coalesced cost batch failed; scoring its %d rows one by one", len(payloads))
+        results: List[CostPredictionResponse | Exception] = []
+        for payload in payloads:
+            try:
+                results.append(self._predict_uncached(payload, explain))
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def _score_valid_rows(
+        self, payloads: List[CostPredictionRequest], explain: str
+    ) -> List[CostPredictionResponse | Exception]:
+        df = self._payloads_to_frame(payloads)
+        results: List[CostPredictionResponse | Exception] = [None] * len(payloads)
+        valid_rows = []
+        for row, validation in enumerate(self.validator.validate_frame(df)):
+            if validation.is_valid:
+                valid_rows.append(row)
+            else:
+                results[row] = ValueError("; ".join(validation.issues))
+        if not valid_rows:
+            return results
+
+        valid_df = df.iloc[valid_rows]
+        drifting = sum(1 for signals in self.monitor.track_frame(valid_df) if signals)
+        if drifting:
+            logger.warning("Potential drift detected in %d of %d coalesced rows", drifting, len(valid_rows))
+
+        responses = self._score_frame([payloads[row] for row in valid_rows], valid_df, explain)
+        for row, response in zip(valid_rows, responses):
+            results[row] = response
+        logger.info(
+            "Cost prediction | model=%s v%s | coalesced rows=%d | scored=%d",
+            self.model_name,
+            self.model_version,
+            len(payloads),
+            len(valid_rows),
+        )
+        return results
+
+    def predict_many(
+        self,
+        payloads: Sequence[Dict[str, Any] | CostPredictionRequest],
+        *,
+        persist: bool = True,
+        explain: str | Sequence[str | None] | None = None,
+        deadline: float | None = None,
+    ) -> List[Dict]:
+        """Score a batch of projects in one pass.
+
+        Every item is parsed and validated on its own; failures come back as
+        ``{"index": i, "error": ...}`` in place and do not affect the rest. Valid
+        rows share one feature frame, one call per model and one explanation
+        call per mode, and are persisted together in a single transaction.
+        ``explain`` and ``deadline`` work as in ``predict``, budgeted for the
+        whole batch; a sequence gives one mode per item (None = default).
+        """
+        results, requests, positions = self._parse_requests(payloads)
+        if not requests:
+            return results
+        return self._score_requests(
+            requests,
+            positions,
+            results,
+            self._payloads_to_frame(requests),
+            persist=persist,
+            explain=explain,
+            deadline=deadline,
         )
 
+    def _parse_requests(
+        self, payloads: Sequence[Dict[str, Any] | CostPredictionRequest]
+    ) -> Tuple[List[Dict], List[CostPredictionRequest], List[int]]:
+        """(results with parse errors filled in, parsed requests, their positions)."""
+        results: List[Dict] = [{} for _ in payloads]
+        requests: List[CostPredictionRequest] = []
+        positions: List[int] = []
+        for idx, item in enumerate(payloads):
+            try:
+                if isinstance(item, CostPredictionRequest):
+                    request = item
+                elif isinstance(item, dict):
+                    request = CostPredictionRequest(**item)
+                else:
+                    raise TypeError(f"expected an object, got {type(item).__name__}")
+            except (TypeError, ValueError) as exc:
+                results[idx] = {"index": idx, "error": f"Invalid input data: {exc}"}
+                continue
+            requests.append(request)
+            positions.append(idx)
+        return results, requests, positions
+
+    def _score_requests(
+        self,
+        requests: List[CostPredictionRequest],
+        positions: List[int],
+        results: List[Dict],
+        df: pd.DataFrame,
+        *,
+        persist: bool,
+        explain: str | Sequence[str | None] | None,
+        deadline: float | None,
+    ) -> List[Dict]:
+        """Validate, score and optionally persist the rows of ``df`` (one per request)."""
+        valid_rows = []
+        for row, validation in enumerate(self.validator.validate_frame(df)):
+            if validation.is_valid:
+                valid_rows.append(row)
+            else:
+                results[positions[row]] = {"index": positions[row], "error": "; ".join(validation.issues)}
+
+        if not valid_rows:
+            return results
+
+        valid_df = df.iloc[valid_rows]
+        valid_requests = [requests[row] for row in valid_rows]
+        drifting = sum(1 for signals in self.monitor.track_frame(valid_df) if signals)
+        if drifting:
+            logger.warning("Potential drift detected in %d of %d batch rows", drifting, len(valid_rows))
+
+        modes = self._row_explain_modes(explain, [positions[row] for row in valid_rows], deadline)
+        responses = self._score_frame(valid_requests, valid_df, modes)
+        for row, response in zip(valid_rows, responses):
+            results[positions[row]] = {"index": positions[row], "prediction": response.model_dump()}
+
         if persist:
-            self.repo.log_prediction(
-                model_version=self.model_version,
-                input_payload=json.loads(payload.json()),
-                output_payload=response.model_dump(),
-                risk_level=risk,
-                scenario_name=payload.scenario_name,
-                alerts=alerts,
+            self.repo.log_predictions(
+                [
+                    self._prediction_row(request, results[positions[row]]["prediction"])
+                    for row, request in zip(valid_rows, valid_requests)
+                ]
             )
 
-        return response
+        logger.info(
+            "Cost batch prediction | model=%s v%s | rows=%d | scored=%d | rejected=%d",
+            self.model_name,
+            self.model_version,
+            len(results),
+            len(valid_rows),
+            len(results) - len(valid_rows),
+        )
+        return results
+
+    def resolve_explain_mode(
+        self, explain: str | None = None, *, n_rows: int = 1, deadline: float | None = None
+    ) -> str:
+        """Concrete explanation mode for a request of ``n_rows`` rows.
+
+        "auto" picks full, then fast, then none: the first whose smoothed
+        latency (plus inference) fits in the time left before ``deadline``,
+        which defaults to EXPLAIN_LATENCY_BUDGET_MS from now. "fast" becomes
+        "full" when the point model has no path-attribution engine.
+        """
+        mode = explain or EXPLAIN_DEFAULT_MODE
+        if mode != "auto" and mode not in EXPLAIN_MODES:
+            raise ValueError(f"explain must be one of {', '.join(('auto',) + EXPLAIN_MODES)}")
+        if mode == "fast" and self.attributor is None:
+            return "full"
+        if mode != "auto":
+            return mode
+
+        if deadline is None:
+            deadline = time.monotonic() + EXPLAIN_LATENCY_BUDGET_MS / 1000
+        remaining = deadline - time.monotonic() - self._expected_latency("predict", n_rows)
+        for candidate in ("full", "fast"):
+            if candidate == "fast" and self.attributor is None:
+                continue
+            if self._expected_latency(candidate, n_rows) <= remaining:
+                return candidate
+        return "none"
+
+    def _row_explain_modes(
+        self, explain: str | Sequence[str | None] | None, items: List[int], deadline: float | None
+    ) -> List[str]:
+        """Resolved mode for each scored item (``items`` index into ``explain``)."""
+        if explain is None or isinstance(explain, str):
+            mode = self.resolve_explain_mode(explain, n_rows=len(items), deadline=deadline)
+            return [mode] * len(items)
+        requested = [explain[item] for item in items]
+        n_default = sum(1 for mode in requested if mode is None)
+        default = self.resolve_explain_mode(None, n_rows=max(n_default, 1), deadline=deadline)
+        return [default if mode is None else self.resolve_explain_mode(mode) for mode in requested]
+
+    @staticmethod
+    def _latency_key(stage: str, n_rows: int) -> str:
+        # Per-row cost differs a lot between single rows and batches
+        return f"{stage}:{'single' if n_rows == 1 else 'batch'}"
+
+    def _expected_latency(self, stage: str, n_rows: int) -> float:
+        return self.stage_latency.get(self._latency_key(stage, n_rows), 0.0) * n_rows
+
+    def _record_latency(self, stage: str, seconds: float, n_rows: int, alpha: float = 0.2):
+        key = self._latency_key(stage, n_rows)
+        per_row = seconds / max(n_rows, 1)
+        previous = self.stage_latency.get(key)
+        self.stage_latency[key] = per_row if previous is None else previous + alpha * (per_row - previous)
+
+    def _score_frame(
+        self,
+        payloads: List[CostPredictionRequest],
+        df: pd.DataFrame,
+        explain: str | List[str] = "full",
+    ) -> List[CostPredictionResponse]:
+        """Responses for validated rows of ``df`` (one model/explainer call each)."""
+        started = time.perf_counter()
+        expected = np.asarray(self.predictors["point"].predict(df), dtype=float)
+        lower = np.asarray(self.predictors["lower"].predict(df), dtype=float)
+        upper = np.asarray(self.predictors["upper"].predict(df), dtype=float)
+        self._record_latency("predict", time.perf_counter() - started, len(df))
+
+        alerts = self._build_alerts(expected, payloads)
+        contributors, modes = self._contributors(df, explain)
+        recommendations = self._recommendations(expected, contributors, payloads)
 
-    def simulate(self, request: ScenarioSimulationRequest) -> List[Dict]:
+        metrics = self.metrics.get(self.model_name, {"r2": float("nan"), "mae": float("nan")})
+        model_info = {
+            "version": self.model_version,
+            "name": self.model_name,
+            "r2": float(metrics.get("r2", float("nan"))),
+            "mae": float(metrics.get("mae", float("nan"))),
+        }
+
+        responses = []
+        for i, payload in enumerate(payloads):
+            point, p10, p90 = float(expected[i]), float(lower[i]), float(upper[i])
+            final_cost = float(payload.final_project_cost * (1 + point / 100))
+            responses.append(
+                CostPredictionResponse(
+                    model_version=self.model_version,
+                    expected_overrun_percent=point,
+                    predicted_final_cost=final_cost,
+                    intervals=PredictionIntervals(p10=p10, expected=point, p90=p90),
+                    cost_intervals=CostIntervals(
+                        p10=float(payload.final_project_cost * (1 + p10 / 100)),
+                        expected=final_cost,
+                        p90=float(payload.final_project_cost * (1 + p90 / 100)),
+                    ),
+                    risk_level=self._risk_bucket(point),
+                    alerts=alerts[i],
+                    top_contributors=contributors[i],
+                    recommendations=recommendations[i],
+                    model_info=model_info,
+                    explanation_mode=modes[i],
+                )
+            )
+        return responses
+
+    def simulate(
+        self, request: ScenarioSimulationRequest, *, deadline: float | None = None
+    ) -> List[Dict]:
+        """Score every scenario of ``request`` in one batched pass.
+
+        Scenarios are the base project with their overrides applied; each may
+        set its own ``explain`` mode (default: ``request.explain``). A scenario
+        whose overrides are invalid gets an ``error`` instead of a prediction.
+        """
         base = request.base_project.dict()
+        merged = [
+            {**base, **scenario.overrides, "scenario_name": scenario.name}
+            for scenario in request.scenarios
+        ]
+        explain = [scenario.explain or request.explain for scenario in request.scenarios]
+
+        # The base row is engineered once; each scenario only recomputes the
+        # derived features its overrides touch. Values come from the validated
+        # request so schema defaults apply exactly as in predict().
+        results, requests, positions = self._parse_requests(merged)
+        if requests:
+            fields = CostPredictionRequest.model_fields
+            effective = [
+                {key: getattr(req, key) for key in request.scenarios[pos].overrides if key in fields}
+                for req, pos in zip(requests, positions)
+            ]
+            base_row = self._engineered_frame([request.base_project])
+            df = self._model_frame(apply_overrides(base_row, effective))
+            results = self._score_requests(
+                requests, positions, results, df, persist=False, explain=explain, deadline=deadline
+            )
+
         simulations = []
+        for scenario, result in zip(request.scenarios, results):
+            entry = {"scenario": scenario.name, "overrides": scenario.overrides}
+            if "prediction" in result:
+                entry["prediction"] = result["prediction"]
+            else:
+                entry["error"] = result["error"]
+            simulations.append(entry)
+        return simulations
+
+    def sensitivity(self, request: SensitivityRequest) -> Dict[str, Any]:
+        """Predicted overrun (expected, p10, p90) over a 1-D or 2-D grid.
+
+        The base project is engineered once; grid points are expanded from it
+        column-wise (only dependent derived features are recomputed) and
+        scored in chunks of SENSITIVITY_CHUNK_SIZE, without per-point request
+        objects. Other fields keep the base project's values. Surfaces are
+        returned as nested lists indexed [axis0][axis1]. Raises ValueError for
+        unknown fields, out-of-bounds axis values or oversized grids.
+        """
+        started = time.perf_counter()
+        base_row = self._engineered_frame([request.base_project])
+        validation = self.validator.validate(self._model_frame(base_row))
+        if not validation.is_valid:
+            raise ValueError("; ".join(validation.issues))
 
-        for scenario in request.scenarios:
-            overrides = scenario.overrides
-            merged = {**base, **overrides, "scenario_name": scenario.name}
-            response = self.predict(CostPredictionRequest(**merged), persist=False)
-            simulations.append(
-                {
-                    "scenario": scenario.name,
-                    "overrides": overrides,
-                    "prediction": response.model_dump(),
-                }
+        fields = [axis.field for axis in request.axes]
+        if len(set(fields)) != len(fields):
+            raise ValueError("Sensitivity axes must use different fields.")
+        axis_values = [self._axis_values(axis) for axis in request.axes]
+        shape = tuple(len(values) for values in axis_values)
+        n_points = int(np.prod(shape))
+        if n_points > SENSITIVITY_MAX_POINTS:
+            raise ValueError(f"Grid has {n_points} points; the limit is {SENSITIVITY_MAX_POINTS}.")
+
+        grids = np.meshgrid(*axis_values, indexing="ij")
+        columns = {field: grid.ravel() for field, grid in zip(fields, grids)}
+        # Native models even when the flat engine serves single rows: for
+        # thousands of rows the libraries' threaded predict is faster.
+        models = {"point": self.model, "lower": self.quantile_lower, "upper": self.quantile_upper}
+        surfaces = {key: np.empty(n_points) for key in models}
+        for start in range(0, n_points, SENSITIVITY_CHUNK_SIZE):
+            chunk = slice(start, start + SENSITIVITY_CHUNK_SIZE)
+            df = self._model_frame(expand_row(base_row, {f: v[chunk] for f, v in columns.items()}))
+            for key, surface in surfaces.items():
+                surface[chunk] = models[key].predict(df)
+
+        def compact(values: np.ndarray):
+            return np.round(values.reshape(shape), 4).tolist()
+
+        return {
+            "model_version": self.model_version,
+            "axes": [
+                {"field": field, "values": values.tolist()}
+                for field, values in zip(fields, axis_values)
+            ],
+            "shape": list(shape),
+            "expected_overrun_percent": compact(surfaces["point"]),
+            "p10": compact(surfaces["lower"]),
+            "p90": compact(surfaces["upper"]),
+            "points": n_points,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _axis_values(self, axis: SensitivityAxis) -> np.ndarray:
+        if axis.field in CATEGORICAL_FEATURES:
+            if not axis.values:
+                raise ValueError(f"Axis '{axis.field}' is categorical and needs explicit values.")
+            return np.array([str(v) for v in axis.values], dtype=object)
+        if axis.field not in BASE_NUMERIC_FEATURES:
+            raise ValueError(f"Unknown sensitivity field '{axis.field}'.")
+
+        if axis.values:
+            try:
+                values = np.array(axis.values, dtype=float)
+            except ValueError:
+                raise ValueError(f"Axis '{axis.field}' values must be numeric.") from None
+        elif axis.min is not None and axis.max is not None:
+            values = np.linspace(axis.min, axis.max, axis.steps)
+        else:
+            raise ValueError(f"Axis '{axis.field}' needs values or min/max.")
+        if not np.isfinite(values).all():
+            raise ValueError(f"Axis '{axis.field}' values must be finite.")
+
+        bounds = DataValidator.numeric_bounds.get(axis.field, {})
+        if "min" in bounds and values.min() < bounds["min"]:
+            raise ValueError(f"{axis.field} below minimum ({values.min()} < {bounds['min']}).")
+        if "max" in bounds and values.max() > bounds["max"]:
+            raise ValueError(f"{axis.field} above maximum ({values.max()} > {bounds['max']}).")
+        return values
+
+    def monte_carlo(self, request: MonteCarloRequest, timeout: float | None = None) -> Dict[str, Any]:
+        """Distribution of predicted overrun under uncertain numeric inputs.
+
+        Inputs are sampled per chunk and scored with the point model; chunks
+        run on MonteCarloEngine's workers and only mergeable histogram
+        summaries come back, so memory stays bounded by the chunk size.
+        Percentiles are interpolated from that histogram. Passing the returned
+        ``seed`` back reproduces a run. Raises ValueError for unknown fields,
+        incomplete distribution parameters or too many samples, and
+        TimeoutError when the chunks take longer than ``timeout`` seconds
+        (None means the engine's default).
+        """
+        started = time.perf_counter()
+        if request.n_samples > MONTE_CARLO_MAX_SAMPLES:
+            raise ValueError(
+                f"n_samples is {request.n_samples}; the limit is {MONTE_CARLO_MAX_SAMPLES}."
             )
+        if any(not 0 <= q <= 100 for q in request.percentiles):
+            raise ValueError("Percentiles must be between 0 and 100.")
+        fields = [dist.field for dist in request.distributions]
+        if len(set(fields)) != len(fields):
+            raise ValueError("Each field can only have one distribution.")
+
+        base_row = self._engineered_frame([request.base_project])
+        validation = self.validator.validate(self._model_frame(base_row))
+        if not validation.is_valid:
+            raise ValueError("; ".join(validation.issues))
+        specs = [self._distribution_spec(dist) for dist in request.distributions]
 
-        return simulations
+        summary, seed, n_chunks = self.monte_carlo_engine.run(
+            base_row, specs, request.n_samples, request.seed, timeout=timeout
+        )
+        mean = summary.total / summary.n
+        variance = max(summary.total_sq / summary.n - mean**2, 0.0)
+        return {
+            "model_version": self.model_version,
+            "n_samples": summary.n,
+            "seed": seed,
+            "chunks": n_chunks,
+            "workers": self.monte_carlo_engine.workers if n_chunks > 1 else 1,
+            "mean": round(mean, 4),
+            "std": round(float(np.sqrt(variance)), 4),
+            "min": round(summary.minimum, 4),
+            "max": round(summary.maximum, 4),
+            "percentiles": {
+                key: round(value, 4)
+                for key, value in histogram_percentiles(summary, request.percentiles).items()
+            },
+            "risk_probabilities": {
+                "Low": round(1 - summary.medium_or_worse / summary.n, 4),
+                "Medium": round((summary.medium_or_worse - summary.high) / summary.n, 4),
+                "High": round(summary.high / summary.n, 4),
+            },
+            "alert_threshold_percent": ALERT_THRESHOLD_PERCENT,
+            "histogram": coarse_histogram(summary, request.histogram_bins),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _distribution_spec(self, dist: InputDistribution) -> Dict[str, Any]:
+        """Validated, picklable sampling spec; clip bounds include the validator's."""
+        if dist.field not in BASE_NUMERIC_FEATURES:
+            raise ValueError(f"Unknown or non-numeric field '{dist.field}'.")
+        required = {
+            "normal": ("mean", "std"),
+            "lognormal": ("mean", "std"),
+            "uniform": ("low", "high"),
+            "triangular": ("low", "mode", "high"),
+        }[dist.kind]
+        missing = [name for name in required if getattr(dist, name) is None]
+        if missing:
+            raise ValueError(f"{dist.kind} distribution for '{dist.field}' needs {', '.join(missing)}.")
+        if dist.low is not None and dist.high is not None and dist.low > dist.high:
+            raise ValueError(f"Distribution for '{dist.field}' has low > high.")
+        if dist.kind == "triangular" and not dist.low <= dist.mode <= dist.high:
+            raise ValueError(f"Triangular mode for '{dist.field}' must lie within low/high.")
+
+        bounds = DataValidator.numeric_bounds.get(dist.field, {})
+        lower = [v for v in (dist.clip_min, bounds.get("min")) if v is not None]
+        upper = [v for v in (dist.clip_max, bounds.get("max")) if v is not None]
+        spec = dist.dict(include={"field", "kind", "mean", "std", "low", "high", "mode", "relative"})
+        spec["clip_min"] = max(lower) if lower else -np.inf
+        spec["clip_max"] = min(upper) if upper else np.inf
+        if spec["clip_min"] > spec["clip_max"]:
+            raise ValueError(f"Clip range for '{dist.field}' is empty.")
+        return spec
+
+    def predict_intervals(
+        self, payloads: Sequence[Dict[str, Any] | CostPredictionRequest]
+    ) -> Tuple[List[int], List[CostPredictionRequest], np.ndarray, List[Dict]]:
+        """Expected/p10/p90 overrun for many projects, without explanations.
+
+        Returns (positions of scored items, their requests, an array of shape
+        (n_scored, 3), ``{"index", "error"}`` entries for rejected items).
+        Nothing is cached or persisted; the native models score the frame.
+        """
+        results, requests, positions = self._parse_requests(payloads)
+        errors = [result for result in results if result]
+        if not requests:
+            return [], [], np.empty((0, 3)), errors
+
+        df = self._payloads_to_frame(requests)
+        valid_rows = []
+        for row, validation in enumerate(self.validator.validate_frame(df)):
+            if validation.is_valid:
+                valid_rows.append(row)
+            else:
+                errors.append({"index": positions[row], "error": "; ".join(validation.issues)})
+        errors.sort(key=lambda error: error["index"])
+        if not valid_rows:
+            return [], [], np.empty((0, 3)), errors
+
+        df = df.iloc[valid_rows]
+        intervals = np.column_stack(
+            [
+                self.model.predict(df),
+                self.quantile_lower.predict(df),
+                self.quantile_upper.predict(df),
+            ]
+        ).astype(float)
+        return (
+            [positions[row] for row in valid_rows],
+            [requests[row] for row in valid_rows],
+            intervals,
+            errors,
+        )
 
     def history(self, limit: int = 50) -> List[Dict]:
         return self.repo.fetch_recent(limit)
 
+    def history_page(self, **query: Any) -> Dict[str, Any]:
+        """Filtered, keyset-paginated history (see PredictionRepository.query_predictions)."""
+        return self.repo.query_predictions(**query)
+
     # ------------------------------------------------------------------ #
     # Helpers
     # ------------------------------------------------------------------ #
     def _payload_to_frame(self, payload: CostPredictionRequest) -> pd.DataFrame:
-        record = payload.dict()
-        df = pd.DataFrame([record])
+        return self._payloads_to_frame([payload])
+
+    def _payloads_to_frame(self, payloads: List[CostPredictionRequest]) -> pd.DataFrame:
+        return self._model_frame(self._engineered_frame(payloads))
+
+    def _engineered_frame(self, payloads: List[CostPredictionRequest]) -> pd.DataFrame:
+        """Typed raw fields plus derived features, before model column selection."""
+        df = pd.DataFrame([payload.dict() for payload in payloads])
 
         # Fill missing numeric fields with sensible defaults and ensure proper types
         for col in BASE_NUMERIC_FEATURES:
@@ -194,14 +766,36 @@ class CostOverrunService:
         for col in BASE_NUMERIC_FEATURES + DERIVED_FEATURES:
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-        
-        for col in CATEGORICAL_FEATURES:
-            if col in df.columns:
-                df[col] = df[col].astype(str).astype("category")
-        
-        df = df[self.feature_columns]
         return df
 
+    def _model_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Model input columns, with categoricals as pandas categories."""
+        return to_model_frame(df, self.feature_columns)
+
+    def _model_fingerprint(self):
+        """Changes whenever a model object is swapped or the artifact file is replaced."""
+        return (
+            self.model_version,
+            id(self.model),
+            id(self.quantile_lower),
+            id(self.quantile_upper),
+            tuple(id(p) for p in self.predictors.values()),
+            file_fingerprint(self.artifact_path),
+        )
+
+    def _select_engines(self) -> Dict[str, object]:
+        """Native model or verified flat tree engine for each of the three models."""
+        probe = self.predictors_probe
+        models = {
+            "point": self.model,
+            "lower": self.quantile_lower,
+            "upper": self.quantile_upper,
+        }
+        return {
+            key: select_engine(model, resolve_engine(self.tree_engines, key), probe, f"cost {key} model")
+            for key, model in models.items()
+        }
+
     def _load_background_sample(self) -> pd.DataFrame:
         try:
             return pd.read_parquet(self.background_path)
@@ -209,31 +803,81 @@ class CostOverrunService:
             logger.warning("Background sample missing; SHAP explanations may be degraded.")
             return pd.DataFrame()
 
-    def _explain(self, df: pd.DataFrame) -> List[FactorContribution]:
+    def _build_attributor(self) -> FlatTreeEnsemble | None:
+        """Flat engine for the point model that supports path attribution."""
+        engine = self.predictors["point"]
+        if not isinstance(engine, FlatTreeEnsemble):
+            engine = select_engine(self.model, "flat", self.predictors_probe, "cost point model (attribution)")
+        if isinstance(engine, FlatTreeEnsemble) and engine.has_node_values:
+            return engine
+        logger.info("Fast explanations unavailable for %s; explain='fast' uses TreeSHAP.", self.model_name)
+        return None
+
+    def _contributors(
+        self, df: pd.DataFrame, explain: str | List[str]
+    ) -> Tuple[List[List[FactorContribution]], List[str]]:
+        """Top contributors per row and the mode that actually produced each.
+
+        ``explain`` is one mode for every row or a mode per row; rows sharing a
+        mode are explained together in one call.
+        """
+        modes = [explain] * len(df) if isinstance(explain, str) else list(explain)
+        contributors: List[List[FactorContribution]] = [[] for _ in range(len(df))]
+        for mode in dict.fromkeys(modes):
+            if mode == "none":
+                continue
+            rows = [i for i, m in enumerate(modes) if m == mode]
+            subset = df if len(rows) == len(df) else df.iloc[rows]
+            started = time.perf_counter()
+            if mode == "fast" and self.attributor is not None:
+                explained = self._explain_fast(subset)
+            else:
+                explained = self._explain_many(subset)
+                for i in rows:
+                    modes[i] = "full"
+            self._record_latency(modes[rows[0]], time.perf_counter() - started, len(rows))
+            for i, factors in zip(rows, explained):
+                contributors[i] = factors
+        return contributors, modes
+
+    def _explain_fast(self, df: pd.DataFrame) -> List[List[FactorContribution]]:
+        """Top-5 path attributions (Saabas) from the flat point-model engine."""
+        try:
+            values = self.attributor.path_attributions(df)
+        except Exception as exc:  # noqa: broad-except
+            logger.error("Failed to compute path attributions: %s", exc)
+            return [[] for _ in range(len(df))]
+        return self._top_contributors(values, self.attributor.feature_names or list(df.columns))
+
+    def _explain_many(self, df: pd.DataFrame) -> List[List[FactorContribution]]:
+        """Top-5 SHAP contributors for every row, from a single explainer call."""
         try:
             shap_values = self.explainer.shap_values(df)
             if isinstance(shap_values, list):
                 shap_values = shap_values[0]
-            row = shap_values[0]
+            shap_values = np.asarray(shap_values)
         except Exception as exc:  # noqa: broad-except
             logger.error("Failed to compute SHAP values: %s", exc)
-            return []
+            return [[] for _ in range(len(df))]
+        return self._top_contributors(shap_values, df.columns)
+
+    @staticmethod
+    def _top_contributors(values: np.ndarray, feature_names) -> List[List[FactorContribution]]:
+        top_idx = np.argsort(np.abs(values), axis=1)[:, ::-1][:, :5]
 
         contributions = []
-        feature_names = df.columns
-        abs_impacts = np.abs(row)
-        top_idx = np.argsort(abs_impacts)[::-1][:5]
-
-        for idx in top_idx:
-            impact = float(row[idx])
-            contributions.append(
-                FactorContribution(
-                    feature=feature_names[idx],
-                    impact=round(abs(impact), 3),
-                    direction="positive" if impact >= 0 else "negative",
+        for row, row_top in zip(values, top_idx):
+            factors = []
+            for idx in row_top:
+                impact = float(row[idx])
+                factors.append(
+                    FactorContribution(
+                        feature=feature_names[idx],
+                        impact=round(abs(impact), 3),
+                        direction="positive" if impact >= 0 else "negative",
+                    )
                 )
-            )
-
+            contributions.append(factors)
         return contributions
 
     def _risk_bucket(self, percent: float) -> str:
@@ -243,38 +887,55 @@ class CostOverrunService:
             return "Medium"
         return "High"
 
-    def _build_alerts(self, percent: float, payload: CostPredictionRequest) -> List[str]:
-        alerts = []
-        if percent >= ALERT_THRESHOLD_PERCENT:
-            alerts.append("Predicted cost overrun exceeds alert threshold.")
-        if payload.progress_ratio and payload.progress_ratio < 0.4:
-            alerts.append("Low progress ratio with rising costs.")
-        if payload.totalreceivedamount and payload.totalsellingamount:
-            collection_eff = payload.totalreceivedamount / payload.totalsellingamount
-            if collection_eff < 0.5:
-                alerts.append("Collections below 50% of sales; liquidity risk.")
-        return alerts
+    @staticmethod
+    def _payload_array(payloads: List[CostPredictionRequest], field: str) -> np.ndarray:
+        """Field values as floats, with None mapped to 0 (falsy, like the payload)."""
+        return np.array([getattr(p, field) or 0.0 for p in payloads], dtype=float)
+
+    def _build_alerts(
+        self, percent: np.ndarray, payloads: List[CostPredictionRequest]
+    ) -> List[List[str]]:
+        progress = self._payload_array(payloads, "progress_ratio")
+        received = self._payload_array(payloads, "totalreceivedamount")
+        selling = self._payload_array(payloads, "totalsellingamount")
+
+        has_collections = (received != 0) & (selling != 0)
+        collection_eff = np.divide(received, selling, out=np.ones_like(received), where=has_collections)
+        rules = [
+            (percent >= ALERT_THRESHOLD_PERCENT, "Predicted cost overrun exceeds alert threshold."),
+            ((progress != 0) & (progress < 0.4), "Low progress ratio with rising costs."),
+            (has_collections & (collection_eff < 0.5), "Collections below 50% of sales; liquidity risk."),
+        ]
+        return [[message for mask, message in rules if mask[i]] for i in range(len(payloads))]
 
     def _recommendations(
         self,
-        percent: float,
-        contributors: List[FactorContribution],
-        payload: CostPredictionRequest,
-    ) -> List[str]:
-        recs = []
-        if percent >= RISK_HIGH_THRESHOLD:
-            recs.append("Activate cost-control task force and re-baseline budget.")
-        elif percent >= RISK_MEDIUM_THRESHOLD:
-            recs.append("Tighten procurement approvals and monitor weekly.")
-        else:
-            recs.append("Maintain monthly monitoring cadence.")
-
-        if payload.progress_ratio and payload.progress_ratio < 0.5:
-            recs.append("Increase execution throughput to avoid compounding overruns.")
-
-        for factor in contributors[:2]:
-            if factor.feature in {"cashflow_pressure", "collection_efficiency"}:
-                recs.append("Improve cash collection to reduce financing strain.")
-                break
-        return recs
+        percent: np.ndarray,
+        contributors: List[List[FactorContribution]],
+        payloads: List[CostPredictionRequest],
+    ) -> List[List[str]]:
+        progress = self._payload_array(payloads, "progress_ratio")
+        cash_drivers = np.array(
+            [
+                any(f.feature in {"cashflow_pressure", "collection_efficiency"} for f in factors[:2])
+                for factors in contributors
+            ],
+            dtype=bool,
+        )
+        budget = np.select(
+            [percent >= RISK_HIGH_THRESHOLD, percent >= RISK_MEDIUM_THRESHOLD],
+            [
+                "Activate cost-control task force and re-baseline budget.",
+                "Tighten procurement approvals and monitor weekly.",
+            ],
+            default="Maintain monthly monitoring cadence.",
+        )
+        rules = [
+            ((progress != 0) & (progress < 0.5), "Increase execution throughput to avoid compounding overruns."),
+            (cash_drivers, "Improve cash collection to reduce financing strain."),
+        ]
+        return [
+            [str(budget[i])] + [message for mask, message in rules if mask[i]]
+            for i in range(len(payloads))
+        ]
 
@@ -0,0 +1,73 @@
+"""Chunk-by-chunk encoders for streamed prediction history exports."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import pyarrow as pa
+
+from archive import arrow_schema
+
+Columns = Sequence[Tuple[str, str]]
+Chunks = Iterable[List[tuple]]
+
+
+def _ndjson(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    names = [name for name, _ in columns]
+    for chunk in chunks:
+        yield "".join(json.dumps(dict(zip(names, row))) + "\n" for row in chunk).encode()
+
+
+def _csv(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow([name for name, _ in columns])
+    yield drain()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield drain()
+
+
+def _arrow(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    schema = arrow_schema(columns)
+    buffer = io.BytesIO()
+
+    def drain() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    # One record batch per chunk in the Arrow IPC streaming format
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        yield drain()
+        for chunk in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield drain()
+    yield drain()
+
+
+# format -> (encoder, mimetype, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[Callable[[Columns, Chunks], Iterator[bytes]], str, str]] = {
+    "ndjson": (_ndjson, "application/x-ndjson", "ndjson"),
+    "csv": (_csv, "text/csv", "csv"),
+    "arrow": (_arrow, "application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def encode_export(fmt: str, columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    """Byte chunks of ``chunks`` in ``fmt``; raises ValueError for unknown formats."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'; expected one of {', '.join(EXPORT_FORMATS)}.")
+    return EXPORT_FORMATS[fmt][0](columns, chunks)
@@ -0,0 +1,371 @@
+"""Offload CPU-bound scoring from the request threads (inline, threads or processes)."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+from ml.config import (
+    INFERENCE_MODE,
+    INFERENCE_MODES,
+    INFERENCE_READY_TIMEOUT_SECONDS,
+    INFERENCE_START_METHOD,
+    INFERENCE_TIMEOUT_SECONDS,
+    INFERENCE_WORKERS,
+)
+from services.monte_carlo import simulate_chunk
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceTimeout(TimeoutError):
+    """A task did not finish (or start) before its deadline.
+
+    ``reason`` is "timed_out" (abandoned while running), "cancelled" (never
+    left the queue) or "expired" (skipped by the worker that picked it up).
+    """
+
+    def __init__(self, message: str, reason: str = "timed_out"):
+        super().__init__(message)
+        self.reason = reason
+
+    def __reduce__(self):
+        return type(self), (str(self), self.reason)
+
+
+@dataclass
+class InferenceModels:
+    """The loaded models a task runs against (None when a family failed to load)."""
+
+    predictor: Any = None
+    cost_service: Any = None
+    portfolio_engine: Any = None
+
+
+def load_models(model_dir: str) -> InferenceModels:
+    """Load every model family the way app.py does; failures leave None."""
+    from predict import DelayPredictor
+    from services.cost_service import CostOverrunService
+    from services.portfolio_service import PortfolioRiskEngine
+
+    models = InferenceModels()
+    try:
+        models.predictor = DelayPredictor(model_dir=model_dir)
+    except Exception as exc:
+        logger.error("Failed to load delay models: %s", exc)
+    try:
+        models.cost_service = CostOverrunService()
+    except Exception as exc:
+        logger.error("Failed to load cost overrun models: %s", exc)
+    if models.cost_service is not None:
+        models.portfolio_engine = PortfolioRiskEngine(models.cost_service, models.predictor)
+    return models
+
+
+def worker_state(models: InferenceModels) -> Dict[str, Any]:
+    """What the web process mirrors from a process worker after each task."""
+    return {
+        "ensemble_loaded": models.predictor is not None and models.predictor.ensemble_loaded,
+        "stage_latency": dict(models.cost_service.stage_latency) if models.cost_service is not None else {},
+    }
+
+
+# Tasks by name: only the name and the arguments cross the process boundary.
+# Nothing is persisted here; the caller stores the results in its own process.
+# The *.score_rows tasks score one micro-batch (see InferenceExecutor.attach).
+TASKS: Dict[str, Callable[..., Any]] = {
+    "delay.score_rows": lambda models, projects, flags: models.predictor.score_coalesced(projects, flags),
+    "delay.predict_batch": lambda models, projects, use_ensemble: models.predictor.predict_batch(
+        projects, use_ensemble=use_ensemble
+    ),
+    "cost.score_rows": lambda models, payloads, mode: models.cost_service.score_coalesced(payloads, mode),
+    "cost.predict_many": lambda models, projects, explain, deadline: models.cost_service.predict_many(
+        projects, persist=False, explain=explain, deadline=deadline
+    ),
+    "cost.simulate": lambda models, request, deadline: models.cost_service.simulate(request, deadline=deadline),
+    "cost.sensitivity": lambda models, request: models.cost_service.sensitivity(request),
+    "cost.monte_carlo_chunk": lambda models, *chunk: simulate_chunk(
+        models.cost_service.model, models.cost_service.feature_columns, *chunk
+    ),
+    "portfolio.simulate": lambda models, request: models.portfolio_engine.simulate(request),
+}
+
+
+def run_task(models: InferenceModels, task: str, args: tuple, kwargs: dict, deadline: float | None) -> Any:
+    # time.monotonic() is system-wide, so a deadline set by the web process
+    # holds in a worker process too; expired tasks are skipped, not run
+    if deadline is not None and time.monotonic() > deadline:
+        raise InferenceTimeout(f"Inference task '{task}' expired before it started", "expired")
+    return TASKS[task](models, *args, **kwargs)
+
+
+class InferenceExecutor:
+    """Runs named scoring tasks inline, on a thread pool or on a process pool.
+
+    ``run`` blocks the calling request thread until the task finishes, raising
+    InferenceTimeout once ``timeout`` seconds have passed: a task that has not
+    started yet is cancelled (or skipped by the worker that picks it up), one
+    that is running is abandoned. Inline mode has no timeout.
+
+    Process workers are started by ``start`` and each loads the models once
+    (services/inference_worker.py) before reporting ready, so the first
+    requests do not pay for it; every worker holds its own copy. Thread and
+    inline modes use the ``models`` of this process. A pool whose worker died
+    is replaced on the next call. Nothing starts until ``start`` or the first
+    ``run``.
+    """
+
+    def __init__(
+        self,
+        models: InferenceModels,
+        *,
+        model_dir: str = "models",
+        mode: str = INFERENCE_MODE,
+        workers: int = INFERENCE_WORKERS,
+        timeout: float | None = INFERENCE_TIMEOUT_SECONDS,
+        start_method: str = INFERENCE_START_METHOD,
+        ready_timeout: float = INFERENCE_READY_TIMEOUT_SECONDS,
+    ):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode '{mode}'; expected one of {', '.join(INFERENCE_MODES)}.")
+        self.models = models
+        self.model_dir = os.path.abspath(model_dir)
+        self.mode = mode
+        self.workers = max(int(workers), 1)
+        self.timeout = timeout
+        self.start_method = start_method
+        self.ready_timeout = ready_timeout
+        self.worker_pids: List[int] = []
+        self._pool: Executor | None = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "cancelled": 0,
+            "expired": 0,
+            "pool_restarts": 0,
+        }
+        self._in_flight = 0
+        self._task_seconds = 0.0
+        self._worker_ensemble_loaded = False
+        self._registered = False
+
+    def start(self):
+        """Create the pool (and wait for process workers to load their models)."""
+        with self._lock:
+            self._start()
+
+    def _start(self) -> Executor | None:
+        if self.mode == "inline" or self._pool is not None:
+            return self._pool
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        else:
+            from services import inference_worker
+
+            started = time.perf_counter()
+            context = multiprocessing.get_context(self.start_method)
+            ready = context.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=inference_worker.init_worker,
+                initargs=(self.model_dir, ready),
+            )
+            # Workers are spawned on demand: one submission per worker starts them all
+            for _ in range(self.workers):
+                self._pool.submit(inference_worker.noop)
+            self.worker_pids = []
+            try:
+                while len(self.worker_pids) < self.workers:
+                    remaining = self.ready_timeout - (time.perf_counter() - started)
+                    self.worker_pids.append(ready.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                logger.warning("Only %d of %d inference workers ready", len(self.worker_pids), self.workers)
+            logger.info(
+                "Inference pool ready: %d process workers in %.1fs",
+                len(self.worker_pids),
+                time.perf_counter() - started,
+            )
+        if not self._registered:
+            atexit.register(self.shutdown)
+            self._registered = True
+        return self._pool
+
+    def run(self, task: str, *args: Any, timeout: float | None = None, **kwargs: Any) -> Any:
+        """Result of ``task`` (see TASKS); ``timeout`` defaults to the executor's."""
+        return self.map(task, [args], timeout=timeout, **kwargs)[0]
+
+    def map(self, task: str, calls: Sequence[tuple], *, timeout: float | None = None, **kwargs: Any) -> List[Any]:
+        """Results of ``task`` for each argument tuple in ``calls``.
+
+        The calls run concurrently on the pool (in turn in inline mode) and
+        share one deadline; when it passes, the calls still queued are
+        cancelled. Counted as one task in ``stats``.
+        """
+        if task not in TASKS:
+            raise KeyError(f"Unknown inference task '{task}'")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            pool = self._start()
+            self._counters["submitted"] += 1
+            self._in_flight += 1
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            if pool is None:
+                results = [run_task(self.models, task, args, kwargs, None) for args in calls]
+            elif self.mode == "thread":
+                futures = [pool.submit(run_task, self.models, task, args, kwargs, deadline) for args in calls]
+                results = self._wait(futures, task, deadline, timeout)
+            else:
+                from services.inference_worker import run_in_worker
+
+                futures = [pool.submit(run_in_worker, task, args, kwargs, deadline) for args in calls]
+                results = []
+                for result, state in self._wait(futures, task, deadline, timeout):
+                    self._mirror(state)
+                    results.append(result)
+            outcome = "completed"
+            return results
+        except InferenceTimeout as exc:
+            outcome = exc.reason
+            raise
+        except BrokenProcessPool:
+            logger.error("❌ An inference worker died; restarting the pool")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self._worker_ensemble_loaded = False
+                    self._counters["pool_restarts"] += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._counters[outcome] += 1
+                self._task_seconds += time.perf_counter() - started
+
+    @staticmethod
+    def _wait(futures: List[Future], task: str, deadline: float | None, timeout: float | None) -> List[Any]:
+        results = []
+        try:
+            for future in futures:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                try:
+                    results.append(future.result(timeout=remaining))
+                except InferenceTimeout:
+                    raise
+                except TimeoutError:
+                    if future.cancel():
+                        raise InferenceTimeout(
+                            f"Inference task '{task}' cancelled after {timeout:g}s in the queue", "cancelled"
+                        ) from None
+                    raise InferenceTimeout(f"Inference task '{task}' timed out after {timeout:g}s") from None
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def _mirror(self, state: Dict[str, Any]):
+        # Smoothed explanation latencies drive explain="auto" in this process
+        with self._lock:
+            self._worker_ensemble_loaded = self._worker_ensemble_loaded or state["ensemble_loaded"]
+        if self.models.cost_service is not None:
+            self.models.cost_service.stage_latency.update(state["stage_latency"])
+
+    def attach(self):
+        """Score this process's micro-batches and Monte Carlo chunks on the executor.
+
+        The prediction caches and batchers stay in this process, in front of
+        the executor: hits never leave it, concurrent misses still coalesce,
+        and each batch becomes one task. A batch waits as long as its most
+        patient caller (``timeout`` None means the executor's default).
+        """
+        if self.models.predictor is not None:
+            self.models.predictor.batcher.score_batch = self._batch_scorer("delay.score_rows")
+        if self.models.cost_service is not None:
+            self.models.cost_service.batcher.score_batch = self._batch_scorer("cost.score_rows")
+            self._attach_monte_carlo()
+
+    def _attach_monte_carlo(self):
+        engine = self.models.cost_service.monte_carlo_engine
+
+        def map_chunks(chunks, timeout):
+            return self.map("cost.monte_carlo_chunk", chunks, timeout=timeout)
+
+        if self.mode == "process":
+            # Chunks share the executor's worker processes instead of a pool of their own
+            engine.use_executor(map_chunks, self.workers, timeout=self.timeout)
+        else:
+            # Threads would score several chunks one at a time under the GIL:
+            # such runs keep the engine's own process pool (MONTE_CARLO_WORKERS)
+            # and only single chunks leave the request thread here
+            engine.use_executor(map_chunks, timeout=self.timeout)
+
+    def _batch_scorer(self, task: str) -> Callable[[List[Any], Any, float | None], Any]:
+        def score_batch(items, key, timeout):
+            return self.run(task, items, key, timeout=timeout)
+
+        return score_batch
+
+    @property
+    def ensemble_loaded(self) -> bool:
+        """Whether the delay ensemble is loaded where delay predictions are scored."""
+        if self.mode == "process":
+            return self._worker_ensemble_loaded
+        return self.models.predictor is not None and self.models.predictor.ensemble_loaded
+
+    def after_fork(self):
+        """Reset in a forked child (the parent's pool is not usable there) and start.
+
+        A forked server worker already shares the parent's models copy-on-write;
+        a process pool would load private copies of all of them in every such
+        worker, so "process" falls back to "thread" here.
+        """
+        if self.mode == "process":
+            logger.info("Inference mode 'process' is not used in forked workers; using threads")
+            self.mode = "thread"
+            if self.models.cost_service is not None:
+                self._attach_monte_carlo()
+        self._pool = None
+        self._lock = threading.Lock()
+        self._worker_ensemble_loaded = False
+        self.worker_pids = []
+        self.start()
+
+    def shutdown(self, wait: bool = False):
+        """Stop the pool; ``wait`` blocks until its workers have exited."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+                self._worker_ensemble_loaded = False
+                self.worker_pids = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = sum(self._counters[key] for key in ("completed", "failed", "timed_out", "cancelled", "expired"))
+            return {
+                "mode": self.mode,
+                "workers": 1 if self.mode == "inline" else self.workers,
+                "worker_pids": list(self.worker_pids),
+                "running": self.mode == "inline" or self._pool is not None,
+                "default_timeout_seconds": self.timeout,
+                **self._counters,
+                "in_flight": self._in_flight,
+                "avg_task_ms": round(self._task_seconds / finished * 1000, 3) if finished else 0.0,
+            }
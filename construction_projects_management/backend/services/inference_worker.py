@@ -0,0 +1,32 @@
+"""Entry points of the inference worker processes (INFERENCE_MODE = "process").
+
+Spawned workers load their models here rather than from the script that
+started the server, so each one holds exactly one copy of every model and
+never opens the prediction database.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Tuple
+
+from services.inference import load_models, run_task, worker_state
+
+_WORKER: Dict[str, Any] = {}
+
+
+def init_worker(model_dir: str, ready):
+    # One model thread per process; the pool provides the parallelism
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    _WORKER["models"] = load_models(model_dir)
+    ready.put(os.getpid())
+
+
+def run_in_worker(task: str, args: tuple, kwargs: dict, deadline: float | None) -> Tuple[Any, Dict[str, Any]]:
+    """Result of ``task`` plus the worker state the web process mirrors."""
+    models = _WORKER["models"]
+    return run_task(models, task, args, kwargs, deadline), worker_state(models)
+
+
+def noop():
+    return None
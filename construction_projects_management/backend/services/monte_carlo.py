@@ -0,0 +1,282 @@
+"""Chunked, process-parallel Monte Carlo simulation of cost overrun."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.config import (
+    MONTE_CARLO_CHUNK_SIZE,
+    MONTE_CARLO_HIST_BINS,
+    MONTE_CARLO_HIST_RANGE,
+    MONTE_CARLO_START_METHOD,
+    MONTE_CARLO_WORKERS,
+    RISK_HIGH_THRESHOLD,
+    RISK_MEDIUM_THRESHOLD,
+)
+from ml.features import expand_row, to_model_frame
+
+logger = logging.getLogger(__name__)
+
+HIST_EDGES = np.linspace(*MONTE_CARLO_HIST_RANGE, MONTE_CARLO_HIST_BINS + 1)
+
+
+@dataclass
+class ChunkSummary:
+    """Mergeable statistics of one chunk of simulated overrun percentages."""
+
+    counts: np.ndarray
+    underflow: int
+    overflow: int
+    n: int
+    total: float
+    total_sq: float
+    minimum: float
+    maximum: float
+    medium_or_worse: int
+    high: int
+
+    def merge(self, other: "ChunkSummary") -> "ChunkSummary":
+        return ChunkSummary(
+            counts=self.counts + other.counts,
+            underflow=self.underflow + other.underflow,
+            overflow=self.overflow + other.overflow,
+            n=self.n + other.n,
+            total=self.total + other.total,
+            total_sq=self.total_sq + other.total_sq,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            medium_or_worse=self.medium_or_worse + other.medium_or_worse,
+            high=self.high + other.high,
+        )
+
+
+def sample_inputs(
+    specs: Sequence[Dict[str, Any]], base_row: pd.DataFrame, n: int, rng: np.random.Generator
+) -> Dict[str, np.ndarray]:
+    """Draw ``n`` values per distribution spec (see CostOverrunService._distribution_spec)."""
+    columns = {}
+    for spec in specs:
+        kind = spec["kind"]
+        if kind == "normal":
+            draws = rng.normal(spec["mean"], spec["std"], n)
+        elif kind == "uniform":
+            draws = rng.uniform(spec["low"], spec["high"], n)
+        elif kind == "triangular":
+            draws = rng.triangular(spec["low"], spec["mode"], spec["high"], n)
+        else:
+            draws = rng.lognormal(spec["mean"], spec["std"], n)
+        if spec["relative"]:
+            draws = draws * float(base_row[spec["field"]].iloc[0])
+        columns[spec["field"]] = np.clip(draws, spec["clip_min"], spec["clip_max"])
+    return columns
+
+
+def simulate_chunk(
+    model,
+    feature_columns: Sequence[str],
+    base_row: pd.DataFrame,
+    specs: Sequence[Dict[str, Any]],
+    seed: np.random.SeedSequence,
+    n: int,
+) -> ChunkSummary:
+    """Sample ``n`` inputs, score them with ``model`` and summarize the overrun."""
+    rng = np.random.default_rng(seed)
+    df = to_model_frame(expand_row(base_row, sample_inputs(specs, base_row, n, rng)), feature_columns)
+    overrun = np.asarray(model.predict(df), dtype=float)
+    counts, _ = np.histogram(overrun, bins=HIST_EDGES)
+    return ChunkSummary(
+        counts=counts,
+        underflow=int((overrun < HIST_EDGES[0]).sum()),
+        overflow=int((overrun > HIST_EDGES[-1]).sum()),
+        n=n,
+        total=float(overrun.sum()),
+        total_sq=float(np.square(overrun).sum()),
+        minimum=float(overrun.min()),
+        maximum=float(overrun.max()),
+        medium_or_worse=int((overrun >= RISK_MEDIUM_THRESHOLD).sum()),
+        high=int((overrun >= RISK_HIGH_THRESHOLD).sum()),
+    )
+
+
+def histogram_percentiles(summary: ChunkSummary, percentiles: Sequence[float]) -> Dict[str, float]:
+    """Percentiles interpolated within the fixed bins; tails fall back to min/max."""
+    cumulative = summary.underflow + np.concatenate([[0], np.cumsum(summary.counts)])
+    values = {}
+    for q in percentiles:
+        target = q / 100 * summary.n
+        if target > cumulative[-1] or q >= 100:
+            value = summary.maximum
+        elif target <= summary.underflow:
+            value = summary.minimum
+        else:
+            i = min(int(np.searchsorted(cumulative, target, side="left")) - 1, len(summary.counts) - 1)
+            i = max(i, 0)
+            in_bin = summary.counts[i]
+            fraction = (target - cumulative[i]) / in_bin if in_bin else 0.0
+            value = HIST_EDGES[i] + fraction * (HIST_EDGES[i + 1] - HIST_EDGES[i])
+        values[f"p{q:g}"] = float(min(max(value, summary.minimum), summary.maximum))
+    return values
+
+
+def coarse_histogram(summary: ChunkSummary, bins: int) -> Dict[str, List]:
+    """Re-bin the fine histogram into ``bins`` groups of adjacent bins."""
+    starts = np.unique(np.linspace(0, len(summary.counts), bins + 1).astype(int)[:-1])
+    return {
+        "edges": HIST_EDGES[np.append(starts, len(summary.counts))].round(4).tolist(),
+        "counts": np.add.reduceat(summary.counts, starts).tolist(),
+        "underflow": summary.underflow,
+        "overflow": summary.overflow,
+    }
+
+
+# ---------------------------------------------------------------------- #
+# Worker processes
+# ---------------------------------------------------------------------- #
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(artifact_path: str):
+    # One model thread per process; the pool provides the parallelism
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    import joblib
+
+    artifacts = joblib.load(artifact_path)
+    _WORKER["model"] = artifacts["point_model"]
+    _WORKER["feature_columns"] = artifacts["feature_columns"]
+
+
+def _simulate_chunk_in_worker(task) -> ChunkSummary:
+    return simulate_chunk(_WORKER["model"], _WORKER["feature_columns"], *task)
+
+
+class MonteCarloEngine:
+    """Runs simulations inline, on a lazily started process pool or on a shared executor.
+
+    Workers load the point model once from ``artifact_path`` (initializer),
+    so only the one-row base frame, the specs and a seed travel per chunk.
+    ``use_executor`` hands chunks to the server's inference executor (see
+    there for which). Chunk seeds are spawned from one SeedSequence, so results depend on the
+    seed and chunk size but not on the number of workers.
+    """
+
+    def __init__(
+        self,
+        model,
+        feature_columns: Sequence[str],
+        artifact_path: str,
+        *,
+        workers: int = MONTE_CARLO_WORKERS,
+        chunk_size: int = MONTE_CARLO_CHUNK_SIZE,
+        start_method: str = MONTE_CARLO_START_METHOD,
+    ):
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.artifact_path = str(artifact_path)
+        self.workers = workers
+        self.pool_workers = workers
+        self.chunk_size = chunk_size
+        self.start_method = start_method
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.timeout: float | None = None
+        self._map_chunks: Callable[[List[tuple], float | None], List[ChunkSummary]] | None = None
+        self._shared = False
+
+    def use_executor(
+        self,
+        map_chunks: Callable[[List[tuple], float | None], List[ChunkSummary]] | None,
+        workers: int = 0,
+        *,
+        timeout: float | None = None,
+    ):
+        """Score chunks with ``map_chunks(tasks, timeout)``, tasks being argument
+        tuples of ``simulate_chunk`` after the model.
+
+        With ``workers`` (shared worker processes) every run goes there and
+        the engine never starts a pool of its own. Without, runs of several
+        chunks keep that pool and only the rest, which would otherwise be
+        scored on the calling thread, go to ``map_chunks``. ``timeout`` is the
+        default of ``run``; None as ``map_chunks`` goes back to the pool alone.
+        """
+        self._shared = map_chunks is not None and workers > 0
+        if self._shared:
+            self.shutdown()
+        self._map_chunks = map_chunks
+        self.workers = workers if self._shared else self.pool_workers
+        self.timeout = timeout
+
+    def run(
+        self,
+        base_row: pd.DataFrame,
+        specs: Sequence[Dict[str, Any]],
+        n_samples: int,
+        seed: int | None = None,
+        timeout: float | None = None,
+    ) -> Tuple[ChunkSummary, int, int]:
+        """Merged summary, the seed used (drawn if not given) and the chunk count.
+
+        Raises TimeoutError when the chunks are not done after ``timeout``
+        seconds (default ``self.timeout``; None waits); inline runs have none.
+        """
+        if seed is None:
+            # 32 bits keep the reported seed exact in JSON clients
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        sequence = np.random.SeedSequence(seed)
+        n_chunks = math.ceil(n_samples / self.chunk_size)
+        sizes = [min(self.chunk_size, n_samples - i * self.chunk_size) for i in range(n_chunks)]
+        tasks = [
+            (base_row, list(specs), child, size)
+            for child, size in zip(sequence.spawn(n_chunks), sizes)
+        ]
+
+        timeout = self.timeout if timeout is None else timeout
+        pooled = self.workers > 1 and n_chunks > 1
+        if self._map_chunks is not None and (self._shared or not pooled):
+            summaries = self._map_chunks(tasks, timeout)
+        elif pooled:
+            try:
+                summaries = list(self._get_pool().map(_simulate_chunk_in_worker, tasks, timeout=timeout))
+            except TimeoutError:
+                raise TimeoutError(f"Monte Carlo simulation timed out after {timeout:g}s") from None
+        else:
+            summaries = [simulate_chunk(self.model, self.feature_columns, *task) for task in tasks]
+
+        merged = summaries[0]
+        for summary in summaries[1:]:
+            merged = merged.merge(summary)
+        return merged, seed, n_chunks
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.artifact_path,),
+                )
+                atexit.register(self.shutdown)
+                logger.info("Started Monte Carlo pool with %d workers", self.workers)
+            return self._pool
+
+    def after_fork(self):
+        """Drop a pool (and lock) inherited from the parent of a forked process."""
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
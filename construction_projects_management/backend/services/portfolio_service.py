@@ -0,0 +1,223 @@
+"""Portfolio-level correlated risk aggregation over cost overrun and delay."""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from statistics import NormalDist
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ml.config import PORTFOLIO_BLOCK_ELEMENTS, PORTFOLIO_MAX_DRAWS, PORTFOLIO_MAX_PROJECTS
+from schemas import PortfolioRiskRequest
+
+logger = logging.getLogger(__name__)
+
+# The quantile models predict p10/p90, i.e. +-1.2816 standard deviations
+_Z90 = NormalDist().inv_cdf(0.9)
+
+
+class PortfolioRiskEngine:
+    """Joint outcomes for many projects under a district/promoter factor model.
+
+    Each project's latent shock is
+
+        z = sqrt(rho_d) * F[district] + sqrt(rho_p) * G[promoter] + sqrt(1 - rho_d - rho_p) * e
+
+    with independent standard normal factors. The overrun amount is the point
+    prediction plus ``z`` times a two-piece scale fitted to the p10/p90
+    predictions. Delay uses the same district/promoter factors with its own
+    idiosyncratic term; a project is delayed when that shock exceeds
+    ``Phi^-1(1 - p)``, so its marginal delay probability is preserved.
+
+    Draws are simulated in blocks of at most ``block_elements`` project-draws,
+    so memory stays bounded for 10k projects x 10k draws; only per-draw
+    totals (portfolio and per district) are kept. Each factor draws from its
+    own random stream, so for a given seed the block size does not change
+    the results.
+    """
+
+    def __init__(self, cost_service, delay_predictor=None, *, block_elements: int = PORTFOLIO_BLOCK_ELEMENTS):
+        self.cost_service = cost_service
+        self.delay_predictor = delay_predictor
+        self.block_elements = block_elements
+
+    def simulate(self, request: PortfolioRiskRequest) -> Dict[str, Any]:
+        """Aggregate percentiles, expected shortfall and per-district contributions.
+
+        Raises ValueError for oversized requests or when no project can be scored.
+        """
+        started = time.perf_counter()
+        if len(request.projects) > PORTFOLIO_MAX_PROJECTS:
+            raise ValueError(
+                f"Portfolio has {len(request.projects)} projects; the limit is {PORTFOLIO_MAX_PROJECTS}."
+            )
+        if request.n_draws > PORTFOLIO_MAX_DRAWS:
+            raise ValueError(f"n_draws is {request.n_draws}; the limit is {PORTFOLIO_MAX_DRAWS}.")
+        if any(not 0 <= q <= 100 for q in request.percentiles):
+            raise ValueError("Percentiles must be between 0 and 100.")
+
+        positions, requests, intervals, errors = self.cost_service.predict_intervals(request.projects)
+        if not positions:
+            raise ValueError("No project in the portfolio could be scored.")
+        delay_prob = self._delay_probabilities(request, positions, errors)
+
+        # Sort projects by district so per-district sums are contiguous slices
+        districts, district_idx = np.unique([r.districttype for r in requests], return_inverse=True)
+        promoters, promoter_idx = np.unique([r.promotertype for r in requests], return_inverse=True)
+        order = np.argsort(district_idx, kind="stable")
+        district_idx, promoter_idx = district_idx[order], promoter_idx[order]
+        starts = np.flatnonzero(np.r_[True, district_idx[1:] != district_idx[:-1]])
+
+        cost = np.array([r.final_project_cost for r in requests])[order]
+        point, p10, p90 = intervals[order].T
+        base = point * cost / 100
+        scale_low = np.maximum(point - p10, 0) / _Z90 * cost / 100
+        scale_high = np.maximum(p90 - point, 0) / _Z90 * cost / 100
+        thresholds = None
+        if delay_prob is not None:
+            # NaN (no delay prediction) -> never delayed
+            p = np.nan_to_num(delay_prob[order], nan=0.0).clip(0, 1)
+            thresholds = np.array([self._upper_quantile(v) for v in p], dtype=np.float32)
+
+        seed = request.seed
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        district_rng, promoter_rng, cost_rng, delay_rng = (
+            np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(4)
+        )
+        load_d = math.sqrt(request.district_correlation)
+        load_p = math.sqrt(request.promoter_correlation)
+        load_e = math.sqrt(max(1 - request.district_correlation - request.promoter_correlation, 0))
+
+        n_projects, n_draws = len(cost), request.n_draws
+        block = max(1, self.block_elements // n_projects)
+        totals = np.empty(n_draws)
+        district_totals = np.empty((n_draws, len(districts)))
+        delayed = np.empty(n_draws) if thresholds is not None else None
+        district_delayed = np.zeros(len(districts))
+        for start in range(0, n_draws, block):
+            size = min(block, n_draws - start)
+            rows = slice(start, start + size)
+            common = (
+                load_d * district_rng.standard_normal((size, len(districts)), dtype=np.float32)
+            )[:, district_idx]
+            common += (
+                load_p * promoter_rng.standard_normal((size, len(promoters)), dtype=np.float32)
+            )[:, promoter_idx]
+
+            z = common + load_e * cost_rng.standard_normal((size, n_projects), dtype=np.float32)
+            amounts = base + z * np.where(z < 0, scale_low, scale_high)
+            by_district = np.add.reduceat(amounts, starts, axis=1)
+            district_totals[rows] = by_district
+            totals[rows] = by_district.sum(axis=1)
+
+            if thresholds is not None:
+                common += load_e * delay_rng.standard_normal((size, n_projects), dtype=np.float32)
+                hits = common > thresholds
+                delayed[rows] = hits.sum(axis=1)
+                district_delayed += np.add.reduceat(hits, starts, axis=1).sum(axis=0)
+
+        total_cost = float(cost.sum())
+        var_tail = np.percentile(totals, request.tail_percentile)
+        tail = totals >= var_tail
+        expected_by_district = district_totals.mean(axis=0)
+        tail_by_district = district_totals[tail].mean(axis=0)
+        district_cost = np.add.reduceat(cost, starts)
+        district_counts = np.diff(np.r_[starts, n_projects])
+        expected_total = float(totals.mean())
+        tail_total = float(totals[tail].mean())
+
+        def amount(value: float) -> Dict[str, float]:
+            return {"amount": round(float(value), 2), "percent": round(float(value) / total_cost * 100, 4)}
+
+        district_rows = []
+        for d, name in enumerate(districts):
+            row = {
+                "district": str(name),
+                "projects": int(district_counts[d]),
+                "total_cost": round(float(district_cost[d]), 2),
+                "expected_overrun": round(float(expected_by_district[d]), 2),
+                "share_of_expected": round(float(expected_by_district[d]) / expected_total, 4)
+                if expected_total
+                else None,
+                "tail_contribution": round(float(tail_by_district[d]), 2),
+                "share_of_tail": round(float(tail_by_district[d]) / tail_total, 4) if tail_total else None,
+            }
+            if delayed is not None:
+                row["expected_delayed_projects"] = round(float(district_delayed[d]) / n_draws, 3)
+            district_rows.append(row)
+        district_rows.sort(key=lambda row: row["tail_contribution"], reverse=True)
+
+        delay_summary = None
+        if delayed is not None:
+            delay_summary = {
+                "projects_scored": int(np.isfinite(delay_prob).sum()),
+                "expected_delayed_projects": round(float(delayed.mean()), 3),
+                "percentiles": {
+                    f"p{q:g}": float(np.percentile(delayed, q)) for q in request.percentiles
+                },
+            }
+
+        logger.info(
+            "Portfolio simulation | projects=%d | rejected=%d | draws=%d | block=%d",
+            n_projects,
+            len(request.projects) - n_projects,
+            n_draws,
+            block,
+        )
+        return {
+            "model_version": self.cost_service.model_version,
+            "projects": n_projects,
+            "errors": errors,
+            "n_draws": n_draws,
+            "seed": seed,
+            "block_draws": block,
+            "correlation": {
+                "district": request.district_correlation,
+                "promoter": request.promoter_correlation,
+            },
+            "total_cost": round(total_cost, 2),
+            "overrun": {
+                "expected": amount(expected_total),
+                "std": amount(totals.std()),
+                "percentiles": {
+                    f"p{q:g}": amount(np.percentile(totals, q)) for q in request.percentiles
+                },
+                "tail_percentile": request.tail_percentile,
+                "value_at_risk": amount(var_tail),
+                "expected_shortfall": amount(tail_total),
+            },
+            "districts": district_rows,
+            "delay": delay_summary,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _delay_probabilities(
+        self, request: PortfolioRiskRequest, positions: List[int], errors: List[Dict]
+    ) -> np.ndarray | None:
+        """Delay probability per scored project (NaN where the delay model failed)."""
+        if not request.include_delay or self.delay_predictor is None:
+            return None
+        results = self.delay_predictor.predict_batch(
+            [request.projects[i] for i in positions], use_ensemble=request.use_ensemble
+        )
+        probabilities = np.full(len(positions), np.nan)
+        for row, (position, result) in enumerate(zip(positions, results)):
+            if "error" in result:
+                errors.append({"index": position, "error": f"Delay prediction unavailable: {result['error']}"})
+            else:
+                probabilities[row] = result["delay_probability"]
+        errors.sort(key=lambda error: error["index"])
+        return probabilities
+
+    @staticmethod
+    def _upper_quantile(p: float) -> float:
+        """Threshold t with P(Z > t) = p for a standard normal Z."""
+        if p <= 0:
+            return math.inf
+        if p >= 1:
+            return -math.inf
+        return NormalDist().inv_cdf(1 - p)
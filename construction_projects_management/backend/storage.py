@@ -2,27 +2,1033 @@
 
 from __future__ import annotations
 
+import atexit
+import base64
+import hashlib
 import json
+import logging
 import sqlite3
-from datetime import datetime
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
 
-from ml.config import PREDICTION_DB_PATH
+from archive import ColdArchive, arrow_filter, arrow_schema, keyset_filter
+from ml.config import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    DASHBOARD_TREND_MAX_DAYS,
+    EXPORT_CHUNK_SIZE,
+    HISTORY_MAX_LIMIT,
+    PAYLOAD_COMPRESSION_LEVEL,
+    PREDICTION_DB_PATH,
+    PREDICTION_WRITE_BEHIND,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_READ_POOL_SIZE,
+    SQLITE_SYNCHRONOUS,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FULL_POLICY,
+    WRITE_BEHIND_LINGER_SECONDS,
+    WRITE_BEHIND_MAX_QUEUE,
+)
+
+logger = logging.getLogger(__name__)
+
+_COST_INSERT = """
+    INSERT INTO cost_predictions (
+        created_at,
+        model_version,
+        scenario_name,
+        risk_level,
+        alerts,
+        input_payload,
+        output_payload,
+        expected_overrun_percent,
+        predicted_final_cost,
+        p10_overrun_percent,
+        p90_overrun_percent,
+        final_project_cost,
+        totalunits,
+        planned_duration_days,
+        progress_ratio,
+        final_project_type,
+        promotertype,
+        districttype
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Typed copies of cost prediction values: (column, SQL type, payload column,
+# JSON path). Filled on insert; schema version 1 added them to older databases
+# and backfilled them from the stored payloads.
+COST_ANALYTICS_COLUMNS = (
+    ("expected_overrun_percent", "REAL", "output_payload", "$.expected_overrun_percent"),
+    ("predicted_final_cost", "REAL", "output_payload", "$.predicted_final_cost"),
+    ("p10_overrun_percent", "REAL", "output_payload", "$.intervals.p10"),
+    ("p90_overrun_percent", "REAL", "output_payload", "$.intervals.p90"),
+    ("final_project_cost", "REAL", "input_payload", "$.final_project_cost"),
+    ("totalunits", "REAL", "input_payload", "$.totalunits"),
+    ("planned_duration_days", "REAL", "input_payload", "$.planned_duration_days"),
+    ("progress_ratio", "REAL", "input_payload", "$.progress_ratio"),
+    ("final_project_type", "TEXT", "input_payload", "$.final_project_type"),
+    ("promotertype", "TEXT", "input_payload", "$.promotertype"),
+    ("districttype", "TEXT", "input_payload", "$.districttype"),
+)
+
+# PRAGMA user_version of the current schema
+SCHEMA_VERSION = 3
+
+_DELAY_INSERT = """
+    INSERT INTO delay_predictions (
+        created_at,
+        model_version,
+        is_delayed,
+        delay_probability,
+        predicted_delay_days,
+        risk_level,
+        confidence,
+        extreme_override_applied,
+        ensemble_used,
+        recommendations,
+        input_payload,
+        output_payload,
+        final_project_cost,
+        totalunits,
+        planned_duration_days,
+        actual_duration_days,
+        progress_ratio,
+        budget_overrun_percent,
+        bookedunits,
+        land_utilization,
+        final_project_type,
+        promotertype,
+        districttype,
+        avg_temp,
+        total_rain,
+        recommendation_set_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_STATEMENTS = {"cost": _COST_INSERT, "delay": _DELAY_INSERT}
+
+# Queued rows (_cost_row / _delay_row) carry JSON text; _write_rows compresses
+# the payloads at these positions and moves delay recommendations (position
+# 9) into recommendation_sets, appending the set id.
+_PAYLOAD_POSITIONS = {"cost": (5, 6), "delay": (10, 11)}
+_RECOMMENDATIONS_POSITION = 9
+
+FULL_QUEUE_POLICIES = ("block", "drop", "spill")
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class ConnectionPool:
+    """SQLite connections for one database file: a single writer plus pooled readers.
+
+    The database runs in WAL mode, so readers see the last committed snapshot
+    and never wait for the writer. ``synchronous`` (NORMAL by default) skips
+    the fsync on every commit that WAL does not need for consistency, and the
+    busy timeout makes writers in other processes wait for the lock instead of
+    failing with "database is locked". In-process writes are serialized on the
+    writer connection; readers are checked out per use, and up to
+    ``max_idle_readers`` are kept for reuse.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        *,
+        max_idle_readers: int = SQLITE_READ_POOL_SIZE,
+        busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+        synchronous: str = SQLITE_SYNCHRONOUS,
+    ):
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level '{synchronous}'; expected one of {SYNCHRONOUS_LEVELS}.")
+        self.db_path = Path(db_path)
+        self.max_idle_readers = max_idle_readers
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.synchronous = synchronous.upper()
+
+        self._open()
+
+    def _open(self):
+        self._writer = self._connect()
+        # Persistent: stored in the database file for every later connection
+        self.journal_mode = self._writer.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        self._write_lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+        self._closed = False
+        self.readers_opened = 0
+
+    def _connect(self, *, readonly: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def write(self):
+        """The writer connection inside a transaction (commit, or rollback on error)."""
+        with self._write_lock, self._writer:
+            yield self._writer
+
+    @contextmanager
+    def read(self):
+        """A reader connection owned by the caller until the block exits."""
+        with self._idle_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect(readonly=True)
+            with self._idle_lock:
+                self.readers_opened += 1
+        try:
+            yield conn
+        finally:
+            with self._idle_lock:
+                if not self._closed and len(self._idle) < self.max_idle_readers:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        with self._idle_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        with self._write_lock:
+            self._writer.close()
+
+    def reopen(self):
+        """Open new connections after ``close`` (SQLite connections must not cross a fork)."""
+        if not self._closed:
+            raise RuntimeError("Close the pool before reopening it.")
+        self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._idle_lock:
+            return {
+                "journal_mode": self.journal_mode,
+                "synchronous": self.synchronous,
+                "busy_timeout_ms": self.busy_timeout_ms,
+                "idle_readers": len(self._idle),
+                "readers_opened": self.readers_opened,
+            }
+
+
+class WriteBehindWriter:
+    """Background thread that drains queued rows with executemany and group commits.
+
+    Rows are ready-to-insert tuples keyed by table ("cost" / "delay"). The
+    thread writes through the pool's writer connection, takes up to ``batch_size`` rows at a time
+    (lingering briefly so bursts share a commit) and commits each batch in one
+    transaction. When the queue is full, ``policy`` blocks the caller, drops
+    the row or appends it to ``spill_path`` as JSON lines; spilled rows, and
+    batches whose commit failed, are replayed when the next writer starts.
+    ``close`` (also registered with atexit) drains the queue before returning;
+    callers it wakes from a full queue spill their rows instead.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        *,
+        max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        linger: float = WRITE_BEHIND_LINGER_SECONDS,
+        policy: str = WRITE_BEHIND_FULL_POLICY,
+        spill_path: str | Path | None = None,
+    ):
+        if policy not in FULL_QUEUE_POLICIES:
+            raise ValueError(f"Unknown full-queue policy '{policy}'; expected one of {FULL_QUEUE_POLICIES}.")
+        self.pool = pool
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.linger = linger
+        self.policy = policy
+        self.spill_path = Path(spill_path or pool.db_path.with_suffix(".spill.jsonl"))
+
+        self._rows: deque[Tuple[str, tuple]] = deque()
+        self._cond = threading.Condition()
+        self._pending = 0  # queued + being written
+        self._flush_waiters = 0
+        self._closing = False
+        self.counters = dict.fromkeys(
+            ("enqueued", "written", "dropped", "spilled", "replayed", "failed", "batches"), 0
+        )
+        self.peak_depth = 0
+        self.commit_seconds = 0.0
+        self.last_error: str | None = None
+
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, table: str, rows: List[tuple]):
+        """Queue rows for ``table``; applies the full-queue policy row by row."""
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Write-behind writer is closed.")
+            for i, row in enumerate(rows):
+                if len(self._rows) >= self.max_queue:
+                    if self.policy == "block":
+                        self._cond.wait_for(lambda: len(self._rows) < self.max_queue or self._closing)
+                        if self._closing:
+                            # The thread may already have stopped: keep the rest for the next writer
+                            self._spill([(table, rest) for rest in rows[i:]])
+                            break
+                    elif self.policy == "drop":
+                        self.counters["dropped"] += 1
+                        continue
+                    else:
+                        self._spill([(table, row)])
+                        continue
+                self._rows.append((table, row))
+                self._pending += 1
+                self.counters["enqueued"] += 1
+            self.peak_depth = max(self.peak_depth, len(self._rows))
+            self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued row is committed; False on timeout."""
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: self._pending == 0, timeout)
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: float | None = None):
+        """Stop accepting rows, drain the queue and stop the thread."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            batches = self.counters["batches"]
+            return {
+                "policy": self.policy,
+                "queue_depth": len(self._rows),
+                "max_queue": self.max_queue,
+                "peak_depth": self.peak_depth,
+                "pending": self._pending,
+                **self.counters,
+                "avg_batch_size": round(self.counters["written"] / batches, 1) if batches else 0.0,
+                "avg_commit_ms": round(self.commit_seconds / batches * 1000, 3) if batches else 0.0,
+                "last_error": self.last_error,
+                "running": self._thread.is_alive(),
+            }
+
+    # ------------------------------------------------------------------ #
+    # Writer thread
+    # ------------------------------------------------------------------ #
+    def _run(self):
+        self._replay_spill()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._write(batch)
+
+    def _next_batch(self) -> List[Tuple[str, tuple]] | None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._rows or self._closing)
+            if not self._rows:
+                return None
+            # Linger so a burst of requests shares one commit
+            self._cond.wait_for(
+                lambda: len(self._rows) >= self.batch_size or self._closing or self._flush_waiters,
+                self.linger,
+            )
+            batch = [self._rows.popleft() for _ in range(min(len(self._rows), self.batch_size))]
+            self._cond.notify_all()
+            return batch
+
+    def _write(self, batch: List[Tuple[str, tuple]]):
+        started = time.perf_counter()
+        try:
+            self._insert_grouped(batch)
+            failed = False
+        except sqlite3.Error as exc:
+            logger.error("Write-behind batch of %d rows failed: %s", len(batch), exc)
+            failed = True
+            error = str(exc)
+        with self._cond:
+            if failed:
+                self.counters["failed"] += len(batch)
+                self.last_error = error
+                self._spill(batch)
+            else:
+                self.counters["written"] += len(batch)
+                self.counters["batches"] += 1
+                self.commit_seconds += time.perf_counter() - started
+            self._pending -= len(batch)
+            self._cond.notify_all()
+
+    def _insert_grouped(self, batch: List[Tuple[str, tuple]]):
+        grouped: Dict[str, List[tuple]] = {}
+        for table, row in batch:
+            grouped.setdefault(table, []).append(row)
+        with self.pool.write() as conn:
+            for table, rows in grouped.items():
+                _write_rows(conn, table, rows)
+
+    def _spill(self, batch: List[Tuple[str, tuple]]):
+        # Called with the condition held, so appends never interleave
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as handle:
+                for table, row in batch:
+                    handle.write(json.dumps({"table": table, "row": list(row)}) + "\n")
+            self.counters["spilled"] += len(batch)
+        except OSError as exc:
+            logger.error("Could not spill %d rows to %s: %s", len(batch), self.spill_path, exc)
+            self.counters["dropped"] += len(batch)
+
+    def _replay_spill(self):
+        with self._cond:
+            if not self.spill_path.exists():
+                return
+            try:
+                with open(self.spill_path, encoding="utf-8") as handle:
+                    batch = [(item["table"], tuple(item["row"])) for item in map(json.loads, handle)]
+                self._insert_grouped(batch)
+            except (OSError, ValueError, KeyError, sqlite3.Error) as exc:
+                # Keep the file for the next attempt
+                logger.error("Could not replay spilled rows from %s: %s", self.spill_path, exc)
+                self.last_error = str(exc)
+                return
+            self.spill_path.unlink()
+            self.counters["replayed"] += len(batch)
+            logger.info("Replayed %d spilled prediction rows", len(batch))
+
+
+def _pack(text: str) -> bytes:
+    return zlib.compress(text.encode(), PAYLOAD_COMPRESSION_LEVEL)
+
+
+def _payload_text(value: bytes | str | None) -> str | None:
+    """JSON text of a stored payload: compressed blob, or plain text in older rows."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode()
+    return value
+
+
+def _json_payload(value: bytes | str) -> Any:
+    return json.loads(_payload_text(value))
+
+
+def _recommendation_set_id(items: str) -> int:
+    """Home id of a recommendation list: a 64-bit hash of its JSON."""
+    return int.from_bytes(hashlib.blake2b(items.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _store_recommendation_set(conn: sqlite3.Connection, items: str) -> int:
+    """Id of the row holding ``items``, inserting it if absent.
+
+    Equal lists share one row. The stored list is compared on every hit, so
+    a hash collision moves the new list to the next free id instead of
+    pointing its rows at another list.
+    """
+    set_id = _recommendation_set_id(items)
+    while True:
+        row = conn.execute("SELECT items FROM recommendation_sets WHERE id = ?", (set_id,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO recommendation_sets (id, items) VALUES (?, ?)", (set_id, items))
+            return set_id
+        if row[0] == items:
+            return set_id
+        logger.warning("Recommendation set id %d collides; probing the next id", set_id)
+        set_id = set_id + 1 if set_id < 2**63 - 1 else -(2**63)
+
+
+def _write_rows(conn: sqlite3.Connection, table: str, rows: List[tuple]):
+    """Insert queued rows, compressing payloads and deduplicating recommendations."""
+    positions = _PAYLOAD_POSITIONS[table]
+    encoded = []
+    set_ids: Dict[str, int] = {}
+    for row in rows:
+        values = list(row)
+        for position in positions:
+            values[position] = _pack(values[position])
+        if table == "delay":
+            items = values[_RECOMMENDATIONS_POSITION] or "[]"
+            if items not in set_ids:
+                set_ids[items] = _store_recommendation_set(conn, items)
+            values[_RECOMMENDATIONS_POSITION] = None
+            values.append(set_ids[items])
+        encoded.append(values)
+    conn.executemany(INSERT_STATEMENTS[table], encoded)
+
+
+def _rounded(value: float | None, digits: int) -> float | None:
+    return None if value is None else round(value, digits)
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _cost_row(record: Dict[str, Any], created_at: str) -> tuple:
+    input_data = record["input_payload"]
+    output = record["output_payload"]
+    intervals = output.get("intervals") or {}
+    return (
+        created_at,
+        record["model_version"],
+        record.get("scenario_name"),
+        record["risk_level"],
+        json.dumps(record.get("alerts") or []),
+        json.dumps(input_data),
+        json.dumps(output),
+        _number(output.get("expected_overrun_percent")),
+        _number(output.get("predicted_final_cost")),
+        _number(intervals.get("p10")),
+        _number(intervals.get("p90")),
+        _number(input_data.get("final_project_cost")),
+        _number(input_data.get("totalunits")),
+        _number(input_data.get("planned_duration_days")),
+        _number(input_data.get("progress_ratio")),
+        input_data.get("final_project_type"),
+        input_data.get("promotertype"),
+        input_data.get("districttype"),
+    )
+
+
+def _delay_row(
+    input_payload: Dict[str, Any],
+    output_payload: Dict[str, Any],
+    recommendations: List[str] | None,
+    ensemble_used: bool,
+    model_version: str | None,
+    created_at: str,
+) -> tuple:
+    prediction = output_payload.get("prediction", {})
+
+    # Extract key fields for analytics (denormalized)
+    input_data = input_payload
+
+    return (
+        created_at,
+        model_version,
+        1 if prediction.get("is_delayed", False) else 0,
+        float(prediction.get("delay_probability", 0.0)),
+        int(prediction.get("predicted_delay_days", 0)),
+        prediction.get("risk_level", "Unknown"),
+        prediction.get("confidence", "Unknown"),
+        1 if prediction.get("extreme_override_applied", False) else 0,
+        1 if ensemble_used else 0,
+        json.dumps(recommendations or []),
+        json.dumps(input_payload),
+        json.dumps(output_payload),
+        float(input_data.get("final_project_cost", 0) or 0),
+        int(input_data.get("totalunits", 0) or 0),
+        int(input_data.get("planned_duration_days", 0) or 0),
+        int(input_data.get("actual_duration_days", 0) or 0),
+        float(input_data.get("progress_ratio", 0) or 0) if input_data.get("progress_ratio") else None,
+        float(input_data.get("budget_overrun_percent", 0) or 0) if input_data.get("budget_overrun_percent") else None,
+        int(input_data.get("bookedunits", 0) or 0) if input_data.get("bookedunits") else None,
+        float(input_data.get("land_utilization", 0) or 0) if input_data.get("land_utilization") else None,
+        input_data.get("final_project_type"),
+        input_data.get("promotertype"),
+        input_data.get("districttype"),
+        float(input_data.get("avg_temp", 0) or 0) if input_data.get("avg_temp") else None,
+        float(input_data.get("total_rain", 0) or 0) if input_data.get("total_rain") else None,
+    )
+
+
+def _json_list(value: str | None) -> list:
+    return json.loads(value or "[]")
+
+
+def _timestamp(value: str) -> str:
+    return datetime.fromisoformat(value).isoformat()
+
+
+def _timestamp_end(value: str) -> str:
+    # A bare date includes the whole day
+    moment = datetime.fromisoformat(value)
+    if len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.isoformat()
+
+
+def _flag(value: Any) -> int:
+    if isinstance(value, str):
+        if value.lower() not in ("1", "0", "true", "false"):
+            raise ValueError(value)
+        return int(value.lower() in ("1", "true"))
+    return int(bool(value))
+
+
+def _encode_cursor(created_at: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.") from None
+
+
+def _parse_filters(
+    filter_specs: Dict[str, Tuple[str, Callable]], filters: Dict[str, Any]
+) -> List[Tuple[str, Any]]:
+    """(SQL predicate, parsed value) pairs; None/"" values are ignored."""
+    predicates = []
+    for name, value in filters.items():
+        if value is None or value == "":
+            continue
+        if name not in filter_specs:
+            raise ValueError(f"Unknown filter '{name}'.")
+        predicate, parse = filter_specs[name]
+        try:
+            predicates.append((predicate, parse(value)))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {name}: {value!r}.") from None
+    return predicates
+
+
+# History projections: field -> decoder (None = stored value). JSON columns are
+# only selected and decoded when a caller asks for them.
+COST_HISTORY_FIELDS: Dict[str, Callable | None] = {
+    "id": None,
+    "created_at": None,
+    "model_version": None,
+    "scenario_name": None,
+    "risk_level": None,
+    "alerts": _json_list,
+    "input_payload": _json_payload,
+    "output_payload": _json_payload,
+}
+
+DELAY_HISTORY_FIELDS: Dict[str, Callable | None] = {
+    "id": None,
+    "created_at": None,
+    "model_version": None,
+    "is_delayed": bool,
+    "delay_probability": None,
+    "predicted_delay_days": None,
+    "risk_level": None,
+    "confidence": None,
+    "extreme_override_applied": bool,
+    "ensemble_used": bool,
+    "recommendations": _json_list,
+    "input_payload": _json_payload,
+    "output_payload": _json_payload,
+}
+
+# Fields selected through an SQL expression rather than the column itself.
+# Delay recommendations live in recommendation_sets (older rows: inline JSON).
+_HISTORY_FIELD_SQL: Dict[str, Dict[str, str]] = {
+    "delay_predictions": {
+        "recommendations": "COALESCE((SELECT items FROM recommendation_sets AS s "
+        "WHERE s.id = recommendation_set_id), recommendations)",
+    },
+}
+
+# History filters: name -> (SQL predicate, value parser). Equality filters and
+# date ranges are backed by (column, created_at) indexes.
+COST_HISTORY_FILTERS: Dict[str, Tuple[str, Callable]] = {
+    "risk_level": ("risk_level = ?", str),
+    "model_version": ("model_version = ?", str),
+    "scenario_name": ("scenario_name = ?", str),
+    "district": ("districttype = ?", str),
+    "project_type": ("final_project_type = ?", str),
+    "min_overrun": ("expected_overrun_percent >= ?", float),
+    "max_overrun": ("expected_overrun_percent <= ?", float),
+    "since": ("created_at >= ?", _timestamp),
+    "until": ("created_at < ?", _timestamp_end),
+}
+
+DELAY_HISTORY_FILTERS: Dict[str, Tuple[str, Callable]] = {
+    "risk_level": ("risk_level = ?", str),
+    "model_version": ("model_version = ?", str),
+    "confidence": ("confidence = ?", str),
+    "district": ("districttype = ?", str),
+    "project_type": ("final_project_type = ?", str),
+    "is_delayed": ("is_delayed = ?", _flag),
+    "min_probability": ("delay_probability >= ?", float),
+    "max_probability": ("delay_probability <= ?", float),
+    "since": ("created_at >= ?", _timestamp),
+    "until": ("created_at < ?", _timestamp_end),
+}
+
+COST_GROUP_DIMENSIONS = ("districttype", "final_project_type", "promotertype", "risk_level", "model_version")
+
+# Exports: source -> (table, filters). They carry the scalar (denormalized)
+# columns only; payloads and JSON lists are left out.
+EXPORT_SOURCES = {
+    "cost": ("cost_predictions", COST_HISTORY_FILTERS),
+    "delay": ("delay_predictions", DELAY_HISTORY_FILTERS),
+}
+_EXPORT_EXCLUDED = ("alerts", "recommendations", "recommendation_set_id", "input_payload", "output_payload")
+
+_HISTORY_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_cost_created ON cost_predictions (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cost_risk ON cost_predictions (risk_level, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cost_model ON cost_predictions (model_version, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cost_district ON cost_predictions (districttype, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cost_type ON cost_predictions (final_project_type, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_delay_created ON delay_predictions (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_delay_risk ON delay_predictions (risk_level, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_delay_model ON delay_predictions (model_version, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_delay_district ON delay_predictions (districttype, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_delay_type ON delay_predictions (final_project_type, created_at)",
+)
+
+
+# Delay statistics summary: one row per (dimension, key) -- the grand total
+# ("total", ""), each risk level, confidence, project type and district --
+# kept current by an AFTER INSERT trigger inside the inserting transaction,
+# so the stats endpoint reads a handful of rows however large the table is.
+_DELAY_STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS delay_stats (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        delayed_count INTEGER NOT NULL,
+        delay_days INTEGER NOT NULL,
+        probability_sum REAL NOT NULL,
+        latest_at TEXT,
+        PRIMARY KEY (dimension, key)
+    )
+"""
+
+
+_DELAY_STATS_AGGREGATES = """
+    COUNT(*), SUM(is_delayed <> 0),
+    SUM(CASE WHEN is_delayed THEN predicted_delay_days ELSE 0 END),
+    SUM(delay_probability), MAX(created_at)
+"""
+
+# Rebuilds the summary from existing rows; a no-op once it has any row
+_DELAY_STATS_BACKFILL = """
+    INSERT INTO delay_stats (dimension, key, count, delayed_count, delay_days, probability_sum, latest_at)
+    SELECT 'total', '', {agg} FROM delay_predictions
+        WHERE NOT EXISTS (SELECT 1 FROM delay_stats) HAVING COUNT(*) > 0
+    UNION ALL SELECT 'risk', risk_level, {agg} FROM delay_predictions
+        WHERE NOT EXISTS (SELECT 1 FROM delay_stats) GROUP BY risk_level
+    UNION ALL SELECT 'confidence', confidence, {agg} FROM delay_predictions
+        WHERE NOT EXISTS (SELECT 1 FROM delay_stats) GROUP BY confidence
+    UNION ALL SELECT 'project_type', final_project_type, {agg} FROM delay_predictions
+        WHERE final_project_type <> '' AND NOT EXISTS (SELECT 1 FROM delay_stats) GROUP BY final_project_type
+    UNION ALL SELECT 'district', districttype, {agg} FROM delay_predictions
+        WHERE districttype <> '' AND NOT EXISTS (SELECT 1 FROM delay_stats) GROUP BY districttype
+""".format(agg=_DELAY_STATS_AGGREGATES)
+
+_DELAY_STATS_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS trg_delay_stats AFTER INSERT ON delay_predictions
+    BEGIN
+        INSERT INTO delay_stats (dimension, key, count, delayed_count, delay_days, probability_sum, latest_at)
+        SELECT dimension, key, 1, NEW.is_delayed <> 0,
+               CASE WHEN NEW.is_delayed THEN NEW.predicted_delay_days ELSE 0 END,
+               NEW.delay_probability, NEW.created_at
+        FROM (
+            SELECT 'total' AS dimension, '' AS key
+            UNION ALL SELECT 'risk', NEW.risk_level
+            UNION ALL SELECT 'confidence', NEW.confidence
+            UNION ALL SELECT 'project_type', NEW.final_project_type WHERE NEW.final_project_type <> ''
+            UNION ALL SELECT 'district', NEW.districttype WHERE NEW.districttype <> ''
+        )
+        WHERE true
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            count = count + excluded.count,
+            delayed_count = delayed_count + excluded.delayed_count,
+            delay_days = delay_days + excluded.delay_days,
+            probability_sum = probability_sum + excluded.probability_sum,
+            latest_at = MAX(latest_at, excluded.latest_at);
+    END
+"""
+
+
+# Cost statistics summary, like delay_stats: one row per (dimension, key) for
+# the grand total ("total", "") and every value of COST_GROUP_DIMENSIONS. Keys
+# are json_quote()d so NULL and '' stay separate groups. Averages divide a sum
+# by the count of non-NULL values, as AVG() does.
+_COST_STATS_MEASURES = (
+    ("count", "INTEGER", "1"),
+    ("overrun_percent_sum", "REAL", "COALESCE({row}expected_overrun_percent, 0)"),
+    ("overrun_percent_count", "INTEGER", "{row}expected_overrun_percent IS NOT NULL"),
+    ("final_cost_sum", "REAL", "COALESCE({row}predicted_final_cost, 0)"),
+    ("p10_sum", "REAL", "COALESCE({row}p10_overrun_percent, 0)"),
+    ("p10_count", "INTEGER", "{row}p10_overrun_percent IS NOT NULL"),
+    ("p90_sum", "REAL", "COALESCE({row}p90_overrun_percent, 0)"),
+    ("p90_count", "INTEGER", "{row}p90_overrun_percent IS NOT NULL"),
+    ("high_count", "INTEGER", "{row}risk_level IS 'High'"),
+    ("project_cost_sum", "REAL", "COALESCE({row}final_project_cost, 0)"),
+    ("overrun_amount_sum", "REAL", "COALESCE({row}predicted_final_cost - {row}final_project_cost, 0)"),
+)
+
+# cost_predictions columns the summary reads (also from archived partitions)
+_COST_STATS_SOURCE_COLUMNS = (
+    "created_at",
+    "expected_overrun_percent",
+    "predicted_final_cost",
+    "p10_overrun_percent",
+    "p90_overrun_percent",
+    "final_project_cost",
+    "risk_level",
+) + tuple(name for name in COST_GROUP_DIMENSIONS if name != "risk_level")
+
+
+def _cost_stats_statements(source: str) -> List[str]:
+    """Schema, backfill from ``source`` (a table or subquery) and trigger of cost_stats."""
+    names = ", ".join(name for name, _, _ in _COST_STATS_MEASURES)
+    columns = ",\n".join(f"        {name} {sql_type} NOT NULL" for name, sql_type, _ in _COST_STATS_MEASURES)
+    schema = f"""
+    CREATE TABLE IF NOT EXISTS cost_stats (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+{columns},
+        latest_at TEXT,
+        PRIMARY KEY (dimension, key)
+    )
+    """
+
+    sums = ", ".join(f"SUM({expr.format(row='')})" for _, _, expr in _COST_STATS_MEASURES)
+    groups = "".join(
+        f"\n    UNION ALL SELECT '{name}', json_quote({name}), {sums}, MAX(created_at) FROM {source} GROUP BY {name}"
+        for name in COST_GROUP_DIMENSIONS
+    )
+    backfill = f"""
+    INSERT INTO cost_stats (dimension, key, {names}, latest_at)
+    SELECT 'total', '', {sums}, MAX(created_at) FROM {source} HAVING COUNT(*) > 0{groups}
+    """
+
+    keys = "".join(
+        f"\n            UNION ALL SELECT '{name}', json_quote(NEW.{name})" for name in COST_GROUP_DIMENSIONS
+    )
+    values = ", ".join(expr.format(row="NEW.") for _, _, expr in _COST_STATS_MEASURES)
+    updates = ",\n            ".join(f"{name} = {name} + excluded.{name}" for name, _, _ in _COST_STATS_MEASURES)
+    trigger = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cost_stats AFTER INSERT ON cost_predictions
+    BEGIN
+        INSERT INTO cost_stats (dimension, key, {names}, latest_at)
+        SELECT dimension, key, {values}, NEW.created_at
+        FROM (
+            SELECT 'total' AS dimension, '' AS key{keys}
+        )
+        WHERE true
+        ON CONFLICT (dimension, key) DO UPDATE SET
+            {updates},
+            latest_at = MAX(latest_at, excluded.latest_at);
+    END
+    """
+    return [schema, backfill, trigger]
+
+
+# Time-bucketed rollups: per source table, one row per (granularity, bucket,
+# district), where district '' is the all-district total. Buckets are UTC
+# prefixes of created_at ('YYYY-MM-DDTHH' hourly, 'YYYY-MM-DD' daily). Like
+# delay_stats, an AFTER INSERT trigger keeps them current, so a 90-day daily
+# trend reads ~90 rows per district instead of scanning the prediction log.
+ROLLUP_GRANULARITIES = {"hour": 13, "day": 10}
+
+# Measures shared by both sources; "{row}" is "NEW." inside the trigger. IS
+# keeps rows without a risk level (NULL) out of the counts instead of NULL.
+_ROLLUP_COMMON_MEASURES = (
+    ("count", "INTEGER", "1"),
+    ("high_count", "INTEGER", "{row}risk_level IS 'High'"),
+    ("medium_count", "INTEGER", "{row}risk_level IS 'Medium'"),
+    ("low_count", "INTEGER", "{row}risk_level IS 'Low'"),
+)
+
+# source -> (prediction table, rollup table, extra measures)
+ROLLUP_SOURCES = {
+    "delay": (
+        "delay_predictions",
+        "delay_rollups",
+        (
+            ("delayed_count", "INTEGER", "{row}is_delayed <> 0"),
+            ("delay_days", "INTEGER", "CASE WHEN {row}is_delayed THEN {row}predicted_delay_days ELSE 0 END"),
+            ("probability_sum", "REAL", "{row}delay_probability"),
+        ),
+    ),
+    "cost": (
+        "cost_predictions",
+        "cost_rollups",
+        (
+            ("overrun_count", "INTEGER", "{row}expected_overrun_percent IS NOT NULL"),
+            ("overrun_percent_sum", "REAL", "COALESCE({row}expected_overrun_percent, 0)"),
+            (
+                "overrun_amount_sum",
+                "REAL",
+                "COALESCE({row}predicted_final_cost - {row}final_project_cost, 0)",
+            ),
+        ),
+    ),
+}
+
+
+def _rollup_statements(source: str) -> List[str]:
+    """Schema, one-time backfill and trigger for one source's rollup table."""
+    table, rollup, extra = ROLLUP_SOURCES[source]
+    measures = _ROLLUP_COMMON_MEASURES + extra
+    names = ", ".join(name for name, _, _ in measures)
+    columns = ",\n".join(f"        {name} {sql_type} NOT NULL" for name, sql_type, _ in measures)
+    schema = f"""
+    CREATE TABLE IF NOT EXISTS {rollup} (
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        district TEXT NOT NULL,
+{columns},
+        PRIMARY KEY (granularity, bucket, district)
+    ) WITHOUT ROWID
+    """
+
+    # Hourly rows from the log (no-op once the rollup has any row), then
+    # daily rows re-aggregated from the hourly ones
+    sums = ", ".join(f"SUM({expr.format(row='')})" for _, _, expr in measures)
+    hour = ROLLUP_GRANULARITIES["hour"]
+    empty = f"NOT EXISTS (SELECT 1 FROM {rollup})"
+    backfill_hours = f"""
+    INSERT INTO {rollup} (granularity, bucket, district, {names})
+    SELECT 'hour', substr(created_at, 1, {hour}), '', {sums} FROM {table}
+        WHERE {empty} GROUP BY 2
+    UNION ALL SELECT 'hour', substr(created_at, 1, {hour}), districttype, {sums} FROM {table}
+        WHERE districttype <> '' AND {empty} GROUP BY 2, 3
+    """
+    backfill_days = f"""
+    INSERT INTO {rollup} (granularity, bucket, district, {names})
+    SELECT 'day', substr(bucket, 1, {ROLLUP_GRANULARITIES['day']}), district,
+           {', '.join(f'SUM({name})' for name, _, _ in measures)}
+    FROM {rollup}
+    WHERE granularity = 'hour' AND NOT EXISTS (SELECT 1 FROM {rollup} WHERE granularity = 'day')
+    GROUP BY 2, 3
+    """
+
+    granularities = " UNION ALL ".join(
+        f"SELECT '{name}' AS granularity, {width} AS width" for name, width in ROLLUP_GRANULARITIES.items()
+    )
+    values = ", ".join(expr.format(row="NEW.") for _, _, expr in measures)
+    updates = ",\n            ".join(f"{name} = {name} + excluded.{name}" for name, _, _ in measures)
+    trigger = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{rollup} AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {rollup} (granularity, bucket, district, {names})
+        SELECT g.granularity, substr(NEW.created_at, 1, g.width), d.district, {values}
+        FROM ({granularities}) AS g,
+             (SELECT '' AS district UNION ALL SELECT NEW.districttype WHERE NEW.districttype <> '') AS d
+        WHERE true
+        ON CONFLICT (granularity, bucket, district) DO UPDATE SET
+            {updates};
+    END
+    """
+    return [schema, backfill_hours, backfill_days, trigger]
+
+
+def _bucket_keys(granularity: str, days: int, now: datetime) -> List[str]:
+    """Every bucket key of the last ``days`` days up to ``now``, oldest first."""
+    if granularity == "day":
+        step, count = timedelta(days=1), days
+    else:
+        step, count = timedelta(hours=1), days * 24
+    width = ROLLUP_GRANULARITIES[granularity]
+    return [(now - step * i).isoformat()[:width] for i in range(count - 1, -1, -1)]
 
 
 class PredictionRepository:
-    """Writes and reads prediction records for auditing."""
+    """Writes and reads prediction records for auditing.
+
+    All access goes through a ConnectionPool. Pass ``pool`` to share one with
+    another repository on the same file. With ``write_behind`` (default
+    PREDICTION_WRITE_BEHIND) inserts are queued
+    on a WriteBehindWriter instead of being committed on the caller's thread,
+    so reads may briefly lag behind writes; call ``flush`` to wait for them.
+    Payloads are stored zlib-compressed. ``archive_older_than`` moves old rows
+    to Parquet files under ``archive_dir`` (default ``<db>.archive``), and the
+    history queries continue into them once the SQLite rows run out.
+    """
 
-    def __init__(self, db_path: str | Path | None = None):
-        self.db_path = Path(db_path or PREDICTION_DB_PATH)
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        *,
+        pool: ConnectionPool | None = None,
+        write_behind: bool | None = None,
+        full_policy: str | None = None,
+        archive_dir: str | Path | None = None,
+    ):
+        self.pool = pool or ConnectionPool(db_path or PREDICTION_DB_PATH)
+        self.db_path = self.pool.db_path
+        self.archive = ColdArchive(archive_dir or self.db_path.with_suffix(".archive"))
         self._ensure_tables()
+        self.write_behind = PREDICTION_WRITE_BEHIND if write_behind is None else write_behind
+        self.full_policy = full_policy or WRITE_BEHIND_FULL_POLICY
+        self.writer: WriteBehindWriter | None = None
+        if self.write_behind:
+            self.writer = WriteBehindWriter(self.pool, policy=self.full_policy)
 
     def _ensure_tables(self):
+        with self.pool.write() as conn:
+            # One immediate transaction: a concurrent process cannot insert
+            # between the summary backfill and the trigger creation
+            conn.execute("BEGIN IMMEDIATE")
+            self._create_tables(conn)
+            self._create_cost_stats(conn)
+
+    def _create_cost_stats(self, conn: sqlite3.Connection):
+        """cost_stats, backfilled once from the log and any archived partitions.
+
+        Unlike delay_stats it may be created after rows were archived, so the
+        archived rows are staged in a temporary table and counted too.
+        """
+        schema, _, trigger = _cost_stats_statements("cost_predictions")
+        conn.execute(schema)
+        if self._is_empty(conn, "cost_stats"):
+            source = "cost_predictions"
+            partitions = [
+                row["path"]
+                for row in conn.execute(
+                    "SELECT path FROM archive_partitions WHERE table_name = 'cost_predictions'"
+                )
+            ]
+            if partitions:
+                names = ", ".join(_COST_STATS_SOURCE_COLUMNS)
+                conn.execute(f"CREATE TEMP TABLE archived_cost_stats_rows ({names})")
+                insert = (
+                    f"INSERT INTO archived_cost_stats_rows ({names}) "
+                    f"VALUES ({', '.join('?' for _ in _COST_STATS_SOURCE_COLUMNS)})"
+                )
+                for relative in partitions:
+                    for chunk in self.archive.iter_rows(
+                        relative, _COST_STATS_SOURCE_COLUMNS, None, ARCHIVE_BATCH_SIZE
+                    ):
+                        conn.executemany(insert, chunk)
+                source = (
+                    f"(SELECT {names} FROM cost_predictions "
+                    f"UNION ALL SELECT {names} FROM temp.archived_cost_stats_rows)"
+                )
+            conn.execute(_cost_stats_statements(source)[1])
+            if partitions:
+                conn.execute("DROP TABLE temp.archived_cost_stats_rows")
+                logger.info("Counted %d archived cost partitions into cost_stats", len(partitions))
+        conn.execute(trigger)
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
         # Cost overrun predictions table
-        self.conn.execute(
+        conn.execute(
             """
             CREATE TABLE IF NOT EXISTS cost_predictions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,13 +1038,25 @@ class PredictionRepository:
                 risk_level TEXT,
                 alerts TEXT,
                 input_payload TEXT NOT NULL,
-                output_payload TEXT NOT NULL
+                output_payload TEXT NOT NULL,
+                -- Key output and input fields for analytics (denormalized)
+                expected_overrun_percent REAL,
+                predicted_final_cost REAL,
+                p10_overrun_percent REAL,
+                p90_overrun_percent REAL,
+                final_project_cost REAL,
+                totalunits REAL,
+                planned_duration_days REAL,
+                progress_ratio REAL,
+                final_project_type TEXT,
+                promotertype TEXT,
+                districttype TEXT
             )
         """
         )
         
         # Delay predictions table
-        self.conn.execute(
+        conn.execute(
             """
             CREATE TABLE IF NOT EXISTS delay_predictions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -67,11 +1085,219 @@ class PredictionRepository:
                 promotertype TEXT,
                 districttype TEXT,
                 avg_temp REAL,
-                total_rain REAL
+                total_rain REAL,
+                recommendation_set_id INTEGER
             )
         """
         )
-        self.conn.commit()
+
+        # Distinct delay recommendation lists, keyed by a hash of their JSON
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recommendation_sets (
+                id INTEGER PRIMARY KEY,
+                items TEXT NOT NULL
+            )
+        """
+        )
+
+        # Parquet files holding archived rows (see archive_older_than)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive_partitions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                date TEXT NOT NULL,
+                path TEXT NOT NULL UNIQUE,
+                rows INTEGER NOT NULL,
+                min_created_at TEXT NOT NULL,
+                max_created_at TEXT NOT NULL,
+                archived_at TEXT NOT NULL
+            )
+        """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_archive_partitions ON archive_partitions (table_name, date)"
+        )
+        PredictionRepository._migrate_schema(conn)
+
+        for statement in _HISTORY_INDEXES:
+            conn.execute(statement)
+
+        # The backfills only run while their summary is empty: even with the
+        # NOT EXISTS guard SQLite would still scan the log on every start
+        conn.execute(_DELAY_STATS_SCHEMA)
+        if PredictionRepository._is_empty(conn, "delay_stats"):
+            conn.execute(_DELAY_STATS_BACKFILL)
+        conn.execute(_DELAY_STATS_TRIGGER)
+
+        for source in ROLLUP_SOURCES:
+            schema, *backfill, trigger = _rollup_statements(source)
+            conn.execute(schema)
+            if PredictionRepository._is_empty(conn, ROLLUP_SOURCES[source][1]):
+                for statement in backfill:
+                    conn.execute(statement)
+            # Recreated on every start so a database keeps the current definition
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{ROLLUP_SOURCES[source][1]}")
+            conn.execute(trigger)
+
+    @staticmethod
+    def _is_empty(conn: sqlite3.Connection, table: str) -> bool:
+        return conn.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {table})").fetchone()[0] == 1
+
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection):
+        """Bring an older database up to SCHEMA_VERSION (tracked in PRAGMA user_version)."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(cost_predictions)")}
+            for column, sql_type, _, _ in COST_ANALYTICS_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE cost_predictions ADD COLUMN {column} {sql_type}")
+            assignments = ", ".join(
+                f"{column} = json_extract({source}, '{path}')"
+                for column, _, source, path in COST_ANALYTICS_COLUMNS
+            )
+            backfilled = conn.execute(f"UPDATE cost_predictions SET {assignments}").rowcount
+            # Replaced by plain column indexes
+            conn.execute("DROP INDEX IF EXISTS idx_cost_district")
+            conn.execute("DROP INDEX IF EXISTS idx_cost_type")
+            if backfilled:
+                logger.info("Backfilled analytics columns for %d cost predictions", backfilled)
+        if version < 3:
+            # aggregate_stats reads cost_stats now
+            conn.execute("DROP INDEX IF EXISTS idx_cost_analytics")
+        if version < 2:
+            # Payloads written from now on are compressed blobs and
+            # recommendations move to recommendation_sets; existing rows stay
+            # readable as they are
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(delay_predictions)")}
+            if "recommendation_set_id" not in existing:
+                conn.execute("ALTER TABLE delay_predictions ADD COLUMN recommendation_set_id INTEGER")
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _insert(self, table: str, rows: List[tuple]):
+        if self.writer is not None:
+            self.writer.submit(table, rows)
+            return
+        with self.pool.write() as conn:
+            _write_rows(conn, table, rows)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait for queued write-behind rows to be committed (no-op otherwise)."""
+        return self.writer.flush(timeout) if self.writer is not None else True
+
+    def close(self):
+        """Drain the write-behind queue and close the pool's connections."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.pool.close()
+
+    def reopen(self):
+        """Reconnect (and restart the write-behind thread) after ``close``.
+
+        Pre-fork serving closes the repository in the master and reopens it
+        in every worker, so no connection or thread is shared across a fork.
+        """
+        self.pool.reopen()
+        if self.write_behind and self.writer is None:
+            self.writer = WriteBehindWriter(self.pool, policy=self.full_policy)
+
+    def writer_stats(self) -> Dict[str, Any]:
+        if self.writer is None:
+            return {"write_behind": False}
+        return {"write_behind": True, **self.writer.stats()}
+
+    def archive_older_than(
+        self,
+        days: int = ARCHIVE_AFTER_DAYS,
+        *,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        now: datetime | None = None,
+        vacuum: bool = False,
+    ) -> Dict[str, Any]:
+        """Move rows created more than ``days`` days ago into the Parquet archive.
+
+        Each batch is selected, written to one file per day and deleted inside
+        one immediate transaction that also records the files in
+        archive_partitions, so an interrupted run loses no rows; files it left
+        unrecorded are removed by the next run. delay_stats, cost_stats and
+        the rollups keep counting archived rows. ``vacuum`` shrinks the database file
+        afterwards (it rewrites the whole file).
+        """
+        started = time.perf_counter()
+        cutoff = ((now or datetime.utcnow()) - timedelta(days=days)).isoformat()
+        moved = {}
+        for table in ("cost_predictions", "delay_predictions"):
+            with self.pool.write() as conn:
+                # Under the write lock no other run has files in flight
+                conn.execute("BEGIN IMMEDIATE")
+                known = conn.execute("SELECT path FROM archive_partitions WHERE table_name = ?", (table,))
+                self.archive.remove_orphans(table, [row["path"] for row in known])
+                columns = [
+                    (row["name"], row["type"])
+                    for row in conn.execute(f"PRAGMA table_info({table})")
+                    if row["name"] != "recommendation_set_id"
+                ]
+            expressions = _HISTORY_FIELD_SQL.get(table, {})
+            select = ", ".join(
+                f"{expressions[name]} AS {name}" if name in expressions else name for name, _ in columns
+            )
+
+            counts = {"rows": 0, "files": 0}
+            while True:
+                with self.pool.write() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    batch = conn.execute(
+                        f"SELECT {select} FROM {table} WHERE created_at < ? ORDER BY created_at, id LIMIT ?",
+                        (cutoff, batch_size),
+                    ).fetchall()
+                    if not batch:
+                        break
+                    by_date: Dict[str, List[Dict[str, Any]]] = {}
+                    for row in batch:
+                        record = dict(row)
+                        record["input_payload"] = _payload_text(record["input_payload"])
+                        record["output_payload"] = _payload_text(record["output_payload"])
+                        by_date.setdefault(record["created_at"][:10], []).append(record)
+                    archived_at = datetime.utcnow().isoformat()
+                    manifest = [
+                        (
+                            table,
+                            date,
+                            self.archive.write(table, date, records, columns),
+                            len(records),
+                            records[0]["created_at"],
+                            records[-1]["created_at"],
+                            archived_at,
+                        )
+                        for date, records in by_date.items()
+                    ]
+                    conn.executemany(
+                        """
+                        INSERT INTO archive_partitions
+                            (table_name, date, path, rows, min_created_at, max_created_at, archived_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        manifest,
+                    )
+                    conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row["id"],) for row in batch])
+                counts["rows"] += len(batch)
+                counts["files"] += len(manifest)
+            moved[table] = counts
+            if counts["rows"]:
+                logger.info("Archived %d %s rows into %d files", counts["rows"], table, counts["files"])
+
+        if vacuum:
+            with self.pool.write() as conn:
+                conn.execute("VACUUM")
+        return {
+            "cutoff": cutoff,
+            "tables": moved,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
 
     def log_prediction(
         self,
@@ -83,48 +1309,44 @@ class PredictionRepository:
         scenario_name: str | None = None,
         alerts: List[str] | None = None,
     ):
-        self.conn.execute(
-            """
-            INSERT INTO cost_predictions (
-                created_at,
-                model_version,
-                scenario_name,
-                risk_level,
-                alerts,
-                input_payload,
-                output_payload
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                datetime.utcnow().isoformat(),
-                model_version,
-                scenario_name,
-                risk_level,
-                json.dumps(alerts or []),
-                json.dumps(input_payload),
-                json.dumps(output_payload),
-            ),
-        )
-        self.conn.commit()
+        record = {
+            "model_version": model_version,
+            "input_payload": input_payload,
+            "output_payload": output_payload,
+            "risk_level": risk_level,
+            "scenario_name": scenario_name,
+            "alerts": alerts,
+        }
+        self._insert("cost", [_cost_row(record, datetime.utcnow().isoformat())])
+
+    def log_predictions(self, records: List[Dict[str, Any]]):
+        """Bulk ``log_prediction``: all records are written in one transaction."""
+        if not records:
+            return
+        created_at = datetime.utcnow().isoformat()
+        self._insert("cost", [_cost_row(record, created_at) for record in records])
 
     def fetch_recent(self, limit: int = 50) -> List[Dict[str, Any]]:
-        cursor = self.conn.execute(
-            "SELECT * FROM cost_predictions ORDER BY created_at DESC LIMIT ?", (limit,)
+        return self.query_predictions(limit=limit)["items"]
+
+    def query_predictions(
+        self,
+        *,
+        limit: int = 50,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+        **filters: Any,
+    ) -> Dict[str, Any]:
+        """A page of cost predictions, newest first (see ``_query_history``)."""
+        return self._query_history(
+            "cost_predictions",
+            COST_HISTORY_FIELDS,
+            COST_HISTORY_FILTERS,
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+            filters=filters,
         )
-        rows = cursor.fetchall()
-        return [
-            {
-                "id": row["id"],
-                "created_at": row["created_at"],
-                "model_version": row["model_version"],
-                "scenario_name": row["scenario_name"],
-                "risk_level": row["risk_level"],
-                "alerts": json.loads(row["alerts"] or "[]"),
-                "input_payload": json.loads(row["input_payload"]),
-                "output_payload": json.loads(row["output_payload"]),
-            }
-            for row in rows
-        ]
 
     def log_delay_prediction(
         self,
@@ -136,142 +1358,219 @@ class PredictionRepository:
         model_version: str | None = None,
     ):
         """Log a delay prediction to the database."""
-        prediction = output_payload.get("prediction", {})
-        
-        # Extract key fields for analytics (denormalized)
-        input_data = input_payload
-        
-        self.conn.execute(
-            """
-            INSERT INTO delay_predictions (
-                created_at,
-                model_version,
-                is_delayed,
-                delay_probability,
-                predicted_delay_days,
-                risk_level,
-                confidence,
-                extreme_override_applied,
-                ensemble_used,
-                recommendations,
-                input_payload,
-                output_payload,
-                final_project_cost,
-                totalunits,
-                planned_duration_days,
-                actual_duration_days,
-                progress_ratio,
-                budget_overrun_percent,
-                bookedunits,
-                land_utilization,
-                final_project_type,
-                promotertype,
-                districttype,
-                avg_temp,
-                total_rain
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                datetime.utcnow().isoformat(),
-                model_version,
-                1 if prediction.get("is_delayed", False) else 0,
-                float(prediction.get("delay_probability", 0.0)),
-                int(prediction.get("predicted_delay_days", 0)),
-                prediction.get("risk_level", "Unknown"),
-                prediction.get("confidence", "Unknown"),
-                1 if prediction.get("extreme_override_applied", False) else 0,
-                1 if ensemble_used else 0,
-                json.dumps(recommendations or []),
-                json.dumps(input_payload),
-                json.dumps(output_payload),
-                float(input_data.get("final_project_cost", 0) or 0),
-                int(input_data.get("totalunits", 0) or 0),
-                int(input_data.get("planned_duration_days", 0) or 0),
-                int(input_data.get("actual_duration_days", 0) or 0),
-                float(input_data.get("progress_ratio", 0) or 0) if input_data.get("progress_ratio") else None,
-                float(input_data.get("budget_overrun_percent", 0) or 0) if input_data.get("budget_overrun_percent") else None,
-                int(input_data.get("bookedunits", 0) or 0) if input_data.get("bookedunits") else None,
-                float(input_data.get("land_utilization", 0) or 0) if input_data.get("land_utilization") else None,
-                input_data.get("final_project_type"),
-                input_data.get("promotertype"),
-                input_data.get("districttype"),
-                float(input_data.get("avg_temp", 0) or 0) if input_data.get("avg_temp") else None,
-                float(input_data.get("total_rain", 0) or 0) if input_data.get("total_rain") else None,
-            ),
+        row = _delay_row(
+            input_payload,
+            output_payload,
+            recommendations,
+            ensemble_used,
+            model_version,
+            datetime.utcnow().isoformat(),
         )
-        self.conn.commit()
+        self._insert("delay", [row])
 
     def fetch_recent_delays(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Retrieve recent delay predictions."""
-        cursor = self.conn.execute(
-            "SELECT * FROM delay_predictions ORDER BY created_at DESC LIMIT ?", (limit,)
+        return self.query_delay_predictions(limit=limit)["items"]
+
+    def query_delay_predictions(
+        self,
+        *,
+        limit: int = 50,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+        **filters: Any,
+    ) -> Dict[str, Any]:
+        """A page of delay predictions, newest first (see ``_query_history``)."""
+        return self._query_history(
+            "delay_predictions",
+            DELAY_HISTORY_FIELDS,
+            DELAY_HISTORY_FILTERS,
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+            filters=filters,
         )
-        rows = cursor.fetchall()
-        return [
+
+    def _query_history(
+        self,
+        table: str,
+        field_decoders: Dict[str, Callable | None],
+        filter_specs: Dict[str, Tuple[str, Callable]],
+        *,
+        limit: int,
+        cursor: str | None,
+        fields: Sequence[str] | None,
+        filters: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Keyset-paginated history query over hot rows, then archived ones.
+
+        Rows are ordered by (created_at, id) descending and ``cursor`` is the
+        opaque ``next_cursor`` of the previous page, so every page is an index
+        range scan however deep it is. Archived rows are all older than the
+        remaining SQLite rows, so the archive is only read for pages that run
+        past the end of the hot table. ``fields`` limits the selected columns
+        (JSON payloads are not decoded unless requested); ``filters`` keys come
+        from ``filter_specs`` and None/"" values are ignored. Raises ValueError
+        for unknown fields or filters and unparseable values.
+        """
+        names = list(fields) if fields else list(field_decoders)
+        unknown = [name for name in names if name not in field_decoders]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}.")
+        limit = max(1, min(int(limit), HISTORY_MAX_LIMIT))
+        predicates = _parse_filters(filter_specs, filters)
+        position = _decode_cursor(cursor) if cursor else None
+
+        clauses = [predicate for predicate, _ in predicates]
+        params = [value for _, value in predicates]
+        if position:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(position)
+
+        columns = list(dict.fromkeys(["id", "created_at", *names]))
+        expressions = _HISTORY_FIELD_SQL.get(table, {})
+        selected = [f"{expressions[name]} AS {name}" if name in expressions else name for name in columns]
+        sql = f"SELECT {', '.join(selected)} FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self.pool.read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+            if len(rows) <= limit:
+                partitions = self._archive_partitions(conn, table, predicates, position)
+                if partitions:
+                    expression = arrow_filter(predicates)
+                    if position:
+                        after = keyset_filter(*position)
+                        expression = after if expression is None else expression & after
+                    rows += self.archive.read_newest(partitions, columns, expression, limit + 1 - len(rows))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [
             {
-                "id": row["id"],
-                "created_at": row["created_at"],
-                "model_version": row["model_version"],
-                "is_delayed": bool(row["is_delayed"]),
-                "delay_probability": row["delay_probability"],
-                "predicted_delay_days": row["predicted_delay_days"],
-                "risk_level": row["risk_level"],
-                "confidence": row["confidence"],
-                "extreme_override_applied": bool(row["extreme_override_applied"]),
-                "ensemble_used": bool(row["ensemble_used"]),
-                "recommendations": json.loads(row["recommendations"] or "[]"),
-                "input_payload": json.loads(row["input_payload"]),
-                "output_payload": json.loads(row["output_payload"]),
+                name: field_decoders[name](row[name]) if field_decoders[name] else row[name]
+                for name in names
             }
             for row in rows
         ]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def export_history(
+        self,
+        source: str,
+        *,
+        columns: Sequence[str] | None = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+        **filters: Any,
+    ) -> Tuple[List[Tuple[str, str]], Iterator[List[tuple]]]:
+        """All matching rows of one source, oldest first, as chunks of tuples.
+
+        Returns the (column, SQLite type) pairs and a lazy iterator, so memory
+        stays at one chunk however many rows match. Archived rows come first,
+        then the SQLite rows through ``fetchmany``; both are read from one
+        snapshot, so a concurrent archive run cannot skip or repeat rows.
+        ``filters`` are the history filters (e.g. since/until). Raises
+        ValueError for unknown sources, columns or filters before any row
+        is read.
+        """
+        if source not in EXPORT_SOURCES:
+            raise ValueError(f"Unknown source '{source}'; expected one of {', '.join(EXPORT_SOURCES)}.")
+        table, filter_specs = EXPORT_SOURCES[source]
+        predicates = _parse_filters(filter_specs, filters)
+        with self.pool.read() as conn:
+            available = [
+                (row["name"], row["type"])
+                for row in conn.execute(f"PRAGMA table_info({table})")
+                if row["name"] not in _EXPORT_EXCLUDED
+            ]
+        if columns:
+            types = dict(available)
+            unknown = [name for name in columns if name not in types]
+            if unknown:
+                raise ValueError(f"Unknown column(s): {', '.join(unknown)}.")
+            available = [(name, types[name]) for name in dict.fromkeys(columns)]
+        return available, self._export_chunks(table, [name for name, _ in available], predicates, chunk_size)
+
+    def _export_chunks(
+        self, table: str, names: List[str], predicates: List[Tuple[str, Any]], chunk_size: int
+    ) -> Iterator[List[tuple]]:
+        sql = f"SELECT {', '.join(names)} FROM {table}"
+        if predicates:
+            sql += " WHERE " + " AND ".join(predicate for predicate, _ in predicates)
+        sql += " ORDER BY created_at, id"
+
+        with self.pool.read() as conn:
+            # The manifest read starts the snapshot the SQLite rows come from
+            conn.execute("BEGIN")
+            try:
+                partitions = self._archive_partitions(conn, table, predicates, None)
+                expression = arrow_filter(predicates)
+                for _, path in reversed(partitions):
+                    yield from self.archive.iter_rows(path, names, expression, chunk_size)
+                cursor = conn.execute(sql, [value for _, value in predicates])
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    yield [tuple(row) for row in chunk]
+            finally:
+                # Also when the consumer stops early: the pooled reader must
+                # not keep the snapshot open
+                conn.rollback()
+
+    @staticmethod
+    def _archive_partitions(
+        conn: sqlite3.Connection,
+        table: str,
+        predicates: List[Tuple[str, Any]],
+        position: Tuple[str, int] | None,
+    ) -> List[Tuple[str, str]]:
+        """Archived (date, path) pairs, newest first, pruned by the created_at bounds."""
+        sql = "SELECT date, path FROM archive_partitions WHERE table_name = ?"
+        params: List[Any] = [table]
+        bounds = [
+            (predicate.split()[1], value)
+            for predicate, value in predicates
+            if predicate.startswith("created_at ")
+        ]
+        if position:
+            bounds.append(("<=", position[0]))
+        for op, value in bounds:
+            sql += " AND date >= ?" if op.startswith(">") else " AND date <= ?"
+            params.append(value[:10])
+        sql += " ORDER BY date DESC, id DESC"
+        return [(row["date"], row["path"]) for row in conn.execute(sql, params)]
 
     def aggregate_delay_stats(self) -> Dict[str, Any]:
-        """Calculate aggregate statistics for delay predictions."""
-        cursor = self.conn.execute(
-            "SELECT * FROM delay_predictions ORDER BY created_at DESC"
-        )
-        total = 0
-        delayed_count = 0
+        """Aggregate statistics for delay predictions, read from the delay_stats summary."""
+        with self.pool.read() as conn:
+            rows = conn.execute("SELECT * FROM delay_stats").fetchall()
+
+        totals = {"count": 0, "delayed_count": 0, "delay_days": 0, "probability_sum": 0.0, "latest_at": None}
         risk_counts = {"High": 0, "Medium": 0, "Low": 0}
-        avg_probability = 0.0
-        avg_delay_days = 0.0
-        total_delay_days = 0
         confidence_counts = {"High": 0, "Medium": 0, "Low": 0}
         project_type_counts = {}
         district_counts = {}
-        latest_ts = None
-
-        for row in cursor:
-            total += 1
-            if row["is_delayed"]:
-                delayed_count += 1
-                total_delay_days += row["predicted_delay_days"]
-            
-            risk = row["risk_level"] or "Unknown"
-            if risk in risk_counts:
-                risk_counts[risk] += 1
-            
-            avg_probability += row["delay_probability"]
-            
-            confidence = row["confidence"] or "Unknown"
-            if confidence in confidence_counts:
-                confidence_counts[confidence] += 1
-            
-            project_type = row["final_project_type"]
-            if project_type:
-                project_type_counts[project_type] = project_type_counts.get(project_type, 0) + 1
-            
-            district = row["districttype"]
-            if district:
-                district_counts[district] = district_counts.get(district, 0) + 1
-            
-            latest_ts = latest_ts or row["created_at"]
-
-        if total > 0:
-            avg_probability /= total
-            if delayed_count > 0:
-                avg_delay_days = total_delay_days / delayed_count
+        for row in rows:
+            dimension, key = row["dimension"], row["key"]
+            if dimension == "total":
+                totals = dict(row)
+            elif dimension == "risk" and key in risk_counts:
+                risk_counts[key] = row["count"]
+            elif dimension == "confidence" and key in confidence_counts:
+                confidence_counts[key] = row["count"]
+            elif dimension == "project_type":
+                project_type_counts[key] = row["count"]
+            elif dimension == "district":
+                district_counts[key] = row["count"]
+
+        total = totals["count"]
+        delayed_count = totals["delayed_count"]
+        avg_probability = totals["probability_sum"] / total if total > 0 else 0.0
+        avg_delay_days = totals["delay_days"] / delayed_count if delayed_count > 0 else 0.0
 
         return {
             "total_predictions": total,
@@ -284,44 +1583,199 @@ class PredictionRepository:
             "confidence_counts": confidence_counts,
             "project_type_distribution": project_type_counts,
             "district_distribution": district_counts,
-            "latest_prediction_at": latest_ts,
+            "latest_prediction_at": totals["latest_at"],
         }
 
     def aggregate_stats(self) -> Dict[str, Any]:
-        """Calculate aggregate statistics for cost overrun predictions."""
-        cursor = self.conn.execute(
-            "SELECT created_at, risk_level, output_payload FROM cost_predictions ORDER BY created_at DESC"
-        )
-        total = 0
+        """Aggregate statistics for cost overrun predictions, read from the cost_stats summary."""
+        with self.pool.read() as conn:
+            rows = conn.execute(
+                "SELECT * FROM cost_stats WHERE dimension IN ('total', 'risk_level')"
+            ).fetchall()
+
+        totals = {"count": 0, "overrun_percent_sum": 0.0, "final_cost_sum": 0.0, "latest_at": None}
         risk_counts = {"High": 0, "Medium": 0, "Low": 0}
-        avg_percent = 0.0
-        avg_cost = 0.0
-        latest_ts = None
-
-        for row in cursor:
-            total += 1
-            risk = row["risk_level"] or "Unknown"
-            if risk in risk_counts:
-                risk_counts[risk] += 1
-            payload = json.loads(row["output_payload"])
-            percent = payload.get("expected_overrun_percent")
-            cost = payload.get("predicted_final_cost")
-            if isinstance(percent, (int, float)):
-                avg_percent += percent
-            if isinstance(cost, (int, float)):
-                avg_cost += cost
-            latest_ts = latest_ts or row["created_at"]
-
-        if total > 0:
-            avg_percent /= total
-            avg_cost /= total
+        for row in rows:
+            if row["dimension"] == "total":
+                totals = dict(row)
+            else:
+                key = json.loads(row["key"])
+                if key in risk_counts:
+                    risk_counts[key] = row["count"]
+
+        total = totals["count"]
+        avg_percent = totals["overrun_percent_sum"] / total if total > 0 else 0.0
+        avg_cost = totals["final_cost_sum"] / total if total > 0 else 0.0
 
         return {
             "total_predictions": total,
             "risk_counts": risk_counts,
             "avg_overrun_percent": round(avg_percent, 2),
             "avg_final_cost": round(avg_cost, 2),
-            "latest_prediction_at": latest_ts,
+            "latest_prediction_at": totals["latest_at"],
+        }
+
+    def aggregate_cost_by(self, dimension: str) -> List[Dict[str, Any]]:
+        """Cost prediction aggregates per value of one of COST_GROUP_DIMENSIONS (from cost_stats)."""
+        if dimension not in COST_GROUP_DIMENSIONS:
+            raise ValueError(
+                f"Cannot group by '{dimension}'; expected one of {', '.join(COST_GROUP_DIMENSIONS)}."
+            )
+        with self.pool.read() as conn:
+            rows = conn.execute(
+                "SELECT * FROM cost_stats WHERE dimension = ? ORDER BY count DESC", (dimension,)
+            ).fetchall()
+
+        def average(row, name):
+            count = row[f"{name}_count"]
+            return round(row[f"{name}_sum"] / count, 2) if count else None
+
+        return [
+            {
+                dimension: json.loads(row["key"]),
+                "count": row["count"],
+                "avg_overrun_percent": average(row, "overrun_percent"),
+                "avg_p10": average(row, "p10"),
+                "avg_p90": average(row, "p90"),
+                "high_risk_count": row["high_count"],
+                "total_project_cost": round(row["project_cost_sum"], 2),
+                "total_overrun_amount": round(row["overrun_amount_sum"], 2),
+            }
+            for row in rows
+        ]
+
+    def rollup_trend(
+        self,
+        source: str = "delay",
+        *,
+        granularity: str = "day",
+        days: int = 90,
+        district: str | None = None,
+        now: datetime | None = None,
+    ) -> Dict[str, Any]:
+        """Per-bucket series for the last ``days`` days, read from the rollup tables.
+
+        Empty buckets are returned as zero rows so charts get a continuous axis.
+        Without ``district`` the series is the all-district total and
+        ``districts`` holds per-district totals over the window; with it, only
+        that district's rows are read. Raises ValueError for unknown sources or
+        granularities and out-of-range windows.
+        """
+        if source not in ROLLUP_SOURCES:
+            raise ValueError(f"Unknown source '{source}'; expected one of {', '.join(ROLLUP_SOURCES)}.")
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(
+                f"Unknown granularity '{granularity}'; expected one of {', '.join(ROLLUP_GRANULARITIES)}."
+            )
+        max_days = DASHBOARD_TREND_MAX_DAYS[granularity]
+        if not 1 <= int(days) <= max_days:
+            raise ValueError(f"days must be between 1 and {max_days} for {granularity} buckets.")
+
+        keys = _bucket_keys(granularity, int(days), now or datetime.utcnow())
+        rollup = ROLLUP_SOURCES[source][1]
+        sql = f"SELECT * FROM {rollup} WHERE granularity = ? AND bucket >= ?"
+        params = [granularity, keys[0]]
+        if district:
+            sql += " AND district = ?"
+            params.append(district)
+        with self.pool.read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        series_key = district or ""
+        by_bucket = {}
+        district_totals: Dict[str, Dict[str, float]] = {}
+        for row in rows:
+            if row["district"] == series_key:
+                by_bucket[row["bucket"]] = row
+            if row["district"]:
+                totals = district_totals.setdefault(row["district"], {})
+                for name in self._rollup_measures(source):
+                    totals[name] = totals.get(name, 0) + row[name]
+
+        series = [{"bucket": key, **self._rollup_point(source, by_bucket.get(key, {}))} for key in keys]
+        districts = [
+            {"district": name, **self._rollup_point(source, totals)}
+            for name, totals in sorted(district_totals.items(), key=lambda item: -item[1]["count"])
+        ]
+        return {
+            "source": source,
+            "granularity": granularity,
+            "days": int(days),
+            "district": district,
+            "series": series,
+            "districts": districts,
+            "rows_read": len(rows),
         }
 
+    def dashboard_stats(self, now: datetime | None = None) -> Dict[str, Any]:
+        """Headline numbers for the dashboard from delay_stats and the rollups."""
+        delay = self.aggregate_delay_stats()
+        since = (now or datetime.utcnow()) - timedelta(hours=23)
+        with self.pool.read() as conn:
+            cost = self._rollup_totals(conn, "cost", "day")
+            recent_delay = self._rollup_totals(conn, "delay", "hour", since.isoformat()[:13])
+            recent_cost = self._rollup_totals(conn, "cost", "hour", since.isoformat()[:13])
 
+        return {
+            "total_projects": delay["total_predictions"],
+            "delayed_projects": delay["delayed_count"],
+            "on_time_projects": delay["on_time_count"],
+            "avg_delay_days": delay["avg_delay_days"],
+            "avg_delay_probability": delay["avg_delay_probability"],
+            "high_risk_count": delay["risk_counts"]["High"],
+            "medium_risk_count": delay["risk_counts"]["Medium"],
+            "low_risk_count": delay["risk_counts"]["Low"],
+            "cost_predictions": cost["count"],
+            "cost_high_risk_count": cost["high_count"],
+            "avg_overrun_percent": self._rollup_point("cost", cost)["avg_overrun_percent"],
+            "total_cost_overrun": round(cost["overrun_amount_sum"], 2),
+            "last_24_hours": {
+                "delay_predictions": recent_delay["count"],
+                "delayed_projects": recent_delay["delayed_count"],
+                "high_risk_count": recent_delay["high_count"],
+                "cost_predictions": recent_cost["count"],
+                "cost_high_risk_count": recent_cost["high_count"],
+            },
+            "latest_prediction_at": delay["latest_prediction_at"],
+        }
+
+    @staticmethod
+    def _rollup_measures(source: str) -> List[str]:
+        return [name for name, _, _ in _ROLLUP_COMMON_MEASURES + ROLLUP_SOURCES[source][2]]
+
+    def _rollup_totals(
+        self, conn: sqlite3.Connection, source: str, granularity: str, since: str = ""
+    ) -> Dict[str, float]:
+        """Sums of every measure over all-district buckets from ``since`` on."""
+        names = self._rollup_measures(source)
+        row = conn.execute(
+            f"SELECT {', '.join(f'COALESCE(SUM({name}), 0) AS {name}' for name in names)} "
+            f"FROM {ROLLUP_SOURCES[source][1]} WHERE granularity = ? AND bucket >= ? AND district = ''",
+            (granularity, since),
+        ).fetchone()
+        return {name: row[name] for name in names}
+
+    @staticmethod
+    def _rollup_point(source: str, totals) -> Dict[str, Any]:
+        """Counts and means of one rollup row (or summed rows); {} means empty."""
+
+        def total(name: str) -> float:
+            return totals[name] if totals else 0
+
+        count = int(total("count"))
+        point = {
+            "count": count,
+            "high": int(total("high_count")),
+            "medium": int(total("medium_count")),
+            "low": int(total("low_count")),
+        }
+        if source == "delay":
+            delayed = int(total("delayed_count"))
+            point["delayed_count"] = delayed
+            point["avg_probability"] = round(total("probability_sum") / count, 4) if count else None
+            point["avg_delay_days"] = round(total("delay_days") / delayed, 1) if delayed else None
+        else:
+            scored = total("overrun_count")
+            point["avg_overrun_percent"] = round(total("overrun_percent_sum") / scored, 2) if scored else None
+            point["overrun_amount"] = round(total("overrun_amount_sum"), 2)
+        return point
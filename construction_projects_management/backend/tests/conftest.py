@@ -0,0 +1,129 @@
+"""Shared fixtures; tests run from any directory against the backend package."""
+
+import os
+import shutil
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Committed delay artifacts; classifier.pkl and ensemble_models.pkl are not in
+# the repository, so small stand-ins are trained on synthetic projects
+DELAY_ARTIFACTS = ("classifier_preprocessor.pkl", "regressor_preprocessor.pkl", "regressor.pkl", "ensemble_weights.pkl")
+
+PROJECT_TYPES = ["Commercial", "Mixed Development", "Plotted Development", "Residential/Group Housing"]
+PROMOTER_TYPES = ["AOP", "COMPANY", "TRUST", "Other"]
+DISTRICTS = ["Ahmedabad", "Surat", "Rajkot", "Others", "Vadodara"]
+
+
+def delay_projects(n, seed=0):
+    """Plausible delay prediction payloads."""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "final_project_cost": float(rng.uniform(1e6, 5e8)),
+            "totalincurredcost": float(rng.uniform(0, 3e8)),
+            "totallandcost": float(rng.uniform(0, 1e8)),
+            "budget_overrun_percent": float(rng.uniform(-5, 40)),
+            "progress_ratio": float(rng.uniform(0.01, 1.0)),
+            "bookedunits": int(rng.integers(0, 200)),
+            "totalunits": int(rng.integers(1, 300)),
+            "land_utilization": float(rng.uniform(0, 1.5)),
+            "planned_duration_days": int(rng.integers(100, 2000)),
+            "actual_duration_days": int(rng.integers(0, 2500)),
+            "avg_temp": float(rng.uniform(20, 35)),
+            "total_rain": float(rng.uniform(0, 4000)),
+            "totalsquarefootbuild": float(rng.uniform(1e3, 5e5)),
+            "final_project_type": str(rng.choice(PROJECT_TYPES)),
+            "promotertype": str(rng.choice(PROMOTER_TYPES)),
+            "districttype": str(rng.choice(DISTRICTS)),
+        }
+        for _ in range(n)
+    ]
+
+
+def log_delay_predictions(repo, rng, count):
+    """Log ``count`` random delay predictions through ``repo``."""
+    for _ in range(count):
+        probability = rng.random()
+        repo.log_delay_prediction(
+            input_payload={
+                "districttype": rng.choice(["A", "B"]),
+                "final_project_type": rng.choice(["X", "Y"]),
+                "progress_ratio": rng.random(),
+            },
+            output_payload={
+                "prediction": {
+                    "is_delayed": probability >= 0.5,
+                    "delay_probability": probability,
+                    "predicted_delay_days": rng.randint(0, 200),
+                    "risk_level": rng.choice(["High", "Medium", "Low"]),
+                    "confidence": rng.choice(["High", "Low"]),
+                }
+            },
+            recommendations=rng.choice([[], ["Add crews"], ["Add crews", "Order early"]]),
+            ensemble_used=rng.random() < 0.5,
+        )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    from storage import PredictionRepository
+
+    repository = PredictionRepository(tmp_path / "predictions.db", write_behind=False)
+    yield repository
+    repository.close()
+
+
+@pytest.fixture(scope="session")
+def delay_model_dir(tmp_path_factory):
+    """A models/ directory with the committed delay artifacts plus trained stand-ins."""
+    from catboost import CatBoostRegressor
+    from lightgbm import LGBMRegressor
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from xgboost import XGBClassifier, XGBRegressor
+
+    from predict import create_features
+
+    model_dir = tmp_path_factory.mktemp("models")
+    delay_dir = model_dir / "delay"
+    delay_dir.mkdir()
+    for name in DELAY_ARTIFACTS:
+        shutil.copy(os.path.join(BACKEND_DIR, "models", "delay", name), delay_dir / name)
+
+    rng = np.random.default_rng(0)
+    df = create_features(pd.DataFrame(delay_projects(2000)))
+
+    def encoded(name):
+        preprocessor = joblib.load(delay_dir / f"{name}_preprocessor.pkl")
+        columns = [column for _, _, names in preprocessor.transformers_[:2] for column in names]
+        return preprocessor.transform(df[columns])
+
+    delayed = (df["risk_score"] + rng.normal(0, 10, len(df)) > 45).astype(int)
+    classifier = XGBClassifier(n_estimators=30, max_depth=4).fit(encoded("classifier"), delayed)
+    joblib.dump(classifier, delay_dir / "classifier.pkl")
+
+    days = np.log1p(rng.uniform(0, 300, len(df)))
+    ensemble = {
+        "xgb": XGBRegressor(n_estimators=20, max_depth=4),
+        "lgbm": LGBMRegressor(n_estimators=20, verbose=-1),
+        "cat": CatBoostRegressor(iterations=20, depth=4, verbose=0, allow_writing_files=False),
+        "gbr": GradientBoostingRegressor(n_estimators=20),
+        "rf": RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0),
+    }
+    X = encoded("regressor")
+    joblib.dump({name: model.fit(X, days) for name, model in ensemble.items()}, delay_dir / "ensemble_models.pkl")
+    return model_dir
+
+
+@pytest.fixture(scope="session")
+def delay_predictor(delay_model_dir):
+    from predict import DelayPredictor
+
+    return DelayPredictor(str(delay_model_dir), lazy_ensemble=False)
@@ -0,0 +1,159 @@
+"""MicroBatcher: coalescing, per-caller results, errors, deadlines and stats."""
+
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from services.batching import MicroBatcher
+
+
+class Scorer:
+    """Records each score_batch call; batches for ``held`` keys wait for ``release``."""
+
+    def __init__(self, held=("hold",), error=None):
+        self.calls = []
+        self.held = held
+        self.error = error
+        self.release = threading.Event()
+        self.started = defaultdict(threading.Event)
+
+    def __call__(self, items, key, timeout):
+        self.calls.append((list(items), key, timeout))
+        self.started[key].set()
+        if key in self.held:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [item * 10 if item >= 0 else ValueError(f"bad item {item}") for item in items]
+
+
+def _submit_all(batcher, items, key="k", timeouts=None):
+    """Submit ``items`` from one thread each; results (or exceptions) in item order."""
+    outcomes = [None] * len(items)
+    timeouts = timeouts or [None] * len(items)
+
+    def call(i):
+        try:
+            outcomes[i] = batcher.submit(items[i], key, timeouts[i])
+        except Exception as exc:
+            outcomes[i] = exc
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+@pytest.fixture
+def hold():
+    """A caller in flight on another key, so no leader of "k" scores alone without a window."""
+    batchers = []
+
+    def start(batcher):
+        threads, _ = _submit_all(batcher, [0], key="hold")
+        assert batcher.score_batch.started["hold"].wait(1)
+        batchers.append((batcher, threads))
+
+    yield start
+    for batcher, threads in batchers:
+        batcher.score_batch.release.set()
+        _join(threads)
+
+
+def test_concurrent_calls_coalesce_up_to_the_max_batch_size(hold):
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_ms=1000, max_batch_size=4)
+    hold(batcher)
+
+    threads, outcomes = _submit_all(batcher, list(range(1, 13)))
+    _join(threads)
+    batches = [items for items, key, _ in scorer.calls if key == "k"]
+    assert sorted(len(items) for items in batches) == [4, 4, 4]
+    assert sorted(item for items in batches for item in items) == list(range(1, 13))
+    # Every caller gets the result for its own row
+    assert outcomes == [item * 10 for item in range(1, 13)]
+
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"], stats["full_batches"]) == (3, 12, 3)
+    assert stats["largest_batch"] == 4 and stats["batch_size_histogram"] == {"4-7": 3}
+
+
+def test_a_lone_caller_scores_without_waiting_for_the_window():
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_ms=5000, max_batch_size=32)
+    started = time.monotonic()
+    assert batcher.submit(3) == 30
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.parametrize("window_ms, max_batch_size", [(0, 32), (1000, 1)])
+def test_coalescing_can_be_disabled(window_ms, max_batch_size):
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_ms=window_ms, max_batch_size=max_batch_size)
+    threads, outcomes = _submit_all(batcher, [1, 2, 3])
+    _join(threads)
+    assert not batcher.enabled
+    assert outcomes == [10, 20, 30]
+    assert sorted(len(items) for items, _, _ in scorer.calls) == [1, 1, 1]
+
+
+def test_a_batch_error_reaches_every_waiter(hold):
+    scorer = Scorer(error=RuntimeError("model exploded"))
+    batcher = MicroBatcher(scorer, window_ms=1000, max_batch_size=4)
+    hold(batcher)
+    threads, outcomes = _submit_all(batcher, [1, 2, 3, 4])
+    _join(threads)
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert [len(items) for items, key, _ in scorer.calls if key == "k"] == [4]
+    assert batcher.stats()["failed_batches"] == 1
+
+
+def test_an_exception_in_one_slot_reaches_that_caller_only(hold):
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_ms=1000, max_batch_size=3)
+    hold(batcher)
+    threads, outcomes = _submit_all(batcher, [1, -1, 2])
+    _join(threads)
+    assert outcomes[0] == 10 and outcomes[2] == 20
+    assert isinstance(outcomes[1], ValueError)
+    assert batcher.stats()["failed_batches"] == 0
+
+
+def test_one_callers_timeout_does_not_cancel_the_others(hold):
+    scorer = Scorer(held=("hold", "k"))
+    batcher = MicroBatcher(scorer, window_ms=1000, max_batch_size=2)
+    hold(batcher)
+    # The leader scores the batch on its own thread; the follower gives up
+    leader, leader_outcome = _submit_all(batcher, [2])
+    while batcher.stats()["in_flight"] < 2:
+        time.sleep(0.001)
+    follower, follower_outcome = _submit_all(batcher, [1], timeouts=[0.1])
+    assert scorer.started["k"].wait(2)
+    _join(follower)
+    assert isinstance(follower_outcome[0], TimeoutError)
+    assert leader[0].is_alive()
+
+    scorer.release.set()
+    _join(leader)
+    assert leader_outcome == [20]
+    # The batch runs for its most patient caller: no limit here
+    assert [timeout for _, key, timeout in scorer.calls if key == "k"] == [None]
+
+
+def test_the_batch_timeout_is_the_latest_caller_deadline(hold):
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_ms=1000, max_batch_size=2)
+    hold(batcher)
+    threads, outcomes = _submit_all(batcher, [1, 2], timeouts=[0.5, 3])
+    _join(threads)
+    assert outcomes == [10, 20]
+    [timeout] = [timeout for _, key, timeout in scorer.calls if key == "k"]
+    assert 2 < timeout <= 3
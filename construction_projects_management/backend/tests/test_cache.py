@@ -0,0 +1,157 @@
+"""PredictionCache keys, eviction, coalescing and invalidation."""
+
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import delay_projects
+from services.cache import PredictionCache, canonical_key
+
+
+def test_canonical_key_normalizes_payloads():
+    assert canonical_key({"a": 1, "b": 2.0}) == canonical_key({"b": 2, "a": 1.0})
+    assert canonical_key({"a": [1, 2]}) == canonical_key({"a": (1.0, 2.0)})
+    assert canonical_key({"a": None}) != canonical_key({})
+    assert canonical_key({"a": 1}) != canonical_key({"a": "1"})
+    assert canonical_key({"a": float("nan")}) != canonical_key({"a": float("inf")})
+    assert canonical_key({"a": 1}, use_ensemble=True) != canonical_key({"a": 1}, use_ensemble=False)
+
+
+def test_lru_eviction_and_ttl_expiry():
+    cache = PredictionCache(maxsize=2, ttl=0.05)
+    for key in ("a", "b", "a", "c"):  # "b" is least recently used when "c" arrives
+        cache.get_or_compute(key, lambda: key)
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["evictions"] == 2
+
+    time.sleep(0.1)
+    assert cache.get_or_compute("b", lambda: "fresh") == "fresh"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_hits_are_copies():
+    cache = PredictionCache()
+    cache.get_or_compute("k", lambda: {"factors": [1]})["factors"].append(2)
+    assert cache.get_or_compute("k", lambda: None) == {"factors": [1]}
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = PredictionCache()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"value": 1}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"value": 1}] * 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = PredictionCache()
+    release = threading.Event()
+
+    def failing():
+        release.wait(1)
+        raise ValueError("bad payload")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute("k", failing)
+        except ValueError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+
+def test_fingerprint_change_clears_the_cache():
+    version = ["v1"]
+    cache = PredictionCache(fingerprint=lambda: version[0], check_interval=0)
+    cache.get_or_compute("k", lambda: "old")
+    version[0] = "v2"
+    assert cache.get_or_compute("k", lambda: "new") == "new"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_results_computed_across_an_invalidation_are_not_stored():
+    version = ["v1"]
+    cache = PredictionCache(fingerprint=lambda: version[0], check_interval=0)
+    computing, swapped = threading.Event(), threading.Event()
+
+    def old_model():
+        computing.set()
+        swapped.wait(1)
+        return "old"
+
+    thread = threading.Thread(target=cache.get_or_compute, args=("k", old_model))
+    thread.start()
+    computing.wait(1)
+    version[0] = "v2"
+    # The first call after the swap clears the cache and does not join the old computation
+    assert cache.get_or_compute("k", lambda: "new") == "new"
+    swapped.set()
+    thread.join()
+    assert cache.get_or_compute("k", lambda: "recomputed") == "new"
+
+
+@pytest.fixture
+def fresh_cache(delay_predictor, monkeypatch):
+    monkeypatch.setattr(delay_predictor.cache, "_check_interval", 0)
+    delay_predictor.cache.clear()
+    return delay_predictor
+
+
+def test_predictor_cache_keys_on_payload_and_flags(fresh_cache):
+    predictor = fresh_cache
+    project = delay_projects(1, seed=5)[0]
+    first = predictor.predict_cached(project)
+    reordered = dict(reversed(list(project.items())))
+    assert predictor.predict_cached(reordered) == first
+    assert predictor.cache.stats()["hits"] >= 1
+    assert predictor.predict_cached(project, use_ensemble=True) == predictor.predict_single(project, use_ensemble=True)
+
+
+def test_predictor_cache_clears_when_models_change(fresh_cache, monkeypatch):
+    predictor = fresh_cache
+    project = delay_projects(1, seed=6)[0]
+    before = predictor.predict_cached(project)
+    invalidations = predictor.cache.stats()["invalidations"]
+
+    # A different decision threshold changes the result and the fingerprint
+    monkeypatch.setattr(predictor, "threshold", 1.01)
+    after = predictor.predict_cached(project)
+    assert after["is_delayed"] is False and after == predictor.predict_single(project)
+    assert predictor.cache.stats()["invalidations"] == invalidations + 1
+    monkeypatch.undo()
+
+    # So does replacing a model file
+    path = os.path.join(predictor.model_dir, "delay", "ensemble_weights.pkl")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    monkeypatch.setattr(predictor.cache, "_check_interval", 0)
+    assert predictor.predict_cached(project) == before
+    assert predictor.cache.stats()["invalidations"] == invalidations + 2
@@ -0,0 +1,50 @@
+"""predict_batch (vectorized) against predict_single, row for row."""
+
+import pytest
+
+from conftest import delay_projects
+
+
+def _single(predictor, project, use_ensemble):
+    try:
+        return predictor.predict_single(project, use_ensemble=use_ensemble)
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+@pytest.fixture(scope="module")
+def projects():
+    rows = delay_projects(300, seed=1)
+    return rows + [
+        # Extreme-risk override, malformed and partial rows take their own paths
+        dict(rows[0], budget_overrun_percent=30, progress_ratio=0.1),
+        dict(rows[1], budget_overrun_percent=18, progress_ratio=0.3),
+        dict(rows[2], progress_ratio=0.0),
+        dict(rows[3], budget_overrun_percent=None),
+        dict(rows[4], districttype=None),
+        dict(rows[5], totalunits="5"),
+        {"final_project_type": "Commercial"},
+        "not a project",
+    ]
+
+
+@pytest.mark.parametrize("use_ensemble", [False, True, "auto"])
+def test_batch_matches_single(delay_predictor, projects, use_ensemble):
+    batch = delay_predictor.predict_batch(projects, use_ensemble=use_ensemble)
+    single = [_single(delay_predictor, project, use_ensemble) for project in projects]
+    mismatched = [i for i, (a, b) in enumerate(zip(batch, single)) if a != b]
+    assert not mismatched, f"rows {mismatched} differ"
+
+    # The comparison covers both phases, the override and per-row errors
+    assert any(result.get("is_delayed") for result in batch)
+    assert any(not result.get("is_delayed", True) for result in batch)
+    assert any(result.get("extreme_override_applied") for result in batch)
+    assert sum("error" in result for result in batch) >= 3
+
+
+def test_batch_keeps_row_order_and_isolates_errors(delay_predictor, projects):
+    batch = delay_predictor.predict_batch(projects[:3] + ["not a project"] + projects[3:5])
+    assert len(batch) == 6
+    assert "error" in batch[3]
+    assert batch[:3] == delay_predictor.predict_batch(projects[:3])
+    assert batch[4:] == delay_predictor.predict_batch(projects[3:5])
@@ -0,0 +1,76 @@
+"""Fast feature paths against their pandas references: compile_features
+(delay, scalar single row) and apply_overrides (cost scenario sweeps)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.features import (
+    ALL_FEATURES,
+    BASE_NUMERIC_FEATURES,
+    CATEGORICAL_FEATURES,
+    apply_overrides,
+    engineer_features,
+)
+from predict import NUM_FEATURES, _random_payload, compile_features, create_features
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    rng = np.random.default_rng(0)
+    return [_random_payload(rng) for _ in range(500)]
+
+
+def test_compiled_features_match_create_features(payloads):
+    expected = create_features(pd.DataFrame(payloads))[NUM_FEATURES].to_numpy(dtype=float)
+    for payload, row in zip(payloads, expected):
+        compiled = compile_features(payload)
+        diff = [NUM_FEATURES[i] for i in np.flatnonzero(compiled != row)]
+        assert not diff, f"{diff} differ for {payload}"
+
+
+def test_compiled_features_fill_a_preallocated_row(payloads):
+    matrix = np.full((3, len(NUM_FEATURES)), np.nan)
+    for row, payload in enumerate(payloads[:3]):
+        assert compile_features(payload, out=matrix[row]) is not None
+    expected = create_features(pd.DataFrame(payloads[:3]))[NUM_FEATURES].to_numpy(dtype=float)
+    np.testing.assert_array_equal(matrix, expected)
+
+
+@pytest.mark.parametrize("progress", [0.0, 1.5, None, -0.2])
+def test_rows_pandas_rejects_are_rejected_by_the_compiled_path(payloads, progress):
+    payload = dict(payloads[0], progress_ratio=progress)
+    with pytest.raises(ValueError):
+        create_features(pd.DataFrame([payload]))
+    with pytest.raises(ValueError):
+        compile_features(payload)
+
+
+def _override_value(rng, field):
+    if field in CATEGORICAL_FEATURES:
+        values = ["COMPANY", "Surat", "", None, 7]
+    else:
+        values = [None, "garbage", "12.5", float(rng.normal(0, 10)), float(rng.uniform(0, 1e8)), int(rng.integers(-5, 500))]
+    return values[rng.integers(len(values))]
+
+
+def _engineered(raw_rows):
+    df = pd.DataFrame(raw_rows)
+    for col in CATEGORICAL_FEATURES:
+        df[col] = df[col].astype(str)
+    return engineer_features(df)
+
+
+def test_apply_overrides_matches_engineering_the_merged_rows():
+    rng = np.random.default_rng(1)
+    fields = BASE_NUMERIC_FEATURES + CATEGORICAL_FEATURES + ["scenario_name"]
+    base = {field: float(rng.uniform(1, 1e7)) for field in BASE_NUMERIC_FEATURES}
+    base.update(final_project_type="Commercial", promotertype="TRUST", districttype="Ahmedabad")
+    overrides = [
+        {field: _override_value(rng, field) for field in rng.choice(fields, rng.integers(0, 6), replace=False)}
+        for _ in range(300)
+    ]
+
+    actual = apply_overrides(_engineered([base]), overrides)[ALL_FEATURES]
+    expected = _engineered([{**base, **override} for override in overrides])[ALL_FEATURES]
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
@@ -0,0 +1,133 @@
+"""Streamed history exports: chunks, snapshot consistency and encoders."""
+
+import csv
+import io
+import json
+import random
+from datetime import datetime
+
+import pyarrow as pa
+import pytest
+
+from conftest import log_delay_predictions
+from services.history_export import encode_export
+
+NOW = datetime(2026, 6, 1)
+COLUMNS = ["id", "created_at", "is_delayed", "delay_probability", "districttype"]
+
+
+@pytest.fixture
+def history(repo):
+    """120 delay rows, the older half spread over four days past the 90-day cutoff."""
+    log_delay_predictions(repo, random.Random(3), 120)
+    with repo.pool.write() as conn:
+        conn.execute(
+            "UPDATE delay_predictions SET created_at = '2025-12-0' || (id % 4 + 1) || 'T12:00:00' "
+            "WHERE id <= 60"
+        )
+    return repo
+
+
+def _export(repo, chunk_size=1000, **kwargs):
+    columns, chunks = repo.export_history("delay", chunk_size=chunk_size, **kwargs)
+    return columns, [row for chunk in chunks for row in chunk]
+
+
+def _sql_rows(repo):
+    sql = f"SELECT {', '.join(COLUMNS)} FROM delay_predictions ORDER BY created_at, id"
+    with repo.pool.read() as conn:
+        return [tuple(row) for row in conn.execute(sql)]
+
+
+def test_export_spans_archive_and_log_oldest_first(history):
+    expected = _sql_rows(history)
+    history.archive_older_than(90, now=NOW)
+
+    columns, chunks = history.export_history("delay", columns=COLUMNS, chunk_size=16)
+    assert columns == [
+        ("id", "INTEGER"), ("created_at", "TEXT"), ("is_delayed", "INTEGER"),
+        ("delay_probability", "REAL"), ("districttype", "TEXT"),
+    ]
+    chunks = list(chunks)
+    assert all(0 < len(chunk) <= 16 for chunk in chunks)
+    assert [row for chunk in chunks for row in chunk] == expected
+
+
+def test_date_range_and_columns(history):
+    history.archive_older_than(90, now=NOW)
+    columns, rows = _export(history, columns=["created_at", "id"], since="2025-12-02", until="2025-12-03")
+    assert [name for name, _ in columns] == ["created_at", "id"]
+    assert rows and all(created_at[:10] in ("2025-12-02", "2025-12-03") for created_at, _ in rows)
+    assert len(rows) == 30
+
+    # Payloads and JSON lists are never exported
+    names = [name for name, _ in _export(history)[0]]
+    assert "input_payload" not in names and "recommendations" not in names
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"source": "nope"}, {"columns": ["input_payload"]}, {"since": "yesterday"}],
+)
+def test_bad_arguments_raise_before_streaming(history, kwargs):
+    kwargs = {"source": "delay", **kwargs}
+    with pytest.raises(ValueError):
+        history.export_history(**kwargs)
+
+
+def test_an_export_reads_one_snapshot(history):
+    expected = _sql_rows(history)
+    _, chunks = history.export_history("delay", columns=COLUMNS, chunk_size=10)
+    rows = list(next(chunks))
+
+    # Rows logged or archived while the export runs neither appear twice nor go missing
+    log_delay_predictions(history, random.Random(4), 10)
+    history.archive_older_than(90, now=NOW)
+    for chunk in chunks:
+        rows += chunk
+    assert rows == expected
+
+
+def test_stopping_early_returns_the_reader(history):
+    _, chunks = history.export_history("delay", chunk_size=10)
+    next(chunks)
+    chunks.close()
+    assert history.pool.stats()["idle_readers"] == 1
+    with history.pool.read() as conn:
+        assert not conn.in_transaction
+
+
+def _rows_from(fmt, body):
+    if fmt == "ndjson":
+        return [tuple(json.loads(line).values()) for line in body.decode().splitlines()]
+    if fmt == "csv":
+        header, *records = csv.reader(io.StringIO(body.decode()))
+        assert header == COLUMNS
+        return [tuple(record) for record in records]
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.names == COLUMNS
+    return [tuple(row.values()) for row in table.to_pylist()]
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv", "arrow"])
+def test_encoders_round_trip(history, fmt):
+    history.archive_older_than(90, now=NOW)
+    columns, chunks = history.export_history("delay", columns=COLUMNS, chunk_size=25)
+    parts = list(encode_export(fmt, columns, chunks))
+    assert len(parts) >= 120 // 25  # streamed one chunk at a time
+
+    expected = _export(history, columns=COLUMNS)[1]
+    if fmt == "csv":
+        expected = [tuple("" if value is None else str(value) for value in row) for row in expected]
+    assert _rows_from(fmt, b"".join(parts)) == expected
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv", "arrow"])
+def test_empty_exports_are_valid(repo, fmt):
+    columns, chunks = repo.export_history("delay", columns=COLUMNS)
+    assert _rows_from(fmt, b"".join(encode_export(fmt, columns, chunks))) == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        encode_export("xml", [("id", "INTEGER")], iter([]))
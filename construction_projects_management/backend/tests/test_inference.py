@@ -0,0 +1,146 @@
+"""InferenceExecutor in inline and thread mode: results, deadlines and stats."""
+
+import pickle
+import threading
+import time
+
+import pytest
+
+from services import inference
+from services.inference import InferenceExecutor, InferenceModels, InferenceTimeout, run_task
+
+
+@pytest.fixture
+def tasks(monkeypatch):
+    """Test tasks; "test.block" holds its worker until ``release`` is set."""
+    release = threading.Event()
+    calls = []
+
+    def block(models, value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    def fail(models):
+        raise ValueError("bad input")
+
+    monkeypatch.setitem(inference.TASKS, "test.echo", lambda models, *args, scale=1: [arg * scale for arg in args])
+    monkeypatch.setitem(inference.TASKS, "test.block", block)
+    monkeypatch.setitem(inference.TASKS, "test.fail", fail)
+    yield release, calls
+    release.set()
+
+
+@pytest.fixture
+def make_executor():
+    executors = []
+
+    def make(mode, **kwargs):
+        executor = InferenceExecutor(InferenceModels(), mode=mode, **kwargs)
+        executors.append(executor)
+        return executor
+
+    yield make
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+
+def _in_background(executor, *args, **kwargs):
+    thread = threading.Thread(target=executor.run, args=args, kwargs=kwargs)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread"])
+def test_run_and_map_results(tasks, make_executor, mode):
+    executor = make_executor(mode, workers=2)
+    assert executor.run("test.echo", 1, 2, scale=3) == [3, 6]
+    assert executor.map("test.echo", [(1,), (2, 3), ()]) == [[1], [2, 3], []]
+    with pytest.raises(ValueError, match="bad input"):
+        executor.run("test.fail")
+    with pytest.raises(KeyError):
+        executor.run("test.nope")
+
+    stats = executor.stats()
+    assert (stats["mode"], stats["running"], stats["in_flight"]) == (mode, True, 0)
+    # A map is one task however many calls it makes
+    assert (stats["submitted"], stats["completed"], stats["failed"]) == (3, 2, 1)
+    assert stats["avg_task_ms"] > 0
+
+
+def test_nothing_starts_before_the_first_task(tasks, make_executor):
+    executor = make_executor("thread")
+    assert not executor.stats()["running"]
+    executor.run("test.echo", 1)
+    assert executor.stats()["running"]
+
+
+def test_a_queued_task_is_cancelled_at_its_deadline(tasks, make_executor):
+    release, calls = tasks
+    executor = make_executor("thread", workers=1)
+    busy = _in_background(executor, "test.block", "first")
+    while not calls:
+        time.sleep(0.001)
+
+    with pytest.raises(InferenceTimeout) as error:
+        executor.run("test.block", "queued", timeout=0.05)
+    assert error.value.reason == "cancelled"
+    release.set()
+    busy.join(5)
+    assert calls == ["first"]  # the cancelled task never ran
+    stats = executor.stats()
+    assert (stats["cancelled"], stats["completed"], stats["in_flight"]) == (1, 1, 0)
+
+
+def test_a_running_task_times_out(tasks, make_executor):
+    release, calls = tasks
+    executor = make_executor("thread", workers=1, timeout=0.05)
+    # The executor's default timeout applies
+    with pytest.raises(InferenceTimeout) as error:
+        executor.run("test.block", "slow")
+    assert error.value.reason == "timed_out"
+    assert isinstance(error.value, TimeoutError)
+    assert executor.stats()["timed_out"] == 1
+
+    # The abandoned task still holds the worker until it finishes
+    release.set()
+    assert executor.run("test.echo", 1, timeout=5) == [1]
+    assert calls == ["slow"]
+
+
+def test_map_cancels_the_calls_still_queued(tasks, make_executor):
+    release, calls = tasks
+    executor = make_executor("thread", workers=1)
+    with pytest.raises(InferenceTimeout):
+        executor.map("test.block", [("a",), ("b",), ("c",)], timeout=0.05)
+    release.set()
+    executor.run("test.echo", 1, timeout=5)
+    assert calls == ["a"]
+
+
+def test_run_task_skips_an_expired_deadline(tasks):
+    _, calls = tasks
+    with pytest.raises(InferenceTimeout) as error:
+        run_task(InferenceModels(), "test.block", ("late",), {}, time.monotonic() - 1)
+    assert error.value.reason == "expired"
+    assert calls == []
+    assert run_task(InferenceModels(), "test.echo", (2,), {"scale": 2}, time.monotonic() + 5) == [4]
+
+
+def test_inference_timeouts_survive_pickling():
+    # Process workers send them back to the web process
+    error = pickle.loads(pickle.dumps(InferenceTimeout("too slow", "expired")))
+    assert (str(error), error.reason) == ("too slow", "expired")
+
+
+def test_inline_mode_has_no_timeout(tasks, make_executor):
+    release, calls = tasks
+    executor = make_executor("inline", timeout=0.01)
+    threading.Timer(0.1, release.set).start()
+    assert executor.run("test.block", "inline") == "inline"
+    assert executor.stats()["workers"] == 1
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        InferenceExecutor(InferenceModels(), mode="gpu")
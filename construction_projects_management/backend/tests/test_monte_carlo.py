@@ -0,0 +1,228 @@
+"""Monte Carlo engine: histogram percentiles, chunk merging and execution paths."""
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from ml.features import BASE_NUMERIC_FEATURES, DERIVED_FEATURES, engineer_features
+from services import monte_carlo
+from services.inference import InferenceExecutor, InferenceModels
+from services.monte_carlo import HIST_EDGES, ChunkSummary, MonteCarloEngine, histogram_percentiles
+
+FEATURES = BASE_NUMERIC_FEATURES + DERIVED_FEATURES
+BIN_WIDTH = HIST_EDGES[1] - HIST_EDGES[0]
+# progress_ratio ~ U(0, 1) maps onto -70..230: both tails fall outside the histogram range
+SPECS = [
+    {"field": "progress_ratio", "kind": "uniform", "low": 0.0, "high": 1.0,
+     "relative": False, "clip_min": 0.0, "clip_max": 1.0},
+    {"field": "total_rain", "kind": "normal", "mean": 1.0, "std": 0.2,
+     "relative": True, "clip_min": 0.0, "clip_max": None},
+]
+
+
+def _base_row():
+    raw = {field: 1000.0 for field in BASE_NUMERIC_FEATURES}
+    raw.update(progress_ratio=0.5, final_project_type="Commercial", promotertype="TRUST", districttype="Surat")
+    return engineer_features(pd.DataFrame([raw]))
+
+
+def _model():
+    """Linear in the sampled fields: 300 * progress_ratio - 70 + total_rain / 1000."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 1000, (200, len(FEATURES))), columns=FEATURES)
+    return LinearRegression().fit(X, 300 * X["progress_ratio"] - 70 + X["total_rain"] / 1000)
+
+
+class Recording:
+    """Wraps a model and keeps every prediction it returns."""
+
+    def __init__(self, model):
+        self.model = model
+        self.draws = []
+
+    def predict(self, df):
+        values = self.model.predict(df)
+        self.draws.append(values)
+        return values
+
+
+@pytest.fixture(scope="module")
+def model():
+    return _model()
+
+
+def _engine(model, **kwargs):
+    kwargs.setdefault("workers", 1)
+    return MonteCarloEngine(model, FEATURES, "unused.pkl", **kwargs)
+
+
+def test_percentiles_are_within_one_bin_of_the_raw_draws(model):
+    recording = Recording(model)
+    summary, _, chunks = _engine(recording, chunk_size=3000).run(_base_row(), SPECS, 20_000, seed=1)
+    draws = np.concatenate(recording.draws)
+    assert chunks == 7 and summary.n == len(draws) == 20_000
+    assert summary.underflow == (draws < HIST_EDGES[0]).sum() > 0
+    assert summary.overflow == (draws > HIST_EDGES[-1]).sum() > 0
+
+    # About 7% of the draws fall below the range and 10% above it
+    inside = [10, 25, 50, 75, 85]
+    actual = histogram_percentiles(summary, inside + [1, 5, 95, 99])
+    for q in inside:
+        assert abs(actual[f"p{q:g}"] - np.percentile(draws, q)) <= BIN_WIDTH
+    assert actual["p1"] == actual["p5"] == draws.min()
+    assert actual["p95"] == actual["p99"] == draws.max()
+
+
+def test_merged_chunks_summarize_all_draws(model):
+    recording = Recording(model)
+    summary, _, _ = _engine(recording, chunk_size=1000).run(_base_row(), SPECS, 4500, seed=2)
+    draws = np.concatenate(recording.draws)
+    counts, _ = np.histogram(draws, bins=HIST_EDGES)
+    np.testing.assert_array_equal(summary.counts, counts)
+    assert (summary.minimum, summary.maximum) == (draws.min(), draws.max())
+    assert summary.total == pytest.approx(draws.sum())
+    assert summary.total_sq == pytest.approx(np.square(draws).sum())
+    assert summary.medium_or_worse == (draws >= monte_carlo.RISK_MEDIUM_THRESHOLD).sum()
+    assert summary.high == (draws >= monte_carlo.RISK_HIGH_THRESHOLD).sum()
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=float)
+    counts, _ = np.histogram(values, bins=HIST_EDGES)
+    return ChunkSummary(
+        counts=counts,
+        underflow=int((values < HIST_EDGES[0]).sum()),
+        overflow=int((values > HIST_EDGES[-1]).sum()),
+        n=len(values),
+        total=float(values.sum()),
+        total_sq=float(np.square(values).sum()),
+        minimum=float(values.min()),
+        maximum=float(values.max()),
+        medium_or_worse=0,
+        high=0,
+    )
+
+
+def test_tails_outside_the_histogram_fall_back_to_min_and_max():
+    below = _summary([-400.0, -300.0, -90.0])
+    assert histogram_percentiles(below, [0, 50, 100]) == {"p0": -400.0, "p50": -400.0, "p100": -90.0}
+    above = _summary([250.0, 900.0])
+    assert histogram_percentiles(above, [50, 100]) == {"p50": 900.0, "p100": 900.0}
+
+    mixed = _summary([-80.0, 10.0, 10.05, 500.0])
+    values = histogram_percentiles(mixed, [0, 10, 99, 100])
+    assert (values["p0"], values["p10"]) == (-80.0, -80.0)
+    assert (values["p99"], values["p100"]) == (500.0, 500.0)
+    # Never outside the observed range, even when interpolating within a bin
+    assert mixed.minimum <= histogram_percentiles(mixed, [50])["p50"] <= mixed.maximum
+
+
+def test_merge_is_the_summary_of_the_concatenation():
+    a, b = np.array([-60.0, 1.0, 30.0]), np.array([5.0, 250.0])
+    merged, whole = _summary(a).merge(_summary(b)), _summary(np.concatenate([a, b]))
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    assert (merged.underflow, merged.overflow, merged.n) == (whole.underflow, whole.overflow, whole.n)
+    assert (merged.minimum, merged.maximum, merged.total) == (whole.minimum, whole.maximum, whole.total)
+
+
+def _assert_same(first, second):
+    (a, seed_a, chunks_a), (b, seed_b, chunks_b) = first, second
+    assert (seed_a, chunks_a) == (seed_b, chunks_b)
+    np.testing.assert_array_equal(a.counts, b.counts)
+    assert (a.n, a.total, a.minimum, a.maximum, a.underflow, a.overflow) == (
+        b.n, b.total, b.minimum, b.maximum, b.underflow, b.overflow
+    )
+
+
+def test_same_seed_same_result_inline_and_on_the_executor(model):
+    inline = _engine(model, chunk_size=500).run(_base_row(), SPECS, 2600, seed=3)
+
+    cost_service = SimpleNamespace(model=model, feature_columns=FEATURES)
+    executor = InferenceExecutor(InferenceModels(cost_service=cost_service), mode="thread", workers=3)
+    try:
+        shared = _engine(model, chunk_size=500)
+        shared.use_executor(
+            lambda chunks, timeout: executor.map("cost.monte_carlo_chunk", chunks, timeout=timeout), 3
+        )
+        _assert_same(shared.run(_base_row(), SPECS, 2600, seed=3), inline)
+        assert executor.stats()["completed"] == 1
+    finally:
+        executor.shutdown(wait=True)
+
+    # Drawn seeds are reported and reproduce the run
+    summary, seed, _ = _engine(model, chunk_size=500).run(_base_row(), SPECS, 1200)
+    _assert_same(_engine(model, chunk_size=500).run(_base_row(), SPECS, 1200, seed=seed), (summary, seed, 3))
+
+
+def test_same_seed_same_result_on_the_process_pool(model, tmp_path):
+    path = tmp_path / "cost.pkl"
+    joblib.dump({"point_model": model, "feature_columns": FEATURES}, path)
+    pooled = MonteCarloEngine(model, FEATURES, path, workers=2, chunk_size=500)
+    try:
+        result = pooled.run(_base_row(), SPECS, 2600, seed=4, timeout=60)
+    finally:
+        pooled.shutdown()
+    _assert_same(result, _engine(model, chunk_size=500).run(_base_row(), SPECS, 2600, seed=4))
+
+
+@pytest.fixture
+def routed(model, monkeypatch):
+    """An engine whose pool and executor record what they score."""
+    calls = []
+    monkeypatch.setattr(monte_carlo, "_WORKER", {"model": model, "feature_columns": FEATURES})
+
+    class Pool(ThreadPoolExecutor):
+        def map(self, fn, tasks, timeout=None):
+            calls.append(("pool", len(tasks), timeout))
+            return super().map(fn, tasks, timeout=timeout)
+
+    engine = _engine(model, workers=2, chunk_size=500)
+    pool = Pool(2)
+    monkeypatch.setattr(engine, "_get_pool", lambda: pool)
+
+    def map_chunks(chunks, timeout):
+        calls.append(("executor", len(chunks), timeout))
+        return [monte_carlo.simulate_chunk(model, FEATURES, *chunk) for chunk in chunks]
+
+    yield engine, map_chunks, calls
+    pool.shutdown()
+
+
+def test_shared_executor_scores_every_run(routed):
+    engine, map_chunks, calls = routed
+    engine.use_executor(map_chunks, 4, timeout=30)
+    assert engine.workers == 4
+    engine.run(_base_row(), SPECS, 1500, seed=5)
+    engine.run(_base_row(), SPECS, 100, seed=5, timeout=2)
+    assert calls == [("executor", 3, 30), ("executor", 1, 2)]
+
+
+def test_without_shared_workers_only_single_chunks_go_to_the_executor(routed):
+    engine, map_chunks, calls = routed
+    engine.use_executor(map_chunks, timeout=30)
+    assert engine.workers == 2
+    engine.run(_base_row(), SPECS, 1500, seed=5)
+    engine.run(_base_row(), SPECS, 100, seed=5)
+    assert calls == [("pool", 3, 30), ("executor", 1, 30)]
+
+    # Back to the pool alone: single chunks run on the calling thread
+    engine.use_executor(None)
+    engine.run(_base_row(), SPECS, 100, seed=5)
+    assert len(calls) == 2
+
+
+def test_executor_attaches_the_engine_by_mode(model):
+    engine = _engine(model, workers=3)
+    cost_service = SimpleNamespace(monte_carlo_engine=engine, batcher=SimpleNamespace())
+    models = InferenceModels(cost_service=cost_service)
+
+    InferenceExecutor(models, mode="process", workers=2, timeout=9).attach()
+    assert (engine._shared, engine.workers, engine.timeout) == (True, 2, 9)
+    for mode in ("thread", "inline"):
+        InferenceExecutor(models, mode=mode, workers=2, timeout=9).attach()
+        assert (engine._shared, engine.workers, engine.timeout) == (False, 3, 9)
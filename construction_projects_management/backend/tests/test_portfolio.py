@@ -0,0 +1,129 @@
+"""PortfolioRiskEngine against stub cost and delay models."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from schemas import PortfolioRiskRequest
+from services.portfolio_service import PortfolioRiskEngine
+
+
+class StubCostService:
+    """predict_intervals from the payloads: (point, p10, p90) overrun percent."""
+
+    model_version = "stub"
+
+    def predict_intervals(self, projects):
+        positions, requests, intervals, errors = [], [], [], []
+        for i, project in enumerate(projects):
+            if project["final_project_cost"] <= 0:
+                errors.append({"index": i, "error": "final_project_cost must be positive"})
+                continue
+            positions.append(i)
+            fields = ("final_project_cost", "districttype", "promotertype")
+            requests.append(SimpleNamespace(**{field: project[field] for field in fields}))
+            intervals.append(project["intervals"])
+        return positions, requests, np.array(intervals, dtype=float), errors
+
+
+class StubDelayPredictor:
+    def predict_batch(self, projects, use_ensemble=False):
+        return [
+            {"error": "missing fields"} if project["delay"] is None else {"delay_probability": project["delay"]}
+            for project in projects
+        ]
+
+
+def _projects(n, seed=0, districts=("A", "B", "C")):
+    rng = np.random.default_rng(seed)
+    projects = []
+    for i in range(n):
+        point = rng.uniform(0, 20)
+        projects.append(
+            {
+                "final_project_cost": float(rng.uniform(1e6, 1e8)),
+                "districttype": districts[i % len(districts)],
+                "promotertype": str(rng.choice(["COMPANY", "TRUST"])),
+                "intervals": (point, point - rng.uniform(0, 10), point + rng.uniform(0, 30)),
+                "delay": float(rng.uniform(0, 1)),
+            }
+        )
+    return projects
+
+
+def _simulate(projects, block_elements=2_000_000, **kwargs):
+    engine = PortfolioRiskEngine(StubCostService(), StubDelayPredictor(), block_elements=block_elements)
+    return engine.simulate(PortfolioRiskRequest(projects=projects, seed=7, **kwargs))
+
+
+def test_per_project_delay_marginals_are_preserved():
+    # One project per district: its expected delayed count is its delay probability
+    probabilities = [0.0, 0.03, 0.25, 0.5, 0.8, 0.97, 1.0]
+    projects = _projects(len(probabilities), districts=[f"D{i}" for i in range(len(probabilities))])
+    for project, p in zip(projects, probabilities):
+        project["delay"] = p
+
+    result = _simulate(projects, n_draws=20_000, district_correlation=0.5, promoter_correlation=0.3)
+    by_district = {row["district"]: row["expected_delayed_projects"] for row in result["districts"]}
+    for i, p in enumerate(probabilities):
+        assert by_district[f"D{i}"] == pytest.approx(p, abs=0.015)
+    assert by_district["D0"] == 0 and by_district["D6"] == 1
+
+
+def test_results_do_not_depend_on_the_block_size():
+    projects = _projects(40)
+    whole = _simulate(projects, n_draws=500)
+    assert whole["block_draws"] >= 500  # a single block
+    for block_elements in (40, 7 * 40, 333):
+        blocked = _simulate(projects, block_elements=block_elements, n_draws=500)
+        assert blocked["block_draws"] == max(1, block_elements // 40)
+        for key in ("overrun", "districts", "delay"):
+            assert blocked[key] == whole[key]
+
+
+def test_district_contributions_add_up_to_the_portfolio():
+    projects = _projects(60, seed=1)
+    result = _simulate(projects, n_draws=2000)
+    districts, overrun = result["districts"], result["overrun"]
+    assert sum(row["projects"] for row in districts) == result["projects"] == 60
+    assert sum(row["total_cost"] for row in districts) == pytest.approx(result["total_cost"], abs=1)
+    assert sum(row["expected_overrun"] for row in districts) == pytest.approx(overrun["expected"]["amount"], abs=1)
+    # Tail contributions are averaged over the same tail draws as the expected shortfall
+    assert sum(row["tail_contribution"] for row in districts) == pytest.approx(
+        overrun["expected_shortfall"]["amount"], abs=1
+    )
+    assert sum(row["share_of_expected"] for row in districts) == pytest.approx(1, abs=1e-3)
+    assert sum(row["share_of_tail"] for row in districts) == pytest.approx(1, abs=1e-3)
+    assert sum(row["expected_delayed_projects"] for row in districts) == pytest.approx(
+        result["delay"]["expected_delayed_projects"], abs=0.01
+    )
+    assert [row["tail_contribution"] for row in districts] == sorted(
+        (row["tail_contribution"] for row in districts), reverse=True
+    )
+
+
+def test_unscored_projects_are_reported_and_left_out():
+    projects = _projects(10, seed=2)
+    projects[3]["final_project_cost"] = 0
+    projects[5]["delay"] = None
+    result = _simulate(projects, n_draws=200)
+    assert result["projects"] == 9
+    assert [error["index"] for error in result["errors"]] == [3, 5]
+    assert result["delay"]["projects_scored"] == 8
+
+    projects = _projects(2)
+    for project in projects:
+        project["final_project_cost"] = 0
+    with pytest.raises(ValueError):
+        _simulate(projects, n_draws=200)
+
+
+def test_same_seed_same_result_and_no_delay_without_a_predictor():
+    projects = _projects(20, seed=3)
+    first, second = _simulate(projects, n_draws=300), _simulate(projects, n_draws=300)
+    assert first["overrun"] == second["overrun"] and first["seed"] == second["seed"] == 7
+
+    engine = PortfolioRiskEngine(StubCostService())
+    result = engine.simulate(PortfolioRiskRequest(projects=projects, n_draws=300, seed=7))
+    assert result["delay"] is None and result["overrun"] == first["overrun"]
@@ -0,0 +1,90 @@
+"""CompiledPreprocessor against the fitted sklearn transformers it replaces."""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, QuantileTransformer, StandardScaler
+
+from conftest import delay_projects
+from ml.preprocessing import CompiledPreprocessor
+from predict import CAT_FEATURES, NUM_FEATURES, DelayPredictor
+
+
+@pytest.mark.parametrize("name", ["classifier", "regressor"])
+def test_committed_preprocessors_compile_exactly(delay_model_dir, name):
+    preprocessor = joblib.load(delay_model_dir / "delay" / f"{name}_preprocessor.pkl")
+    encoder = CompiledPreprocessor(preprocessor, NUM_FEATURES, CAT_FEATURES)
+    # Every known category plus an unseen one, and numeric gaps/edge values
+    num, cats = DelayPredictor._probe_inputs(encoder.categories, n_samples=256, seed=3)
+    assert encoder.verify(num, cats)
+
+
+def _frame(rng, n):
+    frame = pd.DataFrame({"a": rng.normal(5, 2, n), "b": rng.uniform(0, 100, n), "c": rng.exponential(3, n)})
+    frame.loc[rng.random(n) < 0.2, "a"] = np.nan
+    # NaN is imputed; None is a category of its own, as in sklearn
+    frame["kind"] = rng.choice(["x", "y", "z", None], n)
+    frame.loc[rng.random(n) < 0.1, "kind"] = np.nan
+    frame["zone"] = rng.choice(["north", "south"], n)
+    return frame
+
+
+def _fitted(categorical_unknown="ignore", numeric=None):
+    rng = np.random.default_rng(0)
+    transformer = ColumnTransformer(
+        [
+            ("scaled", numeric or Pipeline([("fill", SimpleImputer(strategy="median")), ("std", StandardScaler())]), ["a", "b"]),
+            ("minmax", MinMaxScaler(), ["c"]),
+            (
+                "cat",
+                Pipeline(
+                    [
+                        ("fill", SimpleImputer(strategy="constant", fill_value="missing")),
+                        ("ohe", OneHotEncoder(handle_unknown=categorical_unknown, sparse_output=False)),
+                    ]
+                ),
+                ["kind", "zone"],
+            ),
+        ]
+    )
+    return transformer.fit(_frame(rng, 500))
+
+
+def test_imputers_scalers_and_one_hot_match_sklearn():
+    transformer = _fitted()
+    encoder = CompiledPreprocessor(transformer, ["a", "b", "c"], ["kind", "zone"])
+    frame = _frame(np.random.default_rng(1), 200)
+    frame.loc[:5, "zone"] = "east"  # unseen: all-zero one-hot block
+    np.testing.assert_array_equal(encoder.transform(frame), transformer.transform(frame))
+
+
+def test_unknown_categories_raise_like_sklearn_when_not_ignored():
+    transformer = _fitted(categorical_unknown="error")
+    encoder = CompiledPreprocessor(transformer, ["a", "b", "c"], ["kind", "zone"])
+    frame = _frame(np.random.default_rng(1), 10)
+    frame.loc[0, "zone"] = "east"
+    with pytest.raises(ValueError):
+        transformer.transform(frame)
+    with pytest.raises(ValueError, match="east"):
+        encoder.transform(frame)
+
+
+def test_unsupported_steps_are_refused():
+    transformer = _fitted(numeric=QuantileTransformer(n_quantiles=10))
+    with pytest.raises(NotImplementedError):
+        CompiledPreprocessor(transformer, ["a", "b", "c"], ["kind", "zone"])
+
+
+def test_predictions_match_the_sklearn_fallback(delay_predictor, monkeypatch):
+    projects = delay_projects(100, seed=2)
+    compiled = delay_predictor.predict_batch(projects, use_ensemble=True)
+    singles = [delay_predictor.predict_single(project) for project in projects[:10]]
+
+    monkeypatch.setattr(delay_predictor, "clf_encoder", None)
+    monkeypatch.setattr(delay_predictor, "reg_encoder", None)
+    assert delay_predictor.predict_batch(projects, use_ensemble=True) == compiled
+    assert [delay_predictor.predict_single(project) for project in projects[:10]] == singles
@@ -0,0 +1,510 @@
+"""PredictionRepository: summaries, archive and history queries."""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import storage
+from conftest import log_delay_predictions
+from storage import COST_GROUP_DIMENSIONS, PredictionRepository
+
+NOW = datetime(2026, 6, 1)
+
+
+def _log_cost(repo, rng, count):
+    for _ in range(count):
+        intervals = rng.choice([{}, {"p10": rng.uniform(-5, 5), "p90": rng.uniform(20, 50)}])
+        repo.log_prediction(
+            model_version=rng.choice(["v1", "v2"]),
+            input_payload={
+                "final_project_cost": rng.choice([None, 1e6]),
+                "districttype": rng.choice(["A", "B", "", None]),
+                "final_project_type": rng.choice(["X", "Y"]),
+                "promotertype": rng.choice(["P", None]),
+            },
+            output_payload={
+                "expected_overrun_percent": rng.choice([None, rng.uniform(-5, 40)]),
+                "predicted_final_cost": rng.uniform(1e6, 2e6),
+                "intervals": intervals,
+            },
+            risk_level=rng.choice(["High", "Medium", "Low", None]),
+        )
+
+
+def _age(repo, table, every):
+    """Move every ``every``-th row of ``table`` (never the newest) into the past."""
+    with repo.pool.write() as conn:
+        for row in conn.execute(f"SELECT id FROM {table} WHERE id % {every} = 1").fetchall():
+            created_at = (NOW - timedelta(days=100 + row["id"] % 7, seconds=row["id"])).isoformat()
+            conn.execute(f"UPDATE {table} SET created_at = ? WHERE id = ?", (created_at, row["id"]))
+
+
+def _cost_aggregates(repo):
+    by = {name: sorted(repo.aggregate_cost_by(name), key=repr) for name in COST_GROUP_DIMENSIONS}
+    return repo.aggregate_stats(), by
+
+
+def test_cost_aggregates_match_a_scan_of_the_log(repo):
+    _log_cost(repo, random.Random(0), 300)
+    with repo.pool.read() as conn:
+        expected = conn.execute(
+            """
+            SELECT districttype, COUNT(*), AVG(expected_overrun_percent), AVG(p90_overrun_percent),
+                   SUM(risk_level IS 'High'), TOTAL(predicted_final_cost - final_project_cost)
+            FROM cost_predictions GROUP BY districttype
+            """
+        ).fetchall()
+    grouped = {row["districttype"]: row for row in repo.aggregate_cost_by("districttype")}
+    assert set(grouped) == {"A", "B", "", None}
+    for key, count, avg_percent, avg_p90, high, overrun in expected:
+        row = grouped[key]
+        assert (row["count"], row["high_risk_count"]) == (count, high)
+        assert row["avg_overrun_percent"] == round(avg_percent, 2)
+        assert row["avg_p90"] == round(avg_p90, 2)
+        assert row["total_overrun_amount"] == round(overrun, 2)
+    assert repo.aggregate_stats()["total_predictions"] == 300
+
+
+def _delay_stats_scan(repo):
+    """delay_stats rows recomputed with GROUP BY over delay_predictions."""
+    measures = """COUNT(*), SUM(is_delayed <> 0), SUM(CASE WHEN is_delayed THEN predicted_delay_days ELSE 0 END),
+                  SUM(delay_probability), MAX(created_at)"""
+    with repo.pool.read() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT 'total', '', {measures} FROM delay_predictions
+            UNION ALL SELECT 'risk', risk_level, {measures} FROM delay_predictions GROUP BY 2
+            UNION ALL SELECT 'confidence', confidence, {measures} FROM delay_predictions GROUP BY 2
+            UNION ALL SELECT 'project_type', final_project_type, {measures} FROM delay_predictions
+                WHERE final_project_type <> '' GROUP BY 2
+            UNION ALL SELECT 'district', districttype, {measures} FROM delay_predictions
+                WHERE districttype <> '' GROUP BY 2
+            """
+        ).fetchall()
+    return {tuple(row[:2]): tuple(row[2:]) for row in rows}
+
+
+def _assert_delay_stats_match_the_log(repo):
+    expected = _delay_stats_scan(repo)
+    with repo.pool.read() as conn:
+        rows = conn.execute("SELECT * FROM delay_stats").fetchall()
+    actual = {(row["dimension"], row["key"]): tuple(row)[2:] for row in rows}
+    assert set(actual) == set(expected)
+    for key, values in expected.items():
+        assert actual[key] == pytest.approx(values), key
+
+    stats = repo.aggregate_delay_stats()
+    count, delayed, delay_days, probability_sum, latest_at = expected[("total", "")]
+    assert (stats["total_predictions"], stats["delayed_count"], stats["on_time_count"]) == (
+        count, delayed, count - delayed
+    )
+    assert stats["delay_rate"] == round(delayed / count * 100, 2)
+    assert stats["avg_delay_probability"] == round(probability_sum / count, 4)
+    assert stats["avg_delay_days"] == round(delay_days / delayed, 1)
+    assert stats["latest_prediction_at"] == latest_at
+    for dimension, field in (("risk", "risk_counts"), ("confidence", "confidence_counts")):
+        assert stats[field] == {
+            level: expected.get((dimension, level), (0,))[0] for level in ("High", "Medium", "Low")
+        }
+    for dimension, field in (("project_type", "project_type_distribution"), ("district", "district_distribution")):
+        assert stats[field] == {key: values[0] for (name, key), values in expected.items() if name == dimension}
+
+
+def test_delay_stats_match_a_scan_of_the_log(repo, tmp_path):
+    rng = random.Random(8)
+    log_delay_predictions(repo, rng, 250)
+    # Rows without a project type or district only count towards the other dimensions
+    for input_payload in ({}, {"districttype": "", "final_project_type": ""}):
+        repo.log_delay_prediction(input_payload=input_payload, output_payload={})
+    _assert_delay_stats_match_the_log(repo)
+    assert ("risk", "Unknown") in _delay_stats_scan(repo)
+
+    # A summary created on an existing database is backfilled from the log
+    with repo.pool.write() as conn:
+        conn.execute("DROP TABLE delay_stats")
+    repo.close()
+    reopened = PredictionRepository(tmp_path / "predictions.db", write_behind=False)
+    try:
+        _assert_delay_stats_match_the_log(reopened)
+        log_delay_predictions(reopened, rng, 20)
+        _assert_delay_stats_match_the_log(reopened)
+        assert reopened.aggregate_delay_stats()["total_predictions"] == 272
+    finally:
+        reopened.close()
+
+
+def test_cost_aggregates_keep_archived_rows(repo, tmp_path):
+    _log_cost(repo, random.Random(1), 200)
+    _age(repo, "cost_predictions", 2)
+    before = _cost_aggregates(repo)
+
+    moved = repo.archive_older_than(90, now=NOW)["tables"]["cost_predictions"]["rows"]
+    assert moved == 100
+    assert _cost_aggregates(repo) == before
+
+    # A summary created after archiving is backfilled from the partitions too
+    with repo.pool.write() as conn:
+        conn.execute("DROP TABLE cost_stats")
+    repo.close()
+    reopened = PredictionRepository(tmp_path / "predictions.db", write_behind=False)
+    try:
+        assert _cost_aggregates(reopened) == before
+    finally:
+        reopened.close()
+
+
+class _Clock(datetime):
+    """storage.datetime stand-in whose utcnow() is ``current``."""
+
+    current = NOW
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current
+
+
+def _log_spread(repo, rng, count, log):
+    """``log`` ``count`` rows one at a time, each at a random time in the two days before NOW."""
+    for _ in range(count):
+        _Clock.current = NOW - timedelta(minutes=rng.randint(1, 48 * 60))
+        log(repo, rng, 1)
+
+
+_ROLLUP_SCANS = {
+    "delay": """
+        SUM(is_delayed <> 0), SUM(CASE WHEN is_delayed THEN predicted_delay_days ELSE 0 END),
+        SUM(delay_probability)
+    """,
+    "cost": """
+        COUNT(expected_overrun_percent), TOTAL(expected_overrun_percent),
+        TOTAL(predicted_final_cost - final_project_cost)
+    """,
+}
+
+
+def _assert_rollups_match_the_log(repo):
+    for source, (table, rollup, _) in storage.ROLLUP_SOURCES.items():
+        measures = ", ".join(PredictionRepository._rollup_measures(source))
+        for granularity, width in storage.ROLLUP_GRANULARITIES.items():
+            with repo.pool.read() as conn:
+                expected = conn.execute(
+                    f"""
+                    SELECT substr(created_at, 1, {width}), district, COUNT(*), SUM(risk_level IS 'High'),
+                           SUM(risk_level IS 'Medium'), SUM(risk_level IS 'Low'), {_ROLLUP_SCANS[source]}
+                    FROM (
+                        SELECT *, '' AS district FROM {table}
+                        UNION ALL SELECT *, districttype FROM {table} WHERE districttype <> ''
+                    )
+                    GROUP BY 1, 2
+                    """
+                ).fetchall()
+                actual = conn.execute(
+                    f"SELECT bucket, district, {measures} FROM {rollup} WHERE granularity = ?", (granularity,)
+                ).fetchall()
+            expected = {tuple(row[:2]): tuple(row[2:]) for row in expected}
+            actual = {tuple(row[:2]): tuple(row[2:]) for row in actual}
+            assert set(actual) == set(expected), (source, granularity)
+            for key, values in expected.items():
+                assert actual[key] == pytest.approx(values), (source, granularity, key)
+
+
+def test_rollups_match_a_scan_of_the_log(repo, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "datetime", _Clock)
+    rng = random.Random(6)
+    _log_spread(repo, rng, 300, log_delay_predictions)
+    _log_spread(repo, rng, 300, _log_cost)
+    _assert_rollups_match_the_log(repo)
+    with repo.pool.read() as conn:
+        buckets = conn.execute("SELECT COUNT(DISTINCT bucket) FROM delay_rollups WHERE granularity = 'day'")
+        assert buckets.fetchone()[0] == 2
+
+    # The trend and the dashboard read the same totals
+    trend = repo.rollup_trend("delay", granularity="hour", days=3, now=NOW)
+    assert sum(point["count"] for point in trend["series"]) == 300
+    assert sum(row["count"] for row in trend["districts"]) == 300
+    since = (NOW - timedelta(hours=23)).isoformat()[:13]
+    with repo.pool.read() as conn:
+        recent = conn.execute("SELECT COUNT(*) FROM delay_predictions WHERE created_at >= ?", (since,))
+        assert repo.dashboard_stats(now=NOW)["last_24_hours"]["delay_predictions"] == recent.fetchone()[0]
+
+    # Rollups created on an existing database are backfilled from the log,
+    # and the recreated triggers keep them current
+    with repo.pool.write() as conn:
+        conn.execute("DROP TABLE delay_rollups")
+        conn.execute("DROP TABLE cost_rollups")
+    repo.close()
+    reopened = PredictionRepository(tmp_path / "predictions.db", write_behind=False)
+    try:
+        _assert_rollups_match_the_log(reopened)
+        _log_spread(reopened, rng, 50, log_delay_predictions)
+        _log_spread(reopened, rng, 50, _log_cost)
+        _assert_rollups_match_the_log(reopened)
+    finally:
+        reopened.close()
+
+
+# The tables as the first release created them: no analytics columns on
+# cost_predictions, recommendations inline on delay_predictions
+_BASELINE_SCHEMA = """
+    CREATE TABLE cost_predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        model_version TEXT NOT NULL,
+        scenario_name TEXT,
+        risk_level TEXT,
+        alerts TEXT,
+        input_payload TEXT NOT NULL,
+        output_payload TEXT NOT NULL
+    );
+    CREATE TABLE delay_predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        model_version TEXT,
+        is_delayed INTEGER NOT NULL,
+        delay_probability REAL NOT NULL,
+        predicted_delay_days INTEGER NOT NULL,
+        risk_level TEXT NOT NULL,
+        confidence TEXT NOT NULL,
+        extreme_override_applied INTEGER NOT NULL,
+        ensemble_used INTEGER NOT NULL,
+        recommendations TEXT,
+        input_payload TEXT NOT NULL,
+        output_payload TEXT NOT NULL,
+        final_project_cost REAL,
+        totalunits INTEGER,
+        planned_duration_days INTEGER,
+        actual_duration_days INTEGER,
+        progress_ratio REAL,
+        budget_overrun_percent REAL,
+        bookedunits INTEGER,
+        land_utilization REAL,
+        final_project_type TEXT,
+        promotertype TEXT,
+        districttype TEXT,
+        avg_temp REAL,
+        total_rain REAL
+    );
+"""
+
+
+def test_migration_fills_the_typed_columns_of_a_baseline_database(tmp_path):
+    path = tmp_path / "baseline.db"
+    rng = random.Random(7)
+    payloads = []
+    with sqlite3.connect(path) as conn:
+        conn.executescript(_BASELINE_SCHEMA)
+        for i in range(40):
+            input_payload = {
+                "final_project_cost": rng.uniform(1e6, 5e6),
+                "totalunits": rng.randint(1, 300),
+                "planned_duration_days": rng.randint(100, 2000),
+                "progress_ratio": rng.random(),
+                "final_project_type": rng.choice(["X", "Y"]),
+                "promotertype": rng.choice(["P", "Q"]),
+                "districttype": rng.choice(["A", "B"]),
+            }
+            output_payload = {
+                "expected_overrun_percent": rng.uniform(-5, 40),
+                "predicted_final_cost": rng.uniform(1e6, 6e6),
+                "intervals": rng.choice([{}, {"p10": rng.uniform(-5, 5), "p90": rng.uniform(20, 50)}]),
+            }
+            payloads.append((input_payload, output_payload))
+            conn.execute(
+                "INSERT INTO cost_predictions (created_at, model_version, risk_level, alerts, input_payload, "
+                "output_payload) VALUES (?, 'v1', ?, '[]', ?, ?)",
+                (f"2026-01-01T00:00:{i:02d}", rng.choice(["High", "Low"]),
+                 json.dumps(input_payload), json.dumps(output_payload)),
+            )
+        conn.execute(
+            "INSERT INTO delay_predictions (created_at, is_delayed, delay_probability, predicted_delay_days, "
+            "risk_level, confidence, extreme_override_applied, ensemble_used, recommendations, input_payload, "
+            "output_payload, districttype) VALUES ('2026-01-01T00:00:00', 1, 0.8, 30, 'High', 'High', 0, 0, "
+            "'[\"Add crews\"]', '{}', '{}', 'A')"
+        )
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    repo = PredictionRepository(path, write_behind=False)
+    try:
+        columns = [column for column, _, _, _ in storage.COST_ANALYTICS_COLUMNS]
+        with repo.pool.read() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == storage.SCHEMA_VERSION
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM cost_predictions ORDER BY id").fetchall()
+        for row, (input_payload, output_payload) in zip(rows, payloads):
+            intervals = output_payload["intervals"]
+            assert dict(row) == pytest.approx(
+                {
+                    "expected_overrun_percent": output_payload["expected_overrun_percent"],
+                    "predicted_final_cost": output_payload["predicted_final_cost"],
+                    "p10_overrun_percent": intervals.get("p10"),
+                    "p90_overrun_percent": intervals.get("p90"),
+                    **{column: input_payload[column] for column in columns[4:]},
+                }
+            )
+
+        # The summaries are built from the migrated columns, and old rows stay readable
+        by_district = {row["districttype"]: row["count"] for row in repo.aggregate_cost_by("districttype")}
+        assert by_district == Counter(input_payload["districttype"] for input_payload, _ in payloads)
+        assert repo.fetch_recent(1)[0]["output_payload"] == payloads[-1][1]
+        assert repo.fetch_recent_delays(1)[0]["recommendations"] == ["Add crews"]
+        log_delay_predictions(repo, rng, 1)
+        assert repo.aggregate_delay_stats()["total_predictions"] == 2
+    finally:
+        repo.close()
+
+
+def test_recommendation_sets_survive_hash_collisions(repo, monkeypatch):
+    # Every list hashes to the same id: only the stored-content check tells them apart
+    monkeypatch.setattr("storage._recommendation_set_id", lambda items: 2**63 - 1)
+    lists = [["Add crews"], ["Re-sequence work", "Order early"], ["Add crews"], []]
+    for items in lists:
+        repo.log_delay_prediction(input_payload={}, output_payload={}, recommendations=items)
+
+    stored = [row["recommendations"] for row in repo.fetch_recent_delays(10)]
+    assert stored == lists[::-1]
+    with repo.pool.read() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM recommendation_sets ORDER BY id")]
+    assert ids == [-(2**63), -(2**63) + 1, 2**63 - 1]
+
+
+def _pages(query, limit, **filters):
+    """Every item of a keyset-paginated query, plus the number of pages."""
+    items, cursor, pages = [], None, 0
+    while True:
+        page = query(limit=limit, cursor=cursor, **filters)
+        items += page["items"]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items, pages
+        assert pages <= 1000, "pagination does not advance"
+
+
+@pytest.fixture
+def history(repo):
+    """Delay history with timestamp ties, half of it older than 90 days."""
+    log_delay_predictions(repo, random.Random(2), 240)
+    with repo.pool.write() as conn:
+        # Old rows share three timestamps; recent ones come in pairs
+        conn.execute(
+            "UPDATE delay_predictions SET created_at = ? || '-0' || (id % 3 + 1) || 'T08:00:00' WHERE id % 2 = 1",
+            (f"{NOW.year - 1}-01",),
+        )
+        conn.execute(
+            "UPDATE delay_predictions SET created_at = ? || printf('%04d', id / 4) WHERE id % 2 = 0",
+            (f"{NOW.date()}T00:00:00.00",),
+        )
+    return repo
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"risk_level": "High"},
+        {"district": "B", "is_delayed": "true"},
+        {"min_probability": 0.3, "until": "2026-01-01"},
+    ],
+)
+def test_keyset_pages_cover_every_row_once(history, filters):
+    with history.pool.read() as conn:
+        everything = conn.execute("SELECT id, created_at FROM delay_predictions").fetchall()
+    expected, _ = _pages(history.query_delay_predictions, 1000, **filters)
+    assert len(expected) < len(everything) if filters else len(expected) == len(everything)
+    keys = [(item["created_at"], item["id"]) for item in expected]
+    assert keys == sorted(keys, reverse=True)
+
+    # Small pages step through the timestamp ties
+    for limit in (1, 7, 50):
+        items, pages = _pages(history.query_delay_predictions, limit, **filters)
+        assert items == expected
+        assert pages == max(1, -(-len(expected) // limit))
+
+
+def test_fields_limit_the_decoded_columns(history):
+    page = history.query_delay_predictions(limit=3, fields=["id", "is_delayed", "recommendations"])
+    assert [set(item) for item in page["items"]] == [{"id", "is_delayed", "recommendations"}] * 3
+    assert all(isinstance(item["is_delayed"], bool) for item in page["items"])
+    full = history.query_delay_predictions(limit=1)["items"][0]
+    assert set(full) == set(storage.DELAY_HISTORY_FIELDS)
+    assert isinstance(full["input_payload"], dict) and isinstance(full["output_payload"], dict)
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [{}, {"risk_level": "High"}, {"district": "B", "is_delayed": "true"}, {"until": "2026-01-01"}],
+)
+def test_keyset_pages_continue_into_the_archive(history, filters):
+    expected, _ = _pages(history.query_delay_predictions, 1000, **filters)
+    assert expected and len({item["id"] for item in expected}) == len(expected)
+
+    history.archive_older_than(90, now=NOW)
+    with history.pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM delay_predictions").fetchone()[0] == 120
+
+    # Small pages cross the hot/archive boundary and the timestamp ties
+    for limit in (1, 7, 50):
+        items, pages = _pages(history.query_delay_predictions, limit, **filters)
+        assert items == expected
+        assert pages == max(1, -(-len(expected) // limit))
+
+
+def test_a_cursor_taken_before_archiving_stays_valid(history):
+    fields = ["id", "created_at", "recommendations"]
+    expected, _ = _pages(history.query_delay_predictions, 1000, fields=fields)
+    # The cursor points into rows that are archived before the next page is read
+    page = history.query_delay_predictions(limit=150, fields=fields)
+    history.archive_older_than(90, now=NOW)
+
+    items = page["items"]
+    while page["next_cursor"]:
+        page = history.query_delay_predictions(limit=40, cursor=page["next_cursor"], fields=fields)
+        items += page["items"]
+        assert len(items) <= len(expected), "pagination repeats rows"
+    assert items == expected
+    assert {tuple(item["recommendations"]) for item in items} == {(), ("Add crews",), ("Add crews", "Order early")}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"cursor": "not-a-cursor"}, {"fields": ["nope"]}, {"nope": 1}, {"min_probability": "high"}],
+)
+def test_history_queries_reject_bad_arguments(repo, kwargs):
+    with pytest.raises(ValueError):
+        repo.query_delay_predictions(**kwargs)
+
+
+def test_closing_spills_rows_of_callers_blocked_on_a_full_queue(repo):
+    repo.writer = storage.WriteBehindWriter(repo.pool, max_queue=1, linger=0, policy="block")
+    rng = random.Random(5)
+    with repo.pool.write():
+        # The thread is stuck committing the first row, the second fills the queue
+        log_delay_predictions(repo, rng, 1)
+        while repo.writer.stats()["queue_depth"]:
+            time.sleep(0.01)
+        log_delay_predictions(repo, rng, 1)
+        blocked = threading.Thread(target=log_delay_predictions, args=(repo, rng, 1))
+        blocked.start()
+        time.sleep(0.05)
+        assert blocked.is_alive()
+
+        closing = threading.Thread(target=repo.writer.close)
+        closing.start()
+        blocked.join(1)
+        assert not blocked.is_alive()
+    closing.join(1)
+    stats = repo.writer.stats()
+    assert (stats["written"], stats["spilled"], stats["pending"], stats["running"]) == (2, 1, 0, False)
+    assert repo.writer.flush(0.1)
+
+    # The next writer replays them
+    repo.writer = storage.WriteBehindWriter(repo.pool)
+    assert repo.flush(1)
+    assert repo.writer.stats()["replayed"] == 1
+    with repo.pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM delay_predictions").fetchone()[0] == 3
@@ -0,0 +1,138 @@
+"""Flat NumPy tree engine against each library's native predict."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from catboost import CatBoostClassifier, CatBoostRegressor
+from lightgbm import LGBMClassifier, LGBMRegressor
+from sklearn.base import clone
+from sklearn.ensemble import (
+    ExtraTreesRegressor,
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+from sklearn.linear_model import LinearRegression
+from xgboost import XGBClassifier, XGBRegressor
+
+from conftest import delay_projects
+from ml.trees import FlatTreeEnsemble, compile_tree_model, resolve_engine, select_engine
+from predict import DelayPredictor
+
+
+def _data(seed=0, n=600, nan=True):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 6))
+    X[:, 5] = rng.integers(0, 3, n)  # zeros and ties exercise the split conventions
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + (X[:, 5] == 1) + rng.normal(0, 0.1, n)
+    if nan:
+        X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+NATIVE_NAN = {
+    "lgbm": LGBMRegressor(n_estimators=30, verbose=-1),
+    "lgbm-binary": LGBMClassifier(n_estimators=30, verbose=-1),
+    "xgb": XGBRegressor(n_estimators=30, max_depth=4),
+    "xgb-binary": XGBClassifier(n_estimators=30, max_depth=4),
+    "catboost": CatBoostRegressor(iterations=30, depth=4, verbose=0, allow_writing_files=False),
+    "catboost-binary": CatBoostClassifier(iterations=30, depth=4, verbose=0, allow_writing_files=False),
+}
+SKLEARN = {
+    "gbr": GradientBoostingRegressor(n_estimators=20, max_depth=3),
+    "gbc": GradientBoostingClassifier(n_estimators=20, max_depth=3),
+    "rf": RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0),
+    "rfc": RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0),
+    "extra": ExtraTreesRegressor(n_estimators=5, max_depth=6, random_state=0),
+}
+
+
+@pytest.mark.parametrize("name", list(NATIVE_NAN) + list(SKLEARN))
+def test_flat_engine_matches_native_predict(name):
+    model = clone(NATIVE_NAN.get(name) or SKLEARN[name])
+    X, y = _data(nan=name in NATIVE_NAN)
+    target = (y > np.median(y)).astype(int) if hasattr(model, "predict_proba") else y
+    model.fit(X, target)
+    X_test, _ = _data(seed=1, n=300, nan=name in NATIVE_NAN)
+
+    engine = compile_tree_model(model, X_test)
+    if engine.is_classifier:
+        np.testing.assert_allclose(engine.predict_proba(X_test), model.predict_proba(X_test), atol=1e-6)
+        np.testing.assert_array_equal(engine.predict(X_test), model.predict(X_test))
+    else:
+        np.testing.assert_allclose(engine.predict(X_test), model.predict(X_test), rtol=1e-5, atol=1e-6)
+    # One row at a time takes the same path as a batch
+    singles = [engine.raw_score(row[None])[0] for row in X_test[:5]]
+    np.testing.assert_array_equal(engine.raw_score(X_test[:5]), singles)
+
+
+def test_lightgbm_pandas_categories_including_unseen_and_missing():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"x": rng.normal(size=500), "zone": rng.choice(["a", "b", "c", "d"], 500)})
+    y = frame["x"] + frame["zone"].map({"a": 0, "b": 3, "c": -2, "d": 1})
+    frame["zone"] = frame["zone"].astype("category")
+    model = LGBMRegressor(n_estimators=30, min_child_samples=5, verbose=-1).fit(frame, y)
+
+    test = frame.iloc[:6].copy()
+    test["zone"] = pd.Categorical(["a", "d", "unseen", None, "c", "b"])
+    engine = FlatTreeEnsemble.from_model(model)
+    np.testing.assert_allclose(engine.predict(test), model.predict(test), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "model", [LGBMRegressor(n_estimators=20, verbose=-1), GradientBoostingRegressor(n_estimators=20)]
+)
+def test_path_attributions_add_up_to_the_raw_score(model):
+    X, y = _data(nan=False)
+    engine = FlatTreeEnsemble.from_model(model.fit(X, y))
+    contributions = engine.path_attributions(X[:50])
+    bias = engine.value[engine.roots].sum() * engine.scale + engine.base_score
+    np.testing.assert_allclose(contributions.sum(axis=1) + bias, engine.raw_score(X[:50]), atol=1e-6)
+
+
+def test_select_engine_falls_back_to_native(monkeypatch):
+    X, y = _data(nan=False)
+    linear = LinearRegression().fit(X, y)
+    assert select_engine(linear, "flat", X, "linear") is linear
+    trees = GradientBoostingRegressor(n_estimators=5).fit(X, y)
+    assert select_engine(trees, "native", X, "gbr") is trees
+    assert select_engine(trees, "flat", None, "gbr") is trees
+    assert isinstance(select_engine(trees, "flat", X, "gbr"), FlatTreeEnsemble)
+
+    # An export that disagrees with the library on the probe is never served
+    export = FlatTreeEnsemble.from_model
+
+    def skewed(model):
+        engine = export(model)
+        engine.base_score += 1.0
+        return engine
+
+    monkeypatch.setattr(FlatTreeEnsemble, "from_model", staticmethod(skewed))
+    with pytest.raises(ValueError, match="deviates"):
+        compile_tree_model(trees, X)
+    assert select_engine(trees, "flat", X, "gbr") is trees
+
+
+def test_resolve_engine():
+    assert resolve_engine(None, "classifier") == "native"
+    assert resolve_engine("flat", "classifier") == "flat"
+    engines = {"default": "flat", "regressor": "native"}
+    assert resolve_engine(engines, "classifier") == "flat"
+    assert resolve_engine(engines, "regressor") == "native"
+
+
+def test_delay_predictor_on_flat_engines(delay_model_dir, delay_predictor):
+    flat = DelayPredictor(str(delay_model_dir), tree_engines="flat", lazy_ensemble=False)
+    assert flat.engine_name(flat.classifier_engine, flat.classifier) == "flat"
+    assert flat.engine_name(flat.regressor_engine, flat.regressor) == "flat"
+    assert all(isinstance(engine, FlatTreeEnsemble) for engine in flat.ensemble_engines.values())
+
+    projects = delay_projects(200, seed=4)
+    for use_ensemble in (False, True):
+        expected = delay_predictor.predict_batch(projects, use_ensemble=use_ensemble)
+        actual = flat.predict_batch(projects, use_ensemble=use_ensemble)
+        for a, b in zip(actual, expected):
+            assert a["delay_probability"] == pytest.approx(b["delay_probability"], abs=1e-6)
+            assert a["is_delayed"] == b["is_delayed"]
+            assert abs(a["predicted_delay_days"] - b["predicted_delay_days"]) <= 1